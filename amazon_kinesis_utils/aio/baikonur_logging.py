@@ -0,0 +1,138 @@
+import asyncio
+import logging
+from typing import Dict
+
+from .. import s3
+from ..baikonur_logging import (
+    _get_dedup_keys,
+    _get_object_keys,
+    _new_result,
+    _serialize_records,
+    _skip_saved_objects,
+)
+from ..dedup import Deduplicator
+from ..metrics import Metrics
+from . import s3 as aio_s3
+
+logger = logging.getLogger("kinesis_logging_utils")
+logger.setLevel(logging.INFO)
+
+
+async def save_json_logs_to_s3(
+    client,
+    log_dict: dict,
+    reason: str = "not specified",
+    gzip_compress: bool = True,
+    key_prefix: str = "",
+    compression: str = None,
+    compression_level: int = None,
+    max_concurrency: int = 1,
+    raise_on_error: bool = True,
+    metrics: Metrics = None,
+    deduplicator: Deduplicator = None,
+) -> Dict[str, dict]:
+    """
+    Async version of baikonur_logging.save_json_logs_to_s3 for asyncio clients (e.g. aiobotocore S3 client).
+    Up to max_concurrency objects are compressed and uploaded at once, limited by a semaphore.
+    Objects are uploaded with a single PutObject API call each (no streaming multipart upload).
+
+    :param client: Async S3 API client with put_object coroutine method
+    :param log_dict: log_dict to save (see baikonur_logging.append_to_log_dict)
+    :param reason: Reason for saving, used in log messages
+    :param gzip_compress: Boolean switch to control gzip compression (default = True)
+    :param key_prefix: S3 bucket name and S3 object key prefix
+    :param compression: Compression codec name ("none", "gzip" or "zstd"), overrides gzip_compress
+    :param compression_level: Compression level (default = codec default, e.g. 6 for gzip)
+    :param max_concurrency: Maximum number of uploads in flight at once (default = 1, sequential)
+    :param raise_on_error: Raise first upload error after all uploads are finished (default = True).
+                           Sequential mode raises immediately, without trying to upload remaining log types.
+    :param metrics: Metrics to record counters and timings in (see baikonur_logging.save_json_logs_to_s3)
+    :param deduplicator: Deduplicator of uploaded objects (see baikonur_logging.save_json_logs_to_s3)
+    :return: Dictionary of S3 object key to upload result (see baikonur_logging.save_json_logs_to_s3)
+    """
+    logger.info(f"Saving logs to S3. Reason: {reason}")
+
+    codec = s3.resolve_codec(gzip_compress, compression)
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def save(key: str, records) -> int:
+        async with semaphore:
+            logger.info(f"Saving logs to S3: s3://{key_prefix}/{key}")
+            size = await upload_with_metrics(key, records)
+
+        if deduplicator is not None:
+            deduplicator.add(dedup_keys[key])
+
+        return size
+
+    async def upload_with_metrics(key: str, records) -> int:
+        if metrics is None:
+            return await upload(key, records)
+
+        start = metrics.clock()
+        try:
+            size = await upload(key, records)
+        except Exception:
+            metrics.incr("S3UploadErrors")
+            raise
+        finally:
+            metrics.timing("S3UploadLatency", metrics.clock() - start)
+
+        metrics.incr("S3Objects")
+        metrics.incr("S3BytesUploaded", size)
+        return size
+
+    async def upload(key: str, records) -> int:
+        return await aio_s3.put_str_data(
+            client,
+            key_prefix,
+            key,
+            _serialize_records(records),
+            compression=codec.name,
+            compression_level=compression_level,
+        )
+
+    keys = _get_object_keys(log_dict, key_prefix, codec.extension)
+    results = {}
+
+    if deduplicator is not None:
+        dedup_keys = _get_dedup_keys(log_dict, keys, key_prefix)
+        keys, results = _skip_saved_objects(
+            log_dict, keys, key_prefix, dedup_keys, deduplicator, metrics
+        )
+
+    results.update({key: _new_result(log_dict, keys[key]) for key in keys})
+
+    if max_concurrency <= 1:
+        for key, dict_key in keys.items():
+            try:
+                results[key]["bytes"] = await save(key, log_dict[dict_key]["records"])
+            except Exception as e:
+                logger.error(f"Failed to save logs to S3: s3://{key_prefix}/{key}: {e}")
+                if raise_on_error:
+                    raise
+
+                results[key]["error"] = e
+
+        return results
+
+    outcomes = await asyncio.gather(
+        *[save(key, log_dict[dict_key]["records"]) for key, dict_key in keys.items()],
+        return_exceptions=True,
+    )
+
+    for key, outcome in zip(keys, outcomes):
+        if isinstance(outcome, Exception):
+            logger.error(
+                f"Failed to save logs to S3: s3://{key_prefix}/{key}: {outcome}"
+            )
+            results[key]["error"] = outcome
+        else:
+            results[key]["bytes"] = outcome
+
+    if raise_on_error:
+        for result in results.values():
+            if result["error"] is not None:
+                raise result["error"]
+
+    return results
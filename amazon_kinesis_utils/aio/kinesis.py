@@ -0,0 +1,188 @@
+import asyncio
+import inspect
+import logging
+import time
+from typing import List
+
+from .. import kinesis
+from ..metrics import Metrics
+from ..partition_keys import PartitionKeyStrategy, RandomPartitionKeys
+from ..retry import RetryPolicy
+
+logger = logging.getLogger("kinesis_logging_utils")
+logger.setLevel(logging.INFO)
+
+
+async def put_records_batch(
+    client,
+    stream_name: str,
+    records: list,
+    max_retries: int,
+    max_batch_size: int = kinesis.MAX_RECORDS_PER_REQUEST,
+    max_concurrency: int = 1,
+    max_batch_bytes: int = kinesis.MAX_BYTES_PER_REQUEST,
+    retry_policy: RetryPolicy = None,
+    aggregate: bool = False,
+    partition_key_strategy: PartitionKeyStrategy = None,
+    metrics: Metrics = None,
+) -> None or List[dict]:
+    """
+    Async version of kinesis.put_records_batch for asyncio clients (e.g. aiobotocore Kinesis client).
+    Up to max_concurrency PutRecords API calls are in flight at once, limited by a semaphore.
+
+    Backoff between retries uses asyncio.sleep instead of RetryPolicy default time.sleep. Other RetryPolicy sleep
+    functions are called as they are and awaited if they return an awaitable.
+
+    :param client: Async Kinesis API client with put_records coroutine method
+    :param stream_name: Kinesis Data Streams stream name
+    :param records: list of records to send
+    :param max_retries: Maximum retries for resending failed records
+    :param max_batch_size: Maximum number of records sent in a single PutRecords API call
+    :param max_concurrency: Maximum number of PutRecords API calls in flight at once (default = 1, sequential)
+    :param max_batch_bytes: Maximum total size in bytes of records sent in a single PutRecords API call
+    :param retry_policy: Backoff between retries (default = RetryPolicy())
+    :param aggregate: Pack records in KPL aggregated records before sending (see kinesis.aggregate_records)
+    :param partition_key_strategy: Strategy to assign partition keys with (default = RandomPartitionKeys())
+    :param metrics: Metrics to record counters and timings in (see kinesis.put_records_batch)
+    :return: Records failed to put in Kinesis Data Stream after all retries, None if all records were put
+    """
+    if retry_policy is None:
+        retry_policy = RetryPolicy()
+
+    if partition_key_strategy is None:
+        partition_key_strategy = RandomPartitionKeys()
+
+    kinesis_records = kinesis.create_records(records, partition_key_strategy)
+    rejected_records = []
+
+    if aggregate:
+        kinesis_records, rejected_records = kinesis.aggregate_records(
+            kinesis_records,
+            group_by_partition_key=partition_key_strategy.deterministic,
+        )
+
+    batches, failed_records = kinesis.split_records(
+        kinesis_records,
+        max_batch_size=max_batch_size,
+        max_batch_bytes=max_batch_bytes,
+    )
+    failed_records = rejected_records + failed_records
+
+    if len(failed_records) > 0:
+        logger.error(
+            f"{len(failed_records)} records exceed {kinesis.MAX_BYTES_PER_RECORD} bytes, giving up on them"
+        )
+
+    # a failed batch does not stop the remaining batches, so both modes send the same records
+    if max_concurrency <= 1:
+        for batch in batches:
+            batch_failed_records = await _put_records_with_retries(
+                client, stream_name, batch, max_retries, retry_policy, metrics
+            )
+            if batch_failed_records is not None:
+                failed_records.extend(batch_failed_records)
+    else:
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def put(batch: List[dict]):
+            async with semaphore:
+                return await _put_records_with_retries(
+                    client, stream_name, batch, max_retries, retry_policy, metrics
+                )
+
+        # gather keeps results in submission order, so failed records keep the same order as input records
+        for batch_failed_records in await asyncio.gather(*[put(b) for b in batches]):
+            if batch_failed_records is not None:
+                failed_records.extend(batch_failed_records)
+
+    if metrics is not None:
+        metrics.incr("PutRecordsFailedRecords", len(failed_records))
+
+    if len(failed_records) > 0:
+        return failed_records
+
+    return None
+
+
+async def _put_records_with_retries(
+    client,
+    stream_name: str,
+    records_to_send: List[dict],
+    max_retries: int,
+    retry_policy: RetryPolicy,
+    metrics: Metrics = None,
+) -> None or List[dict]:
+    attempt = 0
+
+    while len(records_to_send) > 0:
+        if metrics is None:
+            kinesis_response = await client.put_records(
+                Records=records_to_send,
+                StreamName=stream_name,
+            )
+        else:
+            metrics.incr("PutRecordsRequests")
+            start = metrics.clock()
+            kinesis_response = await client.put_records(
+                Records=records_to_send,
+                StreamName=stream_name,
+            )
+            metrics.timing("PutRecordsLatency", metrics.clock() - start)
+
+        if kinesis_response["FailedRecordCount"] == 0:
+            break
+
+        retry_list = []
+        error_codes = set()
+
+        for index, record in enumerate(kinesis_response["Records"]):
+            if "ErrorCode" in record:
+                logger.error(
+                    f"A record failed with error: {record['ErrorCode']} {record['ErrorMessage']}"
+                )
+                retry_list.append(records_to_send[index])
+                error_codes.add(record["ErrorCode"])
+
+                if metrics is not None:
+                    metrics.incr(f"PutRecordsErrors.{record['ErrorCode']}")
+
+        records_to_send = retry_list
+
+        if attempt >= max_retries:
+            logger.error(f"No retries left, giving up on records: {records_to_send}")
+            return records_to_send
+
+        if not await backoff(retry_policy, attempt, error_codes):
+            logger.error(f"Giving up on records: {records_to_send}")
+            return records_to_send
+
+        if metrics is not None:
+            metrics.incr("PutRecordsRetries")
+
+        attempt += 1
+
+    return None
+
+
+async def backoff(retry_policy: RetryPolicy, attempt: int, error_codes=()) -> bool:
+    """
+    Async version of RetryPolicy.backoff, waiting without blocking event loop
+
+    :param retry_policy: RetryPolicy
+    :param attempt: Number of retries already made (0 for first retry)
+    :param error_codes: Error codes of failed records
+    :return: True if caller should retry, False if deadline would be passed
+    """
+    delay = retry_policy.get_backoff_delay(attempt, error_codes)
+    if delay is None:
+        return False
+
+    if retry_policy.sleep is time.sleep:
+        # default blocking sleep would block event loop
+        await asyncio.sleep(delay)
+    else:
+        result = retry_policy.sleep(delay)
+        if inspect.isawaitable(result):
+            await result
+
+    return True
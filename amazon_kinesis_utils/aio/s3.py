@@ -0,0 +1,52 @@
+import asyncio
+import logging
+from typing import Union
+
+from ..s3 import resolve_codec
+
+logger = logging.getLogger("kinesis_logging_utils")
+logger.setLevel(logging.INFO)
+
+# Data larger than this is compressed in a worker thread instead of blocking event loop
+# (zlib and zstd release GIL while compressing)
+EXECUTOR_COMPRESSION_THRESHOLD = 256 * 1024
+
+
+async def put_str_data(
+    client,
+    bucket: str,
+    key: str,
+    data: Union[str, bytes],
+    gzip_compress: bool = False,
+    compression: str = None,
+    compression_level: int = None,
+) -> int:
+    """
+    Async version of s3.put_str_data for asyncio clients (e.g. aiobotocore S3 client), uploading data with
+    PutObject API
+
+    :param client: Async S3 API client with put_object coroutine method
+    :param bucket: S3 bucket name
+    :param key: S3 object key
+    :param data: Data to save
+    :param gzip_compress: Boolean switch to control gzip compression (default = False)
+    :param compression: Compression codec name ("none", "gzip" or "zstd"), overrides gzip_compress
+    :param compression_level: Compression level (default = codec default, e.g. 6 for gzip)
+    :return: Size of uploaded object in bytes
+    """
+    codec = resolve_codec(gzip_compress, compression)
+
+    if isinstance(data, str):
+        data = data.encode()
+
+    if len(data) >= EXECUTOR_COMPRESSION_THRESHOLD and codec.name != "none":
+        loop = asyncio.get_event_loop()
+        data_p = await loop.run_in_executor(
+            None, codec.compress, data, compression_level
+        )
+    else:
+        data_p = codec.compress(data, compression_level)
+
+    await client.put_object(Bucket=bucket, Key=key, Body=data_p)
+
+    return len(data_p)
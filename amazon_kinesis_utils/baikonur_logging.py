@@ -1,11 +1,15 @@
 import datetime
 import logging
-import uuid
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
-import dateutil.parser
-
-from . import s3
+from . import json_backend
+from .dedup import Deduplicator
+from .metrics import Metrics
 from .misc import dict_get_default
+from .record_buffer import RecordBuffer
+from .routing import RoutingRules
+from .sampled_logging import sampled_logger
+from .timestamps import floor_timestamp, parse_timestamp
 
 logger = logging.getLogger("kinesis_logging_utils")
 
@@ -20,30 +24,189 @@ def parse_payload_to_log_dict(
     log_type_unknown_prefix,
     log_type_whitelist=None,
     timestamp_required=False,
+    compact=False,
+    routing_rules: RoutingRules = None,
+    metrics: Metrics = None,
+    sequence_number: str = None,
 ):
-    logger.debug(f"Parsing normalized payload: {payload}")
-    logger.debug(type(payload))
+    logger.debug("Parsing normalized payload: %s", payload)
 
     # ensure Common Schema requirement: root type must be object
     if type(payload) != dict:
-        logger.info(f"Expected dict payload but got {type(payload)} instead, skipping")
+        sampled_logger.info(
+            f"{type(payload).__name__} payloads skipped",
+            "Expected dict payload but got %s instead, skipping",
+            type(payload),
+        )
+        if metrics is not None:
+            metrics.incr("LogRecordsDropped")
         return
 
-    target_dict = log_dict
+    if routing_rules is not None:
+        # routing rules replace log_type_key and log_type_whitelist
+        route = routing_rules.route(payload)
+        if route is None:
+            if metrics is not None:
+                metrics.incr("LogRecordsDropped")
+            return
 
-    log_type, log_type_missing = dict_get_default(
+        log_type, log_type_missing = route
+        if log_type_missing:
+            sampled_logger.warning(
+                "missing log type",
+                "Cannot retrieve log type from data: %s",
+                payload,
+            )
+    else:
+        log_type, log_type_missing = dict_get_default(
+            payload,
+            key=log_type_key,
+            default=None,
+            verbose=True,
+        )
+
+        if not log_type_missing:
+            if (log_type_whitelist is not None) and (
+                log_type not in log_type_whitelist
+            ):
+                if metrics is not None:
+                    metrics.incr("LogRecordsDropped")
+                return
+
+    failed = _append_payload(
         payload,
-        key=log_type_key,
-        default=None,
-        verbose=True,
+        log_type,
+        log_type_missing,
+        log_dict,
+        failed_dict,
+        log_id_key,
+        log_timestamp_key,
+        log_type_unknown_prefix,
+        timestamp_required,
+        compact,
+        sequence_number,
     )
 
+    if metrics is not None:
+        metrics.incr("LogRecordsFailed" if failed else "LogRecordsOut")
+
+    return
+
+
+def parse_payloads_to_log_dict(
+    payloads,
+    log_dict,
+    failed_dict,
+    log_id_key,
+    log_timestamp_key,
+    log_type_unknown_prefix,
+    routing_rules: RoutingRules,
+    timestamp_required=False,
+    compact=False,
+    metrics: Metrics = None,
+    with_metadata: bool = False,
+):
+    """
+    Batch version of parse_payload_to_log_dict routing records with precompiled routing rules
+
+    :param payloads: Iterable of normalized payloads (e.g. kinesis.parse_records with decode_json=True)
+    :param log_dict: log_dict to append valid records to
+    :param failed_dict: log_dict to append records without log type or timestamp to
+    :param log_id_key: Log ID key name
+    :param log_timestamp_key: Log timestamp key name
+    :param log_type_unknown_prefix: Log type prefix for records in failed_dict
+    :param routing_rules: RoutingRules to route records with
+    :param timestamp_required: Put records without timestamp to failed_dict (default = False)
+    :param compact: Store records serialized to JSON in RecordBuffer instead of list (default = False)
+    :param metrics: Metrics to record counters (LogRecordsIn, LogRecordsOut, LogRecordsFailed, LogRecordsDropped)
+                    and ParseLogRecordsTime timing in
+    :param with_metadata: Payloads are KinesisPayload tuples (kinesis.parse_records with with_metadata=True).
+                          Sequence number of first record of every log_dict entry is kept as
+                          "first_sequence_number", see get_failed_sequence_numbers.
+    """
+    records_in = [0]
+    records_out = records_failed = 0
+    sequence_number = None
+
+    if metrics is not None:
+        start = metrics.clock()
+
+        def count(counted_payloads):
+            # counted while iterating, so payloads (usually a generator) are not materialized in a list
+            for payload in counted_payloads:
+                records_in[0] += 1
+                yield payload
+
+        payloads = count(payloads)
+
+    routed_payloads = payloads
+
+    if with_metadata:
+        current = [None]
+
+        def unwrap(kinesis_payloads):
+            for kinesis_payload in kinesis_payloads:
+                current[0] = kinesis_payload.sequence_number
+                yield kinesis_payload.data
+
+        # route_batch yields every payload before taking next one, so current holds sequence number of
+        # payload being appended
+        routed_payloads = unwrap(payloads)
+
+    for payload, log_type, log_type_missing in routing_rules.route_batch(
+        routed_payloads
+    ):
+        if with_metadata:
+            sequence_number = current[0]
+
+        failed = _append_payload(
+            payload,
+            log_type,
+            log_type_missing,
+            log_dict,
+            failed_dict,
+            log_id_key,
+            log_timestamp_key,
+            log_type_unknown_prefix,
+            timestamp_required,
+            compact,
+            sequence_number,
+        )
+
+        if failed:
+            records_failed += 1
+        else:
+            records_out += 1
+
+    if metrics is not None:
+        metrics.timing("ParseLogRecordsTime", metrics.clock() - start)
+        metrics.incr("LogRecordsIn", records_in[0])
+        metrics.incr("LogRecordsOut", records_out)
+        metrics.incr("LogRecordsFailed", records_failed)
+        metrics.incr("LogRecordsDropped", records_in[0] - records_out - records_failed)
+
+    sampled_logger.flush()
+
+
+def _append_payload(
+    payload: dict,
+    log_type,
+    log_type_missing: bool,
+    log_dict,
+    failed_dict,
+    log_id_key,
+    log_timestamp_key,
+    log_type_unknown_prefix,
+    timestamp_required: bool,
+    compact: bool,
+    sequence_number: str = None,
+) -> bool:
+    # returns True if payload was appended to failed_dict
+    target_dict = log_dict
+
     if log_type_missing:
         target_dict = failed_dict
         log_type = f"{log_type_unknown_prefix}/unknown_type"
-    else:
-        if (log_type_whitelist is not None) and (log_type not in log_type_whitelist):
-            return
 
     timestamp, timestamp_missing = dict_get_default(
         payload,
@@ -63,10 +226,16 @@ def parse_payload_to_log_dict(
 
     # valid data
     append_to_log_dict(
-        target_dict, log_type, payload, log_timestamp=timestamp, log_id=log_id
+        target_dict,
+        log_type,
+        payload,
+        log_timestamp=timestamp,
+        log_id=log_id,
+        compact=compact,
+        sequence_number=sequence_number,
     )
 
-    return
+    return target_dict is failed_dict
 
 
 logger.setLevel(logging.INFO)
@@ -78,54 +247,468 @@ def save_json_logs_to_s3(
     reason: str = "not specified",
     gzip_compress: bool = True,
     key_prefix: str = "",
-):
+    streaming: bool = False,
+    part_size: int = None,
+    compression: str = None,
+    compression_level: int = None,
+    max_workers: int = 1,
+    raise_on_error: bool = True,
+    metrics: Metrics = None,
+    deduplicator: Deduplicator = None,
+) -> Dict[str, dict]:
+    """
+    Save logs in log_dict to S3, one object per log type (newline-separated records)
+
+    :param client: S3 API client (e.g. boto3.client('s3') )
+    :param log_dict: log_dict to save (see append_to_log_dict)
+    :param reason: Reason for saving, used in log messages
+    :param gzip_compress: Boolean switch to control gzip compression (default = True)
+    :param key_prefix: S3 bucket name and S3 object key prefix
+    :param streaming: Compress and upload records incrementally with S3 multipart upload, so memory usage is
+                      bounded by part_size instead of building whole objects in memory (default = False)
+    :param part_size: Size of a single multipart upload part in bytes, used with streaming
+                      (default = s3.DEFAULT_PART_SIZE)
+    :param compression: Compression codec name ("none", "gzip" or "zstd"), overrides gzip_compress.
+                        Object keys get matching file extension (e.g. ".gz").
+    :param compression_level: Compression level (default = codec default, e.g. 6 for gzip)
+    :param max_workers: Maximum number of log types compressed and uploaded at once (default = 1, sequential).
+                        Threads are enough to use multiple cores, as zlib and zstd release GIL while compressing.
+    :param raise_on_error: Raise first upload error after all uploads are finished (default = True).
+                           Sequential mode raises immediately, without trying to upload remaining log types.
+    :param metrics: Metrics to record counters (S3Objects, S3BytesUploaded, S3UploadErrors, S3ObjectsSkipped) and
+                    S3UploadLatency timing (per object, including compression) in
+    :param deduplicator: Skip objects whose "<key_prefix>/<key>#<record count>-<digest of records>" is found in
+                         deduplicator, and add these keys of uploaded objects to it. A retried batch with the same
+                         records produces the same keys, so already uploaded objects are neither compressed nor
+                         uploaded again. Objects with different records are uploaded even if their S3 object key
+                         (derived from first record only) was seen before.
+    :return: Dictionary of S3 object key to upload result:
+             {"log_type": log type, "bytes": uploaded object size or None, "error": exception or None,
+             "skipped": True if object was skipped by deduplicator,
+             "first_sequence_number": sequence number of first record in object or None (see
+             get_failed_sequence_numbers)}
+    :raises ValueError: if two log_dict entries would be saved to the same S3 object key (nothing is uploaded)
+    """
     logger.info(f"Saving logs to S3. Reason: {reason}")
 
-    for log_type in log_dict:
-        timestamp = log_dict[log_type]["first_timestamp"]
-        key = key_prefix + "/" + timestamp.strftime("%Y-%m/%d/%Y-%m-%d-%H:%M:%S-")
+    # s3 module is imported on first save, not when Lambda function is initialized
+    from . import s3
+
+    if part_size is None:
+        part_size = s3.DEFAULT_PART_SIZE
+
+    codec = s3.resolve_codec(gzip_compress, compression)
+
+    def save(key: str, records) -> int:
+        if metrics is None:
+            return upload(key, records)
+
+        try:
+            with metrics.timer("S3UploadLatency"):
+                size = upload(key, records)
+        except Exception:
+            metrics.incr("S3UploadErrors")
+            raise
 
-        key += log_dict[log_type]["first_id"] + ".gz"
+        metrics.incr("S3Objects")
+        metrics.incr("S3BytesUploaded", size)
+        return size
 
-        data = log_dict[log_type]["records"]
-        data = "\n".join(str(f) for f in data)
+    def save_once(key: str, records) -> int:
+        size = save(key, records)
+        if deduplicator is not None:
+            deduplicator.add(dedup_keys[key])
 
+        return size
+
+    def upload(key: str, records) -> int:
         logger.info(f"Saving logs to S3: s3://{key_prefix}/{key}")
-        s3.put_str_data(client, key_prefix, key, data, gzip_compress)
+
+        if streaming:
+            return s3.put_lines(
+                client,
+                key_prefix,
+                key,
+                (str(f) for f in records),
+                part_size=part_size,
+                compression=codec.name,
+                compression_level=compression_level,
+            )
+
+        return s3.put_str_data(
+            client,
+            key_prefix,
+            key,
+            _serialize_records(records),
+            compression=codec.name,
+            compression_level=compression_level,
+        )
+
+    keys = _get_object_keys(log_dict, key_prefix, codec.extension)
+    results = {}
+
+    if deduplicator is not None:
+        dedup_keys = _get_dedup_keys(log_dict, keys, key_prefix)
+        keys, results = _skip_saved_objects(
+            log_dict, keys, key_prefix, dedup_keys, deduplicator, metrics
+        )
+
+    if max_workers <= 1:
+        for key, dict_key in keys.items():
+            results[key] = _new_result(log_dict, dict_key)
+            try:
+                results[key]["bytes"] = save_once(key, log_dict[dict_key]["records"])
+            except Exception as e:
+                logger.error(f"Failed to save logs to S3: s3://{key_prefix}/{key}: {e}")
+                if raise_on_error:
+                    raise
+
+                results[key]["error"] = e
+
+        return results
+
+    # concurrent.futures imports multiprocessing on Python 3.6, import it only when threads are used
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            key: executor.submit(save_once, key, log_dict[dict_key]["records"])
+            for key, dict_key in keys.items()
+        }
+
+        for key, future in futures.items():
+            results[key] = _new_result(log_dict, keys[key])
+            try:
+                results[key]["bytes"] = future.result()
+            except Exception as e:
+                logger.error(f"Failed to save logs to S3: s3://{key_prefix}/{key}: {e}")
+                results[key]["error"] = e
+
+    if raise_on_error:
+        for result in results.values():
+            if result["error"] is not None:
+                raise result["error"]
+
+    return results
+
+
+def get_failed_sequence_numbers(results: Dict[str, dict]) -> List[Optional[str]]:
+    """
+    Get sequence numbers of first records of S3 objects that failed to upload, to build a Lambda partial batch
+    response with kinesis.get_batch_item_failures
+
+    :param results: save_json_logs_to_s3 results (with raise_on_error=False)
+    :return: List of sequence numbers, None for objects without sequence number (records not parsed with
+             with_metadata=True)
+    """
+    return [
+        result["first_sequence_number"]
+        for result in results.values()
+        if result["error"] is not None
+    ]
+
+
+def _get_object_keys(log_dict: dict, key_prefix: str, extension: str) -> dict:
+    # S3 object key -> log_dict key (log type, or partition key for LogPartitioner)
+    keys = {}
+    for dict_key in log_dict:
+        timestamp = log_dict[dict_key]["first_timestamp"]
+        key = key_prefix + "/" + timestamp.strftime("%Y-%m/%d/%Y-%m-%d-%H:%M:%S-")
+
+        key += log_dict[dict_key]["first_id"]
+
+        # rolled over LogPartitioner partitions can start with same second and ID as previous partition
+        if key + extension in keys and isinstance(dict_key, tuple):
+            key += f"-{dict_key[2]}"
+
+        key += extension
+        if key in keys:
+            raise ValueError(
+                f"Log dict entries {keys[key]!r} and {dict_key!r} would be saved to same S3 object {key}"
+            )
+        keys[key] = dict_key
+
+    return keys
+
+
+def _new_result(log_dict: dict, dict_key) -> dict:
+    log_type = log_dict[dict_key].get("log_type", dict_key)
+    return {
+        "log_type": log_type,
+        "bytes": None,
+        "error": None,
+        "skipped": False,
+        "first_sequence_number": log_dict[dict_key].get("first_sequence_number"),
+    }
+
+
+def _get_dedup_keys(log_dict: dict, keys: dict, key_prefix: str) -> dict:
+    # S3 object key -> de-duplication key
+    return {
+        key: _get_dedup_key(key_prefix, key, log_dict[dict_key]["records"])
+        for key, dict_key in keys.items()
+    }
+
+
+def _get_dedup_key(key_prefix: str, key: str, records) -> str:
+    # hashlib imports OpenSSL bindings, import it only when a deduplicator is used
+    import hashlib
+
+    # S3 object key is derived from first record only, a retried batch can hold more or other records under it
+    digest = hashlib.blake2b(digest_size=16)
+    if isinstance(records, RecordBuffer):
+        digest.update(records.getvalue())
+    else:
+        for record in records:
+            digest.update(str(record).encode())
+            digest.update(b"\n")
+
+    return f"{key_prefix}/{key}#{len(records)}-{digest.hexdigest()}"
+
+
+def _skip_saved_objects(
+    log_dict: dict,
+    keys: dict,
+    key_prefix: str,
+    dedup_keys: dict,
+    deduplicator: Deduplicator,
+    metrics: Metrics = None,
+) -> Tuple[dict, dict]:
+    # returns (S3 object keys still to save, results of skipped objects)
+    seen = deduplicator.find_seen(dedup_keys[key] for key in keys)
+    if metrics is not None:
+        metrics.incr("S3ObjectsSkipped", len(seen))
+
+    if not seen:
+        return keys, {}
+
+    remaining = {}
+    skipped = {}
+    for key, dict_key in keys.items():
+        if dedup_keys[key] in seen:
+            logger.info(f"Skipping logs already saved to S3: s3://{key_prefix}/{key}")
+            skipped[key] = _new_result(log_dict, dict_key)
+            skipped[key]["skipped"] = True
+        else:
+            remaining[key] = dict_key
+
+    return remaining, skipped
+
+
+def _serialize_records(records):
+    if isinstance(records, RecordBuffer):
+        # already serialized, no need to join records one by one
+        return records.getvalue()
+
+    return "\n".join(str(f) for f in records)
 
 
 def append_to_log_dict(
-    dictionary: dict, log_type: str, log_data: object, log_timestamp=None, log_id=None
+    dictionary: dict,
+    log_type: str,
+    log_data: object,
+    log_timestamp=None,
+    log_id=None,
+    compact: bool = False,
+    sequence_number: str = None,
 ):
+    """
+    Append a record to log_dict
+
+    :param dictionary: log_dict (dict or LogPartitioner)
+    :param log_type: Log type
+    :param log_data: Record to append
+    :param log_timestamp: Record timestamp, used in S3 object key if record is first of its log type
+    :param log_id: Record ID, used as S3 object key suffix if record is first of its log type
+    :param compact: Store records of a new log type serialized to JSON in a RecordBuffer instead of a list,
+                    which takes several times less memory (default = False). Ignored for LogPartitioner.
+    :param sequence_number: Sequence number of Kinesis record the record came from, kept as
+                            "first_sequence_number" if record is first of its log type
+    """
+    if isinstance(dictionary, LogPartitioner):
+        dictionary.append(log_type, log_data, log_timestamp, log_id, sequence_number)
+        return
+
     if log_type not in dictionary:
         # we've got first record for this type, initialize value for type
+        dictionary[log_type] = _create_log_dict_entry(
+            log_type, log_timestamp, log_id, compact, sequence_number
+        )
+
+    dictionary[log_type]["records"].append(log_data)
 
-        # first record timestamp to use in file path
-        if log_timestamp is None:
-            logger.info(f"No timestamp for first record")
+
+def _create_log_dict_entry(
+    log_type: str,
+    log_timestamp,
+    log_id,
+    compact: bool = False,
+    sequence_number: str = None,
+) -> dict:
+    # first record timestamp to use in file path
+    if log_timestamp is None:
+        logger.info(f"No timestamp for first record")
+        logger.info(f'Falling back to current time for type "{log_type}"')
+        log_timestamp = datetime.datetime.now()
+    else:
+        try:
+            log_timestamp = parse_timestamp(log_timestamp)
+        except (TypeError, ValueError, OverflowError):
+            logger.error(f"Bad timestamp: {log_timestamp}")
             logger.info(f'Falling back to current time for type "{log_type}"')
             log_timestamp = datetime.datetime.now()
-        else:
-            try:
-                log_timestamp = dateutil.parser.parse(log_timestamp)
-            except TypeError:
-                logger.error(f"Bad timestamp: {log_timestamp}")
-                logger.info(f'Falling back to current time for type "{log_type}"')
-                log_timestamp = datetime.datetime.now()
-
-        # first record log_id field to use as filename suffix to prevent duplicate files
-        if log_id is None:
-            log_id = str(uuid.uuid4())
-            logger.info(
-                f"First log record ID is not available, using random ID as filename suffix instead: {log_id}"
+
+    # first record log_id field to use as filename suffix to prevent duplicate files
+    if log_id is None:
+        # uuid imports platform module (slow), only import it when it is needed
+        import uuid
+
+        log_id = str(uuid.uuid4())
+        logger.info(
+            f"First log record ID is not available, using random ID as filename suffix instead: {log_id}"
+        )
+    else:
+        logger.info(f"Using first log record ID as filename suffix: {log_id}")
+
+    return {
+        "records": RecordBuffer() if compact else list(),
+        "first_timestamp": log_timestamp,
+        "first_id": log_id,
+        # records of a Lambda batch come from a single shard in order, so this is the earliest sequence number
+        "first_sequence_number": sequence_number,
+    }
+
+
+class LogPartitioner(dict):
+    """
+    A log_dict that partitions records by log type and time bucket of every record's own timestamp (instead of
+    putting all records of a log type under timestamp of first record), and rolls over to a new partition when
+    a partition reaches a record count or size cap.
+
+    Keys are (log type, time bucket start, partition number) tuples, values have the same structure as
+    log_dict values, so LogPartitioner can be used anywhere a log_dict is used (e.g. append_to_log_dict,
+    parse_payload_to_log_dict and save_json_logs_to_s3).
+
+    Full partitions can be flushed early (e.g. saved to S3) to keep memory usage bounded:
+
+    >>> partitioner = LogPartitioner(
+    ...     max_records=100000,
+    ...     flush=functools.partial(save_json_logs_to_s3, s3_client, key_prefix=bucket, reason="partition full"),
+    ... )
+    """
+
+    def __init__(
+        self,
+        bucket_seconds: int = 3600,
+        max_records: int = None,
+        max_bytes: int = None,
+        flush: Callable[[dict], Any] = None,
+        compact: bool = False,
+    ):
+        """
+        :param bucket_seconds: Time bucket size in seconds (default = 1 hour)
+        :param max_records: Maximum number of records in a single partition (default = unlimited)
+        :param max_bytes: Maximum size of records (serialized to JSON) in a single partition (default = unlimited)
+        :param flush: Function called with a log_dict containing a single full partition, which is then removed
+                      from partitioner. Full partitions are kept in partitioner if not specified.
+        :param compact: Store records serialized to JSON in RecordBuffer instead of list (default = False)
+        """
+        super().__init__()
+
+        self.bucket_seconds = bucket_seconds
+        self.max_records = max_records
+        self.max_bytes = max_bytes
+        self.flush = flush
+        self.compact = compact
+
+        # (log type, time bucket) -> key of partition currently being appended to
+        self._open_partitions = {}
+        self._partition_numbers = {}
+        self._partition_bytes = {}
+
+    def append(
+        self,
+        log_type: str,
+        log_data: object,
+        log_timestamp=None,
+        log_id=None,
+        sequence_number: str = None,
+    ):
+        """
+        Append a record to partition for its log type and time bucket
+
+        :param log_type: Log type
+        :param log_data: Record to append
+        :param log_timestamp: Record timestamp (see timestamps.parse_timestamp), current time if None or invalid
+        :param log_id: Record ID, used as filename suffix if record is first in partition
+        :param sequence_number: Sequence number of Kinesis record the record came from
+        """
+        try:
+            timestamp = parse_timestamp(log_timestamp)
+        except (TypeError, ValueError, OverflowError):
+            timestamp = datetime.datetime.now()
+
+        bucket = floor_timestamp(timestamp, self.bucket_seconds)
+        key = self._open_partitions.get((log_type, bucket))
+
+        if key is None:
+            number = self._partition_numbers.get((log_type, bucket), 0)
+            self._partition_numbers[(log_type, bucket)] = number + 1
+
+            key = (log_type, bucket, number)
+            self._open_partitions[(log_type, bucket)] = key
+            self._partition_bytes[key] = 0
+            self[key] = _create_log_dict_entry(
+                log_type, timestamp, log_id, self.compact, sequence_number
             )
-        else:
-            logger.info(f"Using first log record ID as filename suffix: {log_id}")
+            self[key]["log_type"] = log_type
 
-        dictionary[log_type] = {
-            "records": list(),
-            "first_timestamp": log_timestamp,
-            "first_id": log_id,
-        }
+        partition = self[key]
+        partition["records"].append(log_data)
 
-    dictionary[log_type]["records"].append(log_data)
+        if self.max_bytes is not None:
+            if self.compact:
+                self._partition_bytes[key] = partition["records"].nbytes
+            else:
+                self._partition_bytes[key] += len(json_backend.dumps(log_data))
+
+        if self._is_full(key):
+            self._close_partition(key)
+
+    def flush_all(self):
+        """
+        Flush all partitions with flush function and remove them from partitioner.
+        Does nothing if partitioner has no flush function, so records are not discarded.
+        """
+        if self.flush is None:
+            return
+
+        for key in list(self):
+            self._flush_partition(key)
+            if self._open_partitions.get((key[0], key[1])) == key:
+                del self._open_partitions[(key[0], key[1])]
+
+    def _is_full(self, key) -> bool:
+        if (
+            self.max_records is not None
+            and len(self[key]["records"]) >= self.max_records
+        ):
+            return True
+
+        return (
+            self.max_bytes is not None and self._partition_bytes[key] >= self.max_bytes
+        )
+
+    def _close_partition(self, key):
+        logger.info(f"Partition {key} is full, rolling over to a new partition")
+        del self._open_partitions[(key[0], key[1])]
+
+        if self.flush is not None:
+            self._flush_partition(key)
+
+    def _flush_partition(self, key):
+        # partition is removed only after flush succeeds, so a failed flush does not lose its records
+        self.flush({key: self[key]})
+
+        del self[key]
+        self._partition_bytes.pop(key, None)
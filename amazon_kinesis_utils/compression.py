@@ -0,0 +1,147 @@
+import zlib
+from typing import List
+
+
+class Codec:
+    """
+    Base class for compression codecs used when saving data to S3
+    """
+
+    #: Codec name used to select codec with get_codec
+    name = None
+    #: File extension (including dot) for compressed objects
+    extension = ""
+    #: Compression level used when level is not specified
+    default_level = None
+
+    def compress(self, data: bytes, level: int = None) -> bytes:
+        """
+        Compress data in one shot
+
+        :param data: Data to compress
+        :param level: Compression level (default = default_level)
+        :return: Compressed data
+        """
+        compressor = self.compressor(level)
+        return compressor.compress(data) + compressor.flush()
+
+    def compressor(self, level: int = None):
+        """
+        Create an incremental compressor
+
+        :param level: Compression level (default = default_level)
+        :return: Object with compress(data) -> bytes and flush() -> bytes methods (like zlib.compressobj)
+        """
+        raise NotImplementedError
+
+
+class _RawCompressor:
+    def compress(self, data: bytes) -> bytes:
+        return data
+
+    def flush(self) -> bytes:
+        return b""
+
+
+class RawCodec(Codec):
+    """
+    No compression
+    """
+
+    name = "none"
+
+    def compress(self, data: bytes, level: int = None) -> bytes:
+        return data
+
+    def compressor(self, level: int = None):
+        return _RawCompressor()
+
+
+class GzipCodec(Codec):
+    """
+    gzip compression with zlib (releases GIL while compressing)
+    """
+
+    name = "gzip"
+    extension = ".gz"
+    # zlib default level: levels above 6 cost a lot more CPU for a few percent smaller JSON logs
+    default_level = 6
+
+    def compressor(self, level: int = None):
+        if level is None:
+            level = self.default_level
+
+        # wbits=16+MAX_WBITS makes zlib write gzip header and trailer
+        # (zlib.compress accepts wbits only since Python 3.11, so one-shot compression uses Codec.compress)
+        return zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+
+class ZstdCodec(Codec):
+    """
+    Zstandard compression, requires zstandard package (pip install zstandard)
+    """
+
+    name = "zstd"
+    extension = ".zst"
+    default_level = 3
+
+    def __init__(self):
+        # zstandard is an optional dependency, import it only when codec is used
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError(
+                "zstandard package is required for zstd compression: pip install zstandard"
+            )
+
+        self._zstandard = zstandard
+
+    def compress(self, data: bytes, level: int = None) -> bytes:
+        if level is None:
+            level = self.default_level
+
+        return self._zstandard.ZstdCompressor(level=level).compress(data)
+
+    def compressor(self, level: int = None):
+        if level is None:
+            level = self.default_level
+
+        return self._zstandard.ZstdCompressor(level=level).compressobj()
+
+
+CODECS = {
+    RawCodec.name: RawCodec,
+    GzipCodec.name: GzipCodec,
+    ZstdCodec.name: ZstdCodec,
+}
+
+
+def get_codec(name: str) -> Codec:
+    """
+    Get compression codec by name
+
+    :param name: Codec name ("none", "gzip" or "zstd")
+    :return: Codec
+    """
+    if name not in CODECS:
+        raise ValueError(
+            f"Unknown compression codec: {name}, available codecs: {list(CODECS)}"
+        )
+
+    return CODECS[name]()
+
+
+def available_codecs() -> List[str]:
+    """
+    :return: Names of codecs usable in current environment (optional dependencies installed)
+    """
+    available = []
+    for name in CODECS:
+        try:
+            get_codec(name)
+        except ImportError:
+            continue
+
+        available.append(name)
+
+    return available
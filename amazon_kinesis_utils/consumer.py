@@ -0,0 +1,472 @@
+import base64
+import datetime
+import logging
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from .kinesis import parse_records
+from .metrics import Metrics
+from .retry import RetryPolicy
+
+logger = logging.getLogger("kinesis_logging_utils")
+logger.setLevel(logging.INFO)
+
+# GetRecords API limits: 5 calls per second per shard, up to 10000 records per call
+# https://docs.aws.amazon.com/kinesis/latest/APIReference/API_GetRecords.html
+MAX_GET_RECORDS_LIMIT = 10000
+DEFAULT_MIN_POLL_INTERVAL = 0.2
+DEFAULT_MAX_POLL_INTERVAL = 5.0
+
+#: Checkpoint of a closed shard that has been consumed to the end
+SHARD_END = "SHARD_END"
+
+
+class CheckpointStore:
+    """
+    Base class for checkpoint storage: last processed sequence number per stream and shard
+    """
+
+    def get_checkpoint(self, stream_name: str, shard_id: str) -> Optional[str]:
+        """
+        :return: Last processed sequence number (or SHARD_END), None if shard was never checkpointed
+        """
+        raise NotImplementedError
+
+    def set_checkpoint(self, stream_name: str, shard_id: str, sequence_number: str):
+        """
+        :param stream_name: Kinesis Data Streams stream name
+        :param shard_id: Shard ID
+        :param sequence_number: Last processed sequence number (or SHARD_END)
+        """
+        raise NotImplementedError
+
+
+class InMemoryCheckpointStore(CheckpointStore):
+    """
+    Checkpoints kept in memory (lost when process exits), for tests and at-least-once consumers that can start
+    over from iterator type on every start
+    """
+
+    def __init__(self):
+        self.checkpoints = {}
+
+    def get_checkpoint(self, stream_name: str, shard_id: str) -> Optional[str]:
+        return self.checkpoints.get((stream_name, shard_id))
+
+    def set_checkpoint(self, stream_name: str, shard_id: str, sequence_number: str):
+        self.checkpoints[(stream_name, shard_id)] = sequence_number
+
+
+class SQLiteCheckpointStore(CheckpointStore):
+    """
+    Checkpoints in a local SQLite database, shared by all shard workers of a process
+    """
+
+    def __init__(self, path: str = ":memory:"):
+        """
+        :param path: SQLite database file path (default = in-memory database)
+        """
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+
+        with self._lock, self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS checkpoints ("
+                "stream_name TEXT NOT NULL, shard_id TEXT NOT NULL, sequence_number TEXT NOT NULL, "
+                "PRIMARY KEY (stream_name, shard_id))"
+            )
+
+    def get_checkpoint(self, stream_name: str, shard_id: str) -> Optional[str]:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT sequence_number FROM checkpoints WHERE stream_name = ? AND shard_id = ?",
+                (stream_name, shard_id),
+            ).fetchone()
+
+        return row[0] if row is not None else None
+
+    def set_checkpoint(self, stream_name: str, shard_id: str, sequence_number: str):
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO checkpoints (stream_name, shard_id, sequence_number) VALUES (?, ?, ?)",
+                (stream_name, shard_id, sequence_number),
+            )
+
+    def close(self):
+        self._connection.close()
+
+
+def to_lambda_records(
+    records: List[dict], shard_id: str, event_source_arn: str = None
+) -> List[dict]:
+    """
+    Convert records returned by GetRecords API to Lambda Kinesis event record format, so they can be passed to
+    parse_records and other functions of this package
+
+    :param records: Records from GetRecords API response
+    :param shard_id: ID of shard records were read from
+    :param event_source_arn: Stream ARN (optional)
+    :return: Records in Lambda event format
+    """
+    lambda_records = []
+
+    for record in records:
+        arrival = record.get("ApproximateArrivalTimestamp")
+        if isinstance(arrival, datetime.datetime):
+            arrival = arrival.timestamp()
+
+        lambda_records.append(
+            {
+                "kinesis": {
+                    "kinesisSchemaVersion": "1.0",
+                    "partitionKey": record["PartitionKey"],
+                    "sequenceNumber": record["SequenceNumber"],
+                    "data": base64.b64encode(record["Data"]).decode(),
+                    "approximateArrivalTimestamp": arrival,
+                },
+                "eventSource": "aws:kinesis",
+                "eventID": f"{shard_id}:{record['SequenceNumber']}",
+                "eventSourceARN": event_source_arn,
+            }
+        )
+
+    return lambda_records
+
+
+def _get_error_code(e: Exception) -> Optional[str]:
+    # botocore ClientError
+    response = getattr(e, "response", None)
+    if isinstance(response, dict):
+        return response.get("Error", {}).get("Code")
+
+    return None
+
+
+class ShardConsumer:
+    """
+    Polling consumer of a single shard. Records are read with GetRecords API, parsed with parse_records and passed
+    to processor function, then last sequence number of every batch is checkpointed.
+
+    Next GetRecords call is made in a background thread while current batch is processed. Poll interval adapts to
+    stream: empty responses double the interval (up to max_poll_interval), while a response with records resets it
+    to min_poll_interval.
+    """
+
+    def __init__(
+        self,
+        client,
+        stream_name: str,
+        shard_id: str,
+        processor: Callable[[list, str], None],
+        checkpoint_store: CheckpointStore,
+        iterator_type: str = "TRIM_HORIZON",
+        limit: int = MAX_GET_RECORDS_LIMIT,
+        min_poll_interval: float = DEFAULT_MIN_POLL_INTERVAL,
+        max_poll_interval: float = DEFAULT_MAX_POLL_INTERVAL,
+        decode_json: bool = False,
+        with_metadata: bool = True,
+        retry_policy: RetryPolicy = None,
+        stop_event: threading.Event = None,
+        metrics: Metrics = None,
+    ):
+        """
+        :param client: Kinesis API client (e.g. boto3.client('kinesis') )
+        :param stream_name: Kinesis Data Streams stream name
+        :param shard_id: Shard ID
+        :param processor: Function called with (payloads, shard ID) for every GetRecords batch, payloads are
+                          parse_records output. Batch is checkpointed after processor returns.
+        :param checkpoint_store: CheckpointStore to resume from and save checkpoints to
+        :param iterator_type: Shard iterator type used when shard has no checkpoint ("TRIM_HORIZON" or "LATEST")
+        :param limit: Maximum number of records per GetRecords call
+        :param min_poll_interval: Minimum seconds between GetRecords calls (5 calls per second per shard limit)
+        :param max_poll_interval: Maximum seconds between GetRecords calls when shard is idle
+        :param decode_json: See parse_records
+        :param with_metadata: See parse_records (default = True, so processor gets sequence numbers)
+        :param retry_policy: Backoff between GetRecords retries when throttled (default = RetryPolicy())
+        :param stop_event: Event to stop consumer with (default = new Event, see stop)
+        :param metrics: Metrics to record parse_records counters in
+        """
+        self.client = client
+        self.stream_name = stream_name
+        self.shard_id = shard_id
+        self.processor = processor
+        self.checkpoint_store = checkpoint_store
+        self.iterator_type = iterator_type
+        self.limit = limit
+        self.min_poll_interval = min_poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.decode_json = decode_json
+        self.with_metadata = with_metadata
+        self.retry_policy = retry_policy if retry_policy is not None else RetryPolicy()
+        self.stop_event = stop_event if stop_event is not None else threading.Event()
+        self.metrics = metrics
+
+        #: True when a closed shard has been consumed to the end
+        self.finished = False
+        # last sequence number received (not necessarily processed yet), to get a new iterator if it expires
+        self._last_received = None
+
+    def stop(self):
+        self.stop_event.set()
+
+    def run(self):
+        """
+        Consume shard until it ends or consumer is stopped. Exceptions raised by processor stop consumer and
+        are raised from run, so batch that failed is read again from last checkpoint on next start.
+        """
+        checkpoint = self.checkpoint_store.get_checkpoint(
+            self.stream_name, self.shard_id
+        )
+        if checkpoint == SHARD_END:
+            self.finished = True
+            return
+
+        self._last_received = checkpoint
+        iterator = self._get_shard_iterator()
+        interval = self.min_poll_interval
+
+        with ThreadPoolExecutor(max_workers=1) as prefetcher:
+            future = prefetcher.submit(self._get_records, iterator, 0.0)
+
+            while True:
+                response = future.result()
+                if response is None:
+                    # stopped while waiting for next poll
+                    return
+
+                records = response["Records"]
+                next_iterator = response.get("NextShardIterator")
+                if records:
+                    self._last_received = records[-1]["SequenceNumber"]
+
+                # fetch next batch while current batch is processed
+                interval = self._next_poll_interval(response, interval)
+                if next_iterator is not None and not self.stop_event.is_set():
+                    future = prefetcher.submit(
+                        self._get_records, next_iterator, interval
+                    )
+
+                if records:
+                    try:
+                        self._process(records)
+                    except Exception:
+                        # cancel prefetch wait, batch is read again from checkpoint on next start
+                        self.stop()
+                        raise
+
+                if next_iterator is None:
+                    logger.info(f"Shard {self.shard_id} has ended")
+                    self.checkpoint_store.set_checkpoint(
+                        self.stream_name, self.shard_id, SHARD_END
+                    )
+                    self.finished = True
+                    return
+
+                if self.stop_event.is_set():
+                    return
+
+    def _process(self, records: List[dict]):
+        payloads = list(
+            parse_records(
+                to_lambda_records(records, self.shard_id),
+                decode_json=self.decode_json,
+                with_metadata=self.with_metadata,
+                metrics=self.metrics,
+            )
+        )
+        self.processor(payloads, self.shard_id)
+
+        self.checkpoint_store.set_checkpoint(
+            self.stream_name, self.shard_id, records[-1]["SequenceNumber"]
+        )
+
+    def _next_poll_interval(self, response: dict, interval: float) -> float:
+        if not response["Records"]:
+            # idle shard: back off
+            return min(self.max_poll_interval, max(interval, 0.05) * 2)
+
+        # records arrived (catching up or active at the tip of the stream): poll again as soon as allowed,
+        # so a shard that was idle before does not keep polling at backed off interval
+        return self.min_poll_interval
+
+    def _get_shard_iterator(self) -> str:
+        kwargs = {"StreamName": self.stream_name, "ShardId": self.shard_id}
+
+        if self._last_received is not None:
+            kwargs["ShardIteratorType"] = "AFTER_SEQUENCE_NUMBER"
+            kwargs["StartingSequenceNumber"] = self._last_received
+        else:
+            kwargs["ShardIteratorType"] = self.iterator_type
+
+        return self.client.get_shard_iterator(**kwargs)["ShardIterator"]
+
+    def _get_records(self, iterator: str, delay: float) -> Optional[dict]:
+        attempt = 0
+
+        while True:
+            # wait is interrupted by stop
+            if self.stop_event.wait(delay):
+                return None
+
+            try:
+                return self.client.get_records(ShardIterator=iterator, Limit=self.limit)
+            except Exception as e:
+                error_code = _get_error_code(e)
+
+                if error_code == "ExpiredIteratorException":
+                    logger.info(f"Shard iterator of {self.shard_id} expired, renewing")
+                    iterator = self._get_shard_iterator()
+                    delay = 0.0
+                elif error_code == "ProvisionedThroughputExceededException":
+                    logger.warning(f"GetRecords throttled on {self.shard_id}")
+                    delay = self.retry_policy.get_backoff_delay(attempt, [error_code])
+                    if delay is None:
+                        raise
+                else:
+                    raise
+
+                attempt += 1
+
+
+class StreamConsumer:
+    """
+    Polling consumer of a whole stream with one ShardConsumer worker thread per shard.
+    Child shards created by resharding are consumed after their parent shards have ended, keeping order of records
+    with the same partition key.
+    """
+
+    def __init__(
+        self,
+        client,
+        stream_name: str,
+        processor: Callable[[list, str], None],
+        checkpoint_store: CheckpointStore,
+        shard_refresh_interval: float = 10.0,
+        **shard_consumer_kwargs,
+    ):
+        """
+        :param client: Kinesis API client (e.g. boto3.client('kinesis') ), shared by all workers
+        :param stream_name: Kinesis Data Streams stream name
+        :param processor: Function called with (payloads, shard ID) for every batch, from shard worker threads
+        :param checkpoint_store: CheckpointStore shared by all workers
+        :param shard_refresh_interval: Seconds between ListShards calls to discover new shards
+        :param shard_consumer_kwargs: Other arguments for ShardConsumer
+        """
+        self.client = client
+        self.stream_name = stream_name
+        self.processor = processor
+        self.checkpoint_store = checkpoint_store
+        self.shard_refresh_interval = shard_refresh_interval
+        self.shard_consumer_kwargs = shard_consumer_kwargs
+        self.stop_event = threading.Event()
+
+        self.consumers: Dict[str, ShardConsumer] = {}
+        self._threads: Dict[str, threading.Thread] = {}
+        self._errors: Dict[str, Exception] = {}
+        # set by workers when they exit, so child shards are started without waiting for next refresh
+        self._wakeup = threading.Event()
+
+    def stop(self):
+        self.stop_event.set()
+        self._wakeup.set()
+
+    def run(self):
+        """
+        Consume stream until all shards have ended (e.g. a deleted stream) or consumer is stopped.
+        If a shard worker fails, all workers are stopped and its exception is raised.
+        """
+        try:
+            while not self.stop_event.is_set() and not self._errors:
+                self._wakeup.clear()
+                # workers are checked before listing shards, so a parent that ended in between is seen as finished
+                running = any(t.is_alive() for t in self._threads.values())
+                started = self._start_new_shards()
+
+                if not started and not running:
+                    break
+
+                self._wakeup.wait(self.shard_refresh_interval)
+        finally:
+            self.stop()
+            for thread in self._threads.values():
+                thread.join()
+
+        if self._errors:
+            shard_id, error = next(iter(self._errors.items()))
+            logger.error(f"Shard worker {shard_id} failed: {error}")
+            raise error
+
+    def _list_shards(self) -> List[dict]:
+        shards = []
+        kwargs = {"StreamName": self.stream_name}
+
+        while True:
+            response = self.client.list_shards(**kwargs)
+            shards.extend(response["Shards"])
+
+            if not response.get("NextToken"):
+                return shards
+
+            kwargs = {"NextToken": response["NextToken"]}
+
+    def _start_new_shards(self) -> bool:
+        started = False
+        shards = self._list_shards()
+        shard_ids = {shard["ShardId"] for shard in shards}
+
+        for shard in shards:
+            shard_id = shard["ShardId"]
+            if shard_id in self.consumers:
+                continue
+
+            parent_ids = [
+                shard.get("ParentShardId"),
+                shard.get("AdjacentParentShardId"),
+            ]
+            if any(not self._is_shard_ended(p) for p in parent_ids if p in shard_ids):
+                # start child shard after its parents have ended, parents past retention period are not listed
+                continue
+
+            consumer = ShardConsumer(
+                self.client,
+                self.stream_name,
+                shard_id,
+                self.processor,
+                self.checkpoint_store,
+                stop_event=self.stop_event,
+                **self.shard_consumer_kwargs,
+            )
+            thread = threading.Thread(
+                target=self._run_worker,
+                args=(consumer,),
+                name=f"kinesis-consumer-{shard_id}",
+                daemon=True,
+            )
+
+            self.consumers[shard_id] = consumer
+            self._threads[shard_id] = thread
+            thread.start()
+            started = True
+
+        return started
+
+    def _is_shard_ended(self, shard_id: str) -> bool:
+        # a parent that was not started yet (e.g. waiting for its own parent) blocks its children as well
+        consumer = self.consumers.get(shard_id)
+        if consumer is not None:
+            return consumer.finished
+
+        return (
+            self.checkpoint_store.get_checkpoint(self.stream_name, shard_id)
+            == SHARD_END
+        )
+
+    def _run_worker(self, consumer: ShardConsumer):
+        try:
+            consumer.run()
+        except Exception as e:
+            self._errors[consumer.shard_id] = e
+        finally:
+            self._wakeup.set()
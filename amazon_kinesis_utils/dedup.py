@@ -0,0 +1,291 @@
+import collections
+import math
+import threading
+from typing import Iterable, Set
+
+DEFAULT_LRU_MAX_SIZE = 100000
+DEFAULT_BLOOM_CAPACITY = 1000000
+DEFAULT_BLOOM_FALSE_POSITIVE_RATE = 0.001
+
+# SQLite default maximum number of host parameters in a single statement is 999
+SQLITE_MAX_PARAMETERS = 500
+
+
+class Deduplicator:
+    """
+    Base class for de-duplication caches of already processed keys (e.g. Kinesis sequence numbers or S3 object
+    keys), used to skip work when a failed Lambda batch is retried.
+
+    Subclasses implement contains and add. find_seen and add_many can be overridden for backends that can check
+    or store many keys at once (e.g. a database).
+    """
+
+    def contains(self, key: str) -> bool:
+        """
+        :param key: Key to check
+        :return: True if key was added before
+        """
+        raise NotImplementedError
+
+    def add(self, key: str):
+        """
+        :param key: Key to mark as processed
+        """
+        raise NotImplementedError
+
+    def find_seen(self, keys: Iterable[str]) -> Set[str]:
+        """
+        :param keys: Keys to check
+        :return: Set of keys that were added before
+        """
+        return {key for key in keys if self.contains(key)}
+
+    def add_many(self, keys: Iterable[str]):
+        """
+        :param keys: Keys to mark as processed
+        """
+        for key in keys:
+            self.add(key)
+
+
+class _CachedDeduplicator(Deduplicator):
+    """
+    In-memory de-duplication cache with an optional persistent backend, checked on cache misses and written
+    through on add. Subclasses implement _cached and _remember.
+    """
+
+    backend: Deduplicator = None
+
+    def contains(self, key: str) -> bool:
+        if self._cached(key):
+            return True
+
+        if self.backend is not None and self.backend.contains(key):
+            self._remember(key)
+            return True
+
+        return False
+
+    def find_seen(self, keys: Iterable[str]) -> Set[str]:
+        keys = list(keys)
+        seen = {key for key in keys if self._cached(key)}
+
+        if self.backend is not None:
+            # misses are checked with a single backend call
+            found = self.backend.find_seen([key for key in keys if key not in seen])
+            for key in found:
+                self._remember(key)
+            seen.update(found)
+
+        return seen
+
+    def add(self, key: str):
+        self._remember(key)
+
+        if self.backend is not None:
+            self.backend.add(key)
+
+    def add_many(self, keys: Iterable[str]):
+        keys = list(keys)
+        for key in keys:
+            self._remember(key)
+
+        if self.backend is not None:
+            self.backend.add_many(keys)
+
+    def _cached(self, key: str) -> bool:
+        raise NotImplementedError
+
+    def _remember(self, key: str):
+        raise NotImplementedError
+
+
+class LRUDeduplicator(_CachedDeduplicator):
+    """
+    Exact de-duplication cache remembering max_size most recently used keys.
+    Optional backend (e.g. SQLiteDeduplicator) is checked on cache misses and written through on add.
+    """
+
+    def __init__(
+        self, max_size: int = DEFAULT_LRU_MAX_SIZE, backend: Deduplicator = None
+    ):
+        """
+        :param max_size: Maximum number of keys kept in memory
+        :param backend: Persistent Deduplicator behind in-memory cache (optional)
+        """
+        self.max_size = max_size
+        self.backend = backend
+
+        self._keys = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def _cached(self, key: str) -> bool:
+        with self._lock:
+            if key in self._keys:
+                self._keys.move_to_end(key)
+                return True
+
+        return False
+
+    def _remember(self, key: str):
+        with self._lock:
+            self._keys[key] = None
+            self._keys.move_to_end(key)
+
+            while len(self._keys) > self.max_size:
+                self._keys.popitem(last=False)
+
+
+class BloomDeduplicator(_CachedDeduplicator):
+    """
+    Probabilistic de-duplication cache with fixed memory usage (about 1.8 MiB per filter for 1 million keys at
+    0.1% false positive rate).
+
+    A false positive makes a key look processed when it was not, so work for it is skipped: choose
+    false_positive_rate accordingly. When capacity keys have been added, current filter is kept as previous filter
+    and a new filter is started, so memory stays bounded (at most two filters) and oldest keys are forgotten.
+    """
+
+    def __init__(
+        self,
+        capacity: int = DEFAULT_BLOOM_CAPACITY,
+        false_positive_rate: float = DEFAULT_BLOOM_FALSE_POSITIVE_RATE,
+        backend: Deduplicator = None,
+    ):
+        """
+        :param capacity: Number of keys per filter
+        :param false_positive_rate: False positive rate of a filter holding capacity keys
+        :param backend: Persistent Deduplicator checked when filters do not contain a key (optional)
+        """
+        self.capacity = capacity
+        self.false_positive_rate = false_positive_rate
+        self.backend = backend
+
+        # optimal number of bits and hash functions:
+        # https://en.wikipedia.org/wiki/Bloom_filter#Optimal_number_of_hash_functions
+        self.num_bits = max(
+            8,
+            int(
+                math.ceil(-capacity * math.log(false_positive_rate) / math.log(2) ** 2)
+            ),
+        )
+        self.num_hashes = max(1, int(round(self.num_bits / capacity * math.log(2))))
+
+        self._bits = bytearray((self.num_bits + 7) // 8)
+        self._previous_bits = None
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def _cached(self, key: str) -> bool:
+        positions = self._positions(key)
+
+        with self._lock:
+            return self._test(self._bits, positions) or (
+                self._previous_bits is not None
+                and self._test(self._previous_bits, positions)
+            )
+
+    def _remember(self, key: str):
+        positions = self._positions(key)
+
+        with self._lock:
+            if self._count >= self.capacity:
+                self._previous_bits = self._bits
+                self._bits = bytearray(len(self._bits))
+                self._count = 0
+
+            bits = self._bits
+            for position in positions:
+                bits[position >> 3] |= 1 << (position & 7)
+
+            self._count += 1
+
+    def _positions(self, key: str) -> list:
+        # hashlib imports OpenSSL bindings, import it only when a filter is used
+        import hashlib
+
+        # double hashing: k positions derived from two 64-bit halves of a single digest
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    @staticmethod
+    def _test(bits: bytearray, positions: list) -> bool:
+        for position in positions:
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+
+        return True
+
+
+class SQLiteDeduplicator(Deduplicator):
+    """
+    Persistent de-duplication store in a local SQLite database, e.g. in Lambda /tmp (kept while execution
+    environment is reused) or on a consumer host. Use it as backend of LRUDeduplicator or BloomDeduplicator to
+    avoid a query for every key.
+    """
+
+    def __init__(self, path: str = ":memory:", max_entries: int = None):
+        """
+        :param path: SQLite database file path (default = in-memory database)
+        :param max_entries: Maximum number of keys kept, oldest keys are deleted first (default = keep all keys)
+        """
+        # sqlite3 is imported only when it is used, so that importing this module stays cheap
+        import sqlite3
+
+        self.max_entries = max_entries
+
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+
+        with self._lock, self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS seen_keys (id INTEGER PRIMARY KEY, key TEXT NOT NULL UNIQUE)"
+            )
+
+    def contains(self, key: str) -> bool:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT 1 FROM seen_keys WHERE key = ?", (key,)
+            ).fetchone()
+
+        return row is not None
+
+    def find_seen(self, keys: Iterable[str]) -> Set[str]:
+        keys = list(keys)
+        seen = set()
+
+        with self._lock:
+            for i in range(0, len(keys), SQLITE_MAX_PARAMETERS):
+                chunk = keys[i : i + SQLITE_MAX_PARAMETERS]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._connection.execute(
+                    f"SELECT key FROM seen_keys WHERE key IN ({placeholders})", chunk
+                )
+                seen.update(row[0] for row in rows)
+
+        return seen
+
+    def add(self, key: str):
+        self.add_many([key])
+
+    def add_many(self, keys: Iterable[str]):
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT OR IGNORE INTO seen_keys (key) VALUES (?)",
+                ((key,) for key in keys),
+            )
+
+            if self.max_entries is not None:
+                self._connection.execute(
+                    "DELETE FROM seen_keys WHERE id <= (SELECT MAX(id) FROM seen_keys) - ?",
+                    (self.max_entries,),
+                )
+
+    def close(self):
+        self._connection.close()
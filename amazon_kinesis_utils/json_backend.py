@@ -0,0 +1,159 @@
+import json
+import logging
+from typing import Any, Callable, List
+
+logger = logging.getLogger("kinesis_logging_utils")
+logger.setLevel(logging.INFO)
+
+# All supported backends raise ValueError (or a subclass, e.g. json.JSONDecodeError) on invalid JSON
+DecodeError = ValueError
+
+
+class JSONBackend:
+    """
+    A pair of JSON loads/dumps functions. loads accepts str and returns Python objects like json.loads,
+    dumps returns str like json.dumps (without whitespace after separators).
+    """
+
+    def __init__(
+        self, name: str, loads: Callable[[str], Any], dumps: Callable[[Any], str]
+    ):
+        """
+        :param name: Backend name
+        :param loads: Function to decode JSON str
+        :param dumps: Function to encode object as JSON str
+        """
+        self.name = name
+        self.loads = loads
+        self.dumps = dumps
+
+    def __repr__(self):
+        return f"JSONBackend({self.name!r})"
+
+
+def _create_json_backend() -> JSONBackend:
+    encoder = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False)
+    return JSONBackend("json", json.loads, encoder.encode)
+
+
+def _create_orjson_backend() -> JSONBackend:
+    import orjson
+
+    def dumps(obj) -> str:
+        return orjson.dumps(obj).decode()
+
+    return JSONBackend("orjson", orjson.loads, dumps)
+
+
+def _create_simdjson_backend() -> JSONBackend:
+    import simdjson
+
+    # pysimdjson only parses JSON, use stdlib for encoding
+    return JSONBackend("simdjson", simdjson.loads, _create_json_backend().dumps)
+
+
+# used until another backend is selected with set_backend
+DEFAULT_BACKEND = "json"
+
+# in order of preference for automatic selection
+_BACKEND_FACTORIES = {
+    "orjson": _create_orjson_backend,
+    "simdjson": _create_simdjson_backend,
+    "json": _create_json_backend,
+}
+
+_backend = None
+
+
+def register_backend(backend: JSONBackend, preferred: bool = False):
+    """
+    Register a custom JSON backend
+
+    :param backend: JSONBackend to register
+    :param preferred: Prefer this backend over built-in ones in automatic selection
+    """
+    global _BACKEND_FACTORIES
+
+    factories = {k: v for k, v in _BACKEND_FACTORIES.items() if k != backend.name}
+    if preferred:
+        factories = {backend.name: lambda: backend, **factories}
+    else:
+        factories[backend.name] = lambda: backend
+
+    _BACKEND_FACTORIES = factories
+
+
+def available_backends() -> List[str]:
+    """
+    :return: Names of JSON backends usable in current environment, in order of preference
+    """
+    available = []
+    for name, factory in _BACKEND_FACTORIES.items():
+        try:
+            factory()
+        except ImportError:
+            continue
+
+        available.append(name)
+
+    return available
+
+
+def set_backend(name: str = None) -> JSONBackend:
+    """
+    Select JSON backend used by this package (standard json module is used until a backend is selected).
+
+    Backends can decode numbers differently from json module: e.g. orjson decodes integers larger than 64 bits as
+    float (losing precision), which is then written to S3 as well. Only opt in to a faster backend if records do not
+    contain such numbers.
+
+    :param name: Backend name ("orjson", "simdjson", "json" or a registered custom backend),
+                 None to select fastest installed backend
+    :return: Selected JSONBackend
+    """
+    global _backend
+
+    if name is None:
+        name = available_backends()[0]
+
+    if name not in _BACKEND_FACTORIES:
+        raise ValueError(
+            f"Unknown JSON backend: {name}, available backends: {available_backends()}"
+        )
+
+    _backend = _BACKEND_FACTORIES[name]()
+    logger.debug(f"Using JSON backend: {_backend.name}")
+
+    return _backend
+
+
+def get_backend() -> JSONBackend:
+    """
+    Get JSON backend used by this package, standard json module if no backend was selected with set_backend
+
+    :return: JSONBackend
+    """
+    if _backend is None:
+        return set_backend(DEFAULT_BACKEND)
+
+    return _backend
+
+
+def loads(data: str) -> Any:
+    """
+    Decode JSON str with selected backend
+
+    :param data: JSON str
+    :return: Decoded object
+    """
+    return get_backend().loads(data)
+
+
+def dumps(obj: Any) -> str:
+    """
+    Encode object as JSON str with selected backend
+
+    :param obj: Object to encode
+    :return: JSON str
+    """
+    return get_backend().dumps(obj)
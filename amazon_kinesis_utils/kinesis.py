@@ -1,19 +1,49 @@
-import base64
-import gzip
+import binascii
 import logging
-import random
-import string
-import time
-from json import JSONDecodeError, loads
-from typing import List, Generator
-
-from aws_kinesis_agg.deaggregator import iter_deaggregate_records
-
+import zlib
+from functools import partial
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Iterable,
+    List,
+    Generator,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
+
+from . import json_backend
+from .dedup import Deduplicator
+from .metrics import Metrics
 from .misc import split_list
+from .partition_keys import (
+    PartitionKeyStrategy,
+    RandomPartitionKeys,
+    random_partition_keys,
+)
+from .retry import RetryPolicy
+from .sampled_logging import sampled_logger
+
+if TYPE_CHECKING:
+    from concurrent.futures import Executor
 
 logger = logging.getLogger("kinesis_logging_utils")
 logger.setLevel(logging.INFO)
 
+# PutRecords API limits:
+# https://docs.aws.amazon.com/kinesis/latest/APIReference/API_PutRecords.html
+MAX_RECORDS_PER_REQUEST = 500
+MAX_BYTES_PER_REQUEST = 5 * 1024 * 1024
+MAX_BYTES_PER_RECORD = 1024 * 1024
+MAX_PARTITION_KEY_LENGTH = 256
+
+# KPL aggregated record magic number:
+# https://github.com/awslabs/amazon-kinesis-producer/blob/master/aggregation-format.md
+KPL_MAGIC = b"\xf3\x89\x9a\xc2"
+KPL_MAGIC_LENGTH = len(KPL_MAGIC)
+GZIP_MAGIC = b"\x1f\x8b"
+
 
 class KinesisException(Exception):
     """
@@ -32,34 +62,61 @@ def normalize_cloudwatch_messages(payload: str) -> List[str]:
     :return: List of normalized raw data
              (CloudWatch Logs subscription filters may send multiple log events in one payload)
     """
+    messages, _ = normalize_cloudwatch_messages_parsed(payload)
+    return messages
+
+
+def normalize_cloudwatch_messages_parsed(payload: str) -> Tuple[List[str], Any]:
+    """
+    Normalize messages from CloudWatch Logs subscription filters and pass through other data, also returning
+    payload decoded from JSON if it had to be decoded, so callers do not have to decode it again.
+
+    Payloads that can not be CloudWatch Logs messages (JSON objects without "messageType" string) are passed
+    through without being decoded.
+
+    :param payload: A string containing JSON data (decoded payload inside Kinesis records)
+    :return: Tuple of (list of normalized raw data, decoded payload or None if payload was not decoded or
+             was a CloudWatch Logs message)
+    """
     # Normalize messages from CloudWatch (subscription filters) and pass through anything else
     # https://docs.aws.amazon.com/ja_jp/AmazonCloudWatch/latest/logs/SubscriptionFilters.html
 
-    logger.debug(f"Normalizer input: {payload}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"Normalizer input: {payload}")
 
     if len(payload) < 1:
-        logger.error(f"Got weird record, skipping: {payload}")
-        return []
+        sampled_logger.error("empty records", "Got weird record, skipping: %r", payload)
+        return [], None
+
+    # cheap prefilter: a JSON object without "messageType" anywhere is passed through either way
+    # (invalid JSON is passed through as well), no need to decode it
+    if payload[0] == "{" and "messageType" not in payload:
+        return [payload], None
 
     # check if data is JSON and parse
     try:
-        payload_json = loads(payload)
+        payload_json = json_backend.loads(payload)
         if type(payload_json) is not dict:
-            logger.error(f"Top-level JSON data is not an object, giving up: {payload}")
-            return []
+            sampled_logger.error(
+                "top-level JSON data is not an object",
+                "Top-level JSON data is not an object, giving up: %s",
+                payload,
+            )
+            return [], None
 
-    except JSONDecodeError:
-        return [payload]
+    except json_backend.DecodeError:
+        return [payload], None
 
     if "messageType" not in payload_json:
-        return [payload]
+        return [payload], payload_json
 
     # messageType is present in payload, must be coming from CloudWatch
-    logger.debug(
-        f"Got payload looking like CloudWatch Logs via subscription filters: {payload_json}"
-    )
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(
+            f"Got payload looking like CloudWatch Logs via subscription filters: {payload_json}"
+        )
 
-    return extract_data_from_json_cwl_message(payload_json)
+    return extract_data_from_json_cwl_message(payload_json), None
 
 
 def extract_data_from_json_cwl_message(message: dict) -> List[str]:
@@ -88,52 +145,244 @@ def extract_data_from_json_cwl_message(message: dict) -> List[str]:
 
         for event in events:
             message = event["message"]
-            logger.debug(f"message: {message}")
+            logger.debug("message: %s", message)
 
             data.append(message)
 
         return data
 
     else:
-        logger.error(f"Got unknown messageType: {message['messageType']} , skipping")
+        sampled_logger.error(
+            f"unknown CloudWatch Logs messageType {message['messageType']}",
+            "Got unknown messageType: %s , skipping",
+            message["messageType"],
+        )
         return []
 
 
-def create_records(data: List[str]) -> List[dict]:
+def create_records(
+    data: List[str], partition_key_strategy: PartitionKeyStrategy = None
+) -> List[dict]:
     """
     Create Kinesis Records from multiple str data for use with PutRecords API
 
     :param data: List of strings to convert to records
+    :param partition_key_strategy: Strategy to assign partition keys with (default = RandomPartitionKeys())
     :return: List of Kinesis Records for PutRecords API
     """
-    records = []
-    for d in data:
-        records.append(create_record(d))
+    if partition_key_strategy is None:
+        partition_key_strategy = RandomPartitionKeys()
+
+    partition_keys, explicit_hash_keys = partition_key_strategy.get_keys(data)
+
+    if explicit_hash_keys is None:
+        records = [
+            {"Data": d.encode("utf-8"), "PartitionKey": partition_key}
+            for d, partition_key in zip(data, partition_keys)
+        ]
+    else:
+        records = [
+            {
+                "Data": d.encode("utf-8"),
+                "PartitionKey": partition_key,
+                "ExplicitHashKey": explicit_hash_key,
+            }
+            for d, partition_key, explicit_hash_key in zip(
+                data, partition_keys, explicit_hash_keys
+            )
+        ]
 
-    logger.debug(f"Formed Kinesis Records batch for PutRecords API: {records}")
+    logger.debug("Formed Kinesis Records batch for PutRecords API: %s", records)
     return records
 
 
-def create_record(data: str) -> dict:
+def create_record(
+    data: str, partition_key: str = None, explicit_hash_key: str = None
+) -> dict:
     """
     Create a single Kinesis Record for use with PutRecords API
 
     :param data: A string to convert to record
+    :param partition_key: Partition key (max 256 chars, default = random key)
+    :param explicit_hash_key: Explicit hash key to override partition key hash with (optional)
     :return: Kinesis Record for PutRecords API
     """
-    random_alphanumerical = (
-        string.ascii_lowercase + string.ascii_uppercase + string.digits
+    if partition_key is None:
+        partition_key = random_partition_keys(1)[0]
+
+    record = {"Data": data.encode("utf-8"), "PartitionKey": partition_key}
+    if explicit_hash_key is not None:
+        record["ExplicitHashKey"] = explicit_hash_key
+
+    return record
+
+
+def get_record_size(record: dict) -> int:
+    """
+    Get size of a Kinesis Record as counted against PutRecords API limits (data blob + partition key)
+
+    :param record: Kinesis Record for PutRecords API
+    :return: Record size in bytes
+    """
+    return len(record["Data"]) + len(record["PartitionKey"].encode("utf-8"))
+
+
+def split_records(
+    records: List[dict],
+    max_batch_size: int = MAX_RECORDS_PER_REQUEST,
+    max_batch_bytes: int = MAX_BYTES_PER_REQUEST,
+    max_record_bytes: int = MAX_BYTES_PER_RECORD,
+) -> Tuple[List[List[dict]], List[dict]]:
+    """
+    Pack Kinesis Records in batches for PutRecords API, limited by both record count and total size in bytes.
+    Records are packed in a single pass and keep their order.
+
+    :param records: Kinesis Records for PutRecords API (see create_records)
+    :param max_batch_size: Maximum number of records in a single batch
+    :param max_batch_bytes: Maximum total size of records in a single batch
+    :param max_record_bytes: Maximum size of a single record, larger records are rejected
+    :return: Tuple of (batches, rejected records)
+    """
+    batches = []
+    rejected = []
+
+    batch = []
+    batch_bytes = 0
+
+    for record in records:
+        size = get_record_size(record)
+
+        if size > max_record_bytes:
+            rejected.append(record)
+            continue
+
+        if len(batch) >= max_batch_size or batch_bytes + size > max_batch_bytes:
+            batches.append(batch)
+            batch = []
+            batch_bytes = 0
+
+        batch.append(record)
+        batch_bytes += size
+
+    if len(batch) > 0:
+        batches.append(batch)
+
+    return batches, rejected
+
+
+def aggregate_records(
+    records: List[dict],
+    max_record_bytes: int = MAX_BYTES_PER_RECORD,
+    group_by_partition_key: bool = True,
+) -> Tuple[List[dict], List[dict]]:
+    """
+    Aggregate Kinesis Records into KPL aggregated records, which can be de-aggregated with parse_records or any other
+    KPL-compatible consumer. For details on the format, see:
+    https://github.com/awslabs/amazon-kinesis-producer/blob/master/aggregation-format.md
+
+    :param records: Kinesis Records for PutRecords API (see create_records)
+    :param max_record_bytes: Maximum size of a single aggregated record (partition key included)
+    :param group_by_partition_key: Aggregate only records with same partition key together, so all records still
+                                   go to the shard their partition key maps to. Disable if partition keys are random.
+    :return: Tuple of (aggregated Kinesis Records, records too large to fit in an aggregated record)
+    """
+    # aws_kinesis_agg.aggregator modifies sys.path on import, only import it when aggregation is used
+    from aws_kinesis_agg.aggregator import AggRecord
+
+    # aggregated record partition key counts against record size limit as well
+    max_size = max_record_bytes - MAX_PARTITION_KEY_LENGTH
+
+    try:
+        AggRecord(max_size)
+        new_agg_record = partial(AggRecord, max_size)
+        add_user_record = AggRecord.add_user_record
+    except TypeError:
+        # aws_kinesis_agg < 1.2 has no max_size argument and always uses 1 MiB limit
+        new_agg_record = AggRecord
+        add_user_record = partial(_add_user_record_with_max_size, max_size=max_size)
+
+    aggregated = []
+    rejected = []
+    open_records = {}
+
+    def flush(agg_record):
+        partition_key, explicit_hash_key, data = agg_record.get_contents()
+        record = {"Data": data, "PartitionKey": partition_key}
+        if explicit_hash_key:
+            record["ExplicitHashKey"] = explicit_hash_key
+
+        aggregated.append(record)
+
+    for record in records:
+        group = record["PartitionKey"] if group_by_partition_key else None
+        explicit_hash_key = record.get("ExplicitHashKey")
+
+        agg_record = open_records.get(group)
+        if agg_record is None:
+            agg_record = open_records[group] = new_agg_record()
+
+        try:
+            added = add_user_record(
+                agg_record, record["PartitionKey"], record["Data"], explicit_hash_key
+            )
+        except ValueError:
+            # a single record is too large to be aggregated
+            rejected.append(record)
+            continue
+
+        if not added:
+            flush(agg_record)
+
+            agg_record = open_records[group] = new_agg_record()
+            add_user_record(
+                agg_record, record["PartitionKey"], record["Data"], explicit_hash_key
+            )
+
+    for agg_record in open_records.values():
+        if agg_record.get_num_user_records() > 0:
+            flush(agg_record)
+
+    logger.debug("Aggregated %d records into %d records", len(records), len(aggregated))
+    return aggregated, rejected
+
+
+def _add_user_record_with_max_size(
+    agg_record,
+    partition_key: str,
+    data: bytes,
+    explicit_hash_key: Optional[str],
+    max_size: int,
+) -> bool:
+    # same checks as AggRecord.add_user_record of aws_kinesis_agg >= 1.2, against max_size instead of 1 MiB
+    size = agg_record._calculate_record_size(
+        partition_key.encode(),
+        data,
+        explicit_hash_key.encode() if explicit_hash_key is not None else None,
     )
 
-    data_blob = data.encode("utf-8")
-    partition_key: str = "".join(
-        random.choices(random_alphanumerical, k=20)
-    )  # max 256 chars
-    return {"Data": data_blob, "PartitionKey": partition_key}
+    if size > max_size:
+        raise ValueError(
+            f"Input record (SizeBytes={size}) too big to fit inside a single agg record"
+        )
+
+    if agg_record.get_size_bytes() + size > max_size:
+        return False
+
+    return agg_record.add_user_record(partition_key, data, explicit_hash_key)
 
 
 def put_records_batch(
-    client, stream_name: str, records: list, max_retries: int, max_batch_size: int = 500
+    client,
+    stream_name: str,
+    records: list,
+    max_retries: int,
+    max_batch_size: int = MAX_RECORDS_PER_REQUEST,
+    max_concurrency: int = 1,
+    max_batch_bytes: int = MAX_BYTES_PER_REQUEST,
+    retry_policy: RetryPolicy = None,
+    aggregate: bool = False,
+    partition_key_strategy: PartitionKeyStrategy = None,
+    metrics: Metrics = None,
 ) -> None or List[dict]:
     """
     Put multiple records to Kinesis Data Streams using PutRecords API in batches.
@@ -143,76 +392,530 @@ def put_records_batch(
     :param records: list of records to send. Records will be dumped with json.dumps
     :param max_retries: Maximum retries for resending failed records
     :param max_batch_size: Maximum number of records sent in a single PutRecords API call.
+    :param max_concurrency: Maximum number of PutRecords API calls in flight at once (default = 1, sequential).
+                            boto3 clients are thread-safe, so the same client is shared between worker threads.
+    :param max_batch_bytes: Maximum total size in bytes of records sent in a single PutRecords API call.
+    :param retry_policy: Backoff between retries (default = RetryPolicy() with exponential backoff and jitter).
+                         Use RetryPolicy.from_lambda_context to stop retrying before Lambda times out.
+    :param aggregate: Pack records in KPL aggregated records before sending (see aggregate_records).
+                      Failed records are returned as aggregated records in this mode.
+    :param partition_key_strategy: Strategy to assign partition keys with (default = RandomPartitionKeys()).
+                                   See amazon_kinesis_utils.partition_keys for available strategies.
+    :param metrics: Metrics to record counters (PutRecordsRequests, PutRecordsRetries, PutRecordsErrors.<error code>,
+                    PutRecordsFailedRecords) and PutRecordsLatency timing (per API call) in
     :return: Records failed to put in Kinesis Data Stream after all retries. Each PutRecords API call can receive up
-             to 500 records:
+             to 500 records and 5 MiB of data:
              https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/kinesis.html#Kinesis.Client.put_records
+             Records larger than 1 MiB are never sent and are returned as failed as well.
     """
 
-    retry_list = []
+    if retry_policy is None:
+        retry_policy = RetryPolicy()
+
+    if partition_key_strategy is None:
+        partition_key_strategy = RandomPartitionKeys()
+
+    kinesis_records = create_records(records, partition_key_strategy)
+    rejected_records = []
+
+    if aggregate:
+        # there is no need to keep records with same key together if partition keys are random
+        kinesis_records, rejected_records = aggregate_records(
+            kinesis_records,
+            group_by_partition_key=partition_key_strategy.deterministic,
+        )
+
+    batches, failed_records = split_records(
+        kinesis_records,
+        max_batch_size=max_batch_size,
+        max_batch_bytes=max_batch_bytes,
+    )
+    failed_records = rejected_records + failed_records
+
+    if len(failed_records) > 0:
+        logger.error(
+            f"{len(failed_records)} records exceed {MAX_BYTES_PER_RECORD} bytes, giving up on them"
+        )
+
+    # a failed batch does not stop the remaining batches, so both modes send the same records
+    if max_concurrency <= 1:
+        for batch in batches:
+            batch_failed_records = _put_records_with_retries(
+                client, stream_name, batch, max_retries, retry_policy, metrics
+            )
+            if batch_failed_records is not None:
+                failed_records.extend(batch_failed_records)
+    else:
+        # concurrent.futures imports multiprocessing on Python 3.6, import it only when threads are used
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+            futures = [
+                executor.submit(
+                    _put_records_with_retries,
+                    client,
+                    stream_name,
+                    batch,
+                    max_retries,
+                    retry_policy,
+                    metrics,
+                )
+                for batch in batches
+            ]
+
+            # collect results in submission order, so failed records keep the same order as input records
+            for future in futures:
+                batch_failed_records = future.result()
+                if batch_failed_records is not None:
+                    failed_records.extend(batch_failed_records)
+
+    if metrics is not None:
+        metrics.incr("PutRecordsFailedRecords", len(failed_records))
+
+    if len(failed_records) > 0:
+        return failed_records
+
+    return None
 
-    for batch_index, batch in enumerate(split_list(records, max_batch_size)):
-        records_to_send = create_records(batch)
-        retries_left = max_retries
 
-        while len(records_to_send) > 0:
+def _put_records_with_retries(
+    client,
+    stream_name: str,
+    records_to_send: List[dict],
+    max_retries: int,
+    retry_policy: RetryPolicy,
+    metrics: Metrics = None,
+) -> None or List[dict]:
+    """
+    Put a single batch of Kinesis Records with PutRecords API, resending failed records until max_retries is reached.
+
+    :param client: Kinesis API client (e.g. boto3.client('kinesis') )
+    :param stream_name: Kinesis Data Streams stream name
+    :param records_to_send: Kinesis Records for PutRecords API (see create_records)
+    :param max_retries: Maximum retries for resending failed records
+    :param retry_policy: Backoff between retries
+    :param metrics: Metrics to record counters and timings in (see put_records_batch)
+    :return: Records failed to put in Kinesis Data Stream after all retries, None if all records were put
+    """
+    attempt = 0
+
+    while len(records_to_send) > 0:
+        if metrics is None:
             kinesis_response = client.put_records(
                 Records=records_to_send,
                 StreamName=stream_name,
             )
-
-            if kinesis_response["FailedRecordCount"] == 0:
-                break
-            else:
-                index: int
-                record: dict
-                for index, record in enumerate(kinesis_response["Records"]):
-                    if "ErrorCode" in record:
-                        # original records list and response record list have same order, guaranteed:
-                        # https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/kinesis.html#Kinesis.Client.put_records
-                        logger.error(
-                            f"A record failed with error: {record['ErrorCode']} {record['ErrorMessage']}"
-                        )
-                        retry_list.append(records_to_send[index])
-
-                records_to_send = retry_list
-                retry_list = []
-
-                if retries_left == 0:
-                    error_msg = (
-                        f"No retries left, giving up on records: {records_to_send}"
-                    )
-                    logger.error(error_msg)
-                    return records_to_send
-
-                retries_left -= 1
-
-                logger.info(f"Waiting 500 ms before retrying")
-                time.sleep(0.5)
+        else:
+            metrics.incr("PutRecordsRequests")
+            with metrics.timer("PutRecordsLatency"):
+                kinesis_response = client.put_records(
+                    Records=records_to_send,
+                    StreamName=stream_name,
+                )
+
+        if kinesis_response["FailedRecordCount"] == 0:
+            break
+
+        retry_list = []
+        error_codes = set()
+
+        index: int
+        record: dict
+        for index, record in enumerate(kinesis_response["Records"]):
+            if "ErrorCode" in record:
+                # original records list and response record list have same order, guaranteed:
+                # https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/kinesis.html#Kinesis.Client.put_records
+                logger.error(
+                    f"A record failed with error: {record['ErrorCode']} {record['ErrorMessage']}"
+                )
+                retry_list.append(records_to_send[index])
+                error_codes.add(record["ErrorCode"])
+
+                if metrics is not None:
+                    metrics.incr(f"PutRecordsErrors.{record['ErrorCode']}")
+
+        records_to_send = retry_list
+
+        if attempt >= max_retries:
+            error_msg = f"No retries left, giving up on records: {records_to_send}"
+            logger.error(error_msg)
+            return records_to_send
+
+        if not retry_policy.backoff(attempt, error_codes):
+            logger.error(f"Giving up on records: {records_to_send}")
+            return records_to_send
+
+        if metrics is not None:
+            metrics.incr("PutRecordsRetries")
+
+        attempt += 1
 
     return None
 
 
-def parse_records(raw_records: list) -> Generator[str, None, None]:
+def decode_records(
+    raw_records: list, metrics: Metrics = None
+) -> Generator[Tuple[dict, str], None, None]:
     """
-    Generator that de-aggregates, decodes, gzip decompresses Kinesis Records
+    Generator that de-aggregates Kinesis Records and decodes their data (base64 decode, gzip decompress if data is
+    gzipped, UTF-8 decode).
+
+    Data of every record is base64 decoded only once: only records starting with KPL aggregated record magic
+    number are passed to aws_kinesis_agg de-aggregator.
 
     :param raw_records: Raw Kinesis records (usually event['Records'] in Lambda handler function)
+    :param metrics: Metrics to record counters in (RecordsIn, BytesIn, BytesDecompressed)
+    :return: Tuples of (raw de-aggregated Kinesis record, decoded data)
+    """
+    debug = logger.isEnabledFor(logging.DEBUG)
+    records_in = bytes_in = bytes_decompressed = 0
+
+    try:
+        for record in raw_records:
+            if debug:
+                logger.debug(f"Raw Kinesis record: {record}")
+
+            kinesis_data = record.get("kinesis")
+
+            # Kinesis data is base64 encoded
+            raw_data = (
+                binascii.a2b_base64(kinesis_data["data"])
+                if kinesis_data is not None
+                else None
+            )
+
+            if raw_data is None or raw_data[:KPL_MAGIC_LENGTH] == KPL_MAGIC:
+                # aggregated records (and Kinesis Analytics/Firehose record formats) go through de-aggregator.
+                # aws_kinesis_agg imports protobuf, which is slow: import it only when it is needed
+                from aws_kinesis_agg.deaggregator import iter_deaggregate_records
+
+                for user_record in iter_deaggregate_records(record):
+                    user_data = binascii.a2b_base64(user_record["kinesis"]["data"])
+                    if metrics is not None:
+                        records_in += 1
+                        bytes_in += len(user_data)
+                        bytes_decompressed += _get_gzip_size(user_data)
+
+                    yield user_record, _decode_data(user_data)
+                continue
+
+            if metrics is not None:
+                records_in += 1
+                bytes_in += len(raw_data)
+                bytes_decompressed += _get_gzip_size(raw_data)
+
+            yield record, _decode_data(raw_data)
+    finally:
+        if metrics is not None:
+            metrics.incr("RecordsIn", records_in)
+            metrics.incr("BytesIn", bytes_in)
+            metrics.incr("BytesDecompressed", bytes_decompressed)
+
+
+def _get_gzip_size(raw_data: bytes) -> int:
+    if raw_data[:2] != GZIP_MAGIC:
+        return 0
+
+    # gzip trailer ends with uncompressed size (of last member), no need to decompress again
+    return int.from_bytes(raw_data[-4:], "little")
+
+
+def _decode_data(raw_data: bytes) -> str:
+    # decompress data if raw data is gzip (log data from CloudWatch Logs subscription filters comes gzipped)
+    if raw_data[:2] == GZIP_MAGIC:
+        raw_data = _gzip_decompress(raw_data)
+
+    return raw_data.decode()
+
+
+def _gzip_decompress(raw_data: bytes) -> bytes:
+    # zlib directly instead of gzip.decompress, which parses headers in Python
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    data = decompressor.decompress(raw_data)
+    _check_gzip_eof(decompressor)
+
+    if not decompressor.unused_data:
+        return data
+
+    # concatenated gzip members (valid gzip, rarely used)
+    chunks = [data]
+    while decompressor.unused_data:
+        rest = decompressor.unused_data
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        chunks.append(decompressor.decompress(rest))
+        _check_gzip_eof(decompressor)
+
+    return b"".join(chunks)
+
+
+def _check_gzip_eof(decompressor):
+    # unlike gzip.decompress, decompressobj returns partial data of truncated input without an error
+    if not decompressor.eof:
+        raise EOFError(
+            "Compressed file ended before the end-of-stream marker was reached"
+        )
+
+
+class KinesisPayload(NamedTuple):
+    """
+    A single payload yielded by parse_records(with_metadata=True), with metadata of Kinesis record it came from
+    """
+
+    #: Payload (str, or decoded object with decode_json=True)
+    data: Any
+    sequence_number: str
+    #: Position of user record in KPL aggregated record, None for non-aggregated records
+    sub_sequence_number: Optional[int]
+    partition_key: str
+    shard_id: Optional[str]
+    approximate_arrival_timestamp: float
+
+
+def get_record_metadata(record: dict) -> tuple:
+    """
+    Get metadata of a raw (de-aggregated) Kinesis record in Lambda event format
+
+    :param record: Raw Kinesis record
+    :return: Tuple of (sequence number, sub-sequence number, partition key, shard ID, approximate arrival timestamp)
+             in KinesisPayload field order
+    """
+    kinesis_data = record["kinesis"]
+
+    # eventID looks like "shardId-000000000000:49590338271490256608559692538361571095921575989136588898"
+    event_id = record.get("eventID")
+    shard_id = event_id.split(":", 1)[0] if event_id else None
+
+    return (
+        kinesis_data.get("sequenceNumber"),
+        kinesis_data.get("subSequenceNumber"),
+        kinesis_data.get("partitionKey"),
+        shard_id,
+        kinesis_data.get("approximateArrivalTimestamp"),
+    )
+
+
+def parse_records(
+    raw_records: list,
+    decode_json: bool = False,
+    with_metadata: bool = False,
+    metrics: Metrics = None,
+    deduplicator: Deduplicator = None,
+) -> Generator[Any, None, None]:
+    """
+    Generator that de-aggregates, decodes, gzip decompresses Kinesis Records.
+    Counters of rate-limited log messages (see sampled_logging) are logged when generator is exhausted.
+
+    :param raw_records: Raw Kinesis records (usually event['Records'] in Lambda handler function)
+    :param decode_json: Yield payloads decoded from JSON instead of str, decoding every payload only once
+                        (payloads that are not valid JSON are yielded as str)
+    :param with_metadata: Yield KinesisPayload tuples with sequence number, partition key, shard ID and
+                          arrival timestamp of source record instead of bare payloads
+    :param metrics: Metrics to record counters (RecordsIn, BytesIn, BytesDecompressed, PayloadsOut, ParseFailures
+                    for payloads that are not valid JSON with decode_json=True, RecordsSkipped with deduplicator)
+                    and ParseRecordsTime timing in
+    :param deduplicator: Skip records with sequence numbers found in deduplicator (e.g. records already processed
+                         before a retried Lambda invocation failed). Sequence numbers are not added by this function:
+                         add them once records have been processed, see get_sequence_numbers.
     :return:
     """
-    for record in iter_deaggregate_records(raw_records):
-        logger.debug(f"Raw Kinesis record: {record}")
+    if deduplicator is not None:
+        raw_records = skip_seen_records(raw_records, deduplicator, metrics)
+
+    payloads = _parse_records(raw_records, decode_json, with_metadata, metrics)
+    if metrics is not None:
+        payloads = metrics.timed_iter("ParseRecordsTime", payloads)
+
+    yield from payloads
+
+    # log aggregated counters of rate-limited messages once per batch
+    sampled_logger.flush()
+
+
+def get_sequence_numbers(raw_records: list) -> List[str]:
+    """
+    :param raw_records: Raw Kinesis records (usually event['Records'] in Lambda handler function)
+    :return: Sequence numbers of records, e.g. to mark them as processed with Deduplicator.add_many
+    """
+    return [record["kinesis"]["sequenceNumber"] for record in raw_records]
+
+
+def get_batch_item_failures(
+    failed_sequence_numbers: Iterable[Optional[str]], raw_records: list = None
+) -> dict:
+    """
+    Build Lambda partial batch response for Kinesis event source mappings with ReportBatchItemFailures enabled.
+    Lambda retries a batch from the lowest reported sequence number, so only the earliest failed sequence number
+    is reported: records before it are not processed again.
+
+    :param failed_sequence_numbers: Sequence numbers of records that failed to be processed (e.g.
+                                    baikonur_logging.get_failed_sequence_numbers). None means a failed record
+                                    with unknown sequence number, which fails the whole batch.
+    :param raw_records: Raw Kinesis records of the batch (event['Records']), required to fail the whole batch
+    :return: {"batchItemFailures": [{"itemIdentifier": sequence number}]}, with an empty list if nothing failed
+    """
+    failed_sequence_numbers = list(failed_sequence_numbers)
+
+    if None in failed_sequence_numbers:
+        if not raw_records:
+            raise KinesisException(
+                "Cannot report failure of records with unknown sequence number without raw_records"
+            )
+
+        # retry whole batch from its first record
+        failed_sequence_numbers = [raw_records[0]["kinesis"]["sequenceNumber"]]
+
+    if not failed_sequence_numbers:
+        return {"batchItemFailures": []}
+
+    # sequence numbers are decimal strings increasing within a shard
+    earliest = min(failed_sequence_numbers, key=int)
+    logger.info(f"Reporting batch item failure from sequence number {earliest}")
+
+    return {"batchItemFailures": [{"itemIdentifier": earliest}]}
+
+
+def skip_seen_records(
+    raw_records: list, deduplicator: Deduplicator, metrics: Metrics = None
+) -> list:
+    """
+    Remove records with sequence numbers found in deduplicator, with a single Deduplicator.find_seen call
+
+    :param raw_records: Raw Kinesis records (usually event['Records'] in Lambda handler function)
+    :param deduplicator: Deduplicator of processed sequence numbers
+    :param metrics: Metrics to record RecordsSkipped counter in
+    :return: Records not processed yet, in original order
+    """
+    seen = deduplicator.find_seen(get_sequence_numbers(raw_records))
+    if metrics is not None:
+        metrics.incr("RecordsSkipped", len(seen))
+
+    if not seen:
+        return raw_records
+
+    logger.info(f"Skipping {len(seen)} records already processed")
+    return [r for r in raw_records if r["kinesis"]["sequenceNumber"] not in seen]
+
+
+def _parse_records(
+    raw_records: list, decode_json: bool, with_metadata: bool, metrics: Metrics
+) -> Generator[Any, None, None]:
+    loads = json_backend.get_backend().loads
+    debug = logger.isEnabledFor(logging.DEBUG)
+    payloads_out = parse_failures = 0
+
+    try:
+        for record, data in decode_records(raw_records, metrics):
+            payloads, parsed = normalize_cloudwatch_messages_parsed(data)
+            if debug:
+                logger.debug(f"Normalized payloads: {payloads}")
+
+            if decode_json:
+                if parsed is not None:
+                    # payload was already decoded during normalization
+                    payloads = [parsed]
+                else:
+                    payloads = [_decode_json(payload, loads) for payload in payloads]
+
+                    if metrics is not None:
+                        parse_failures += sum(1 for p in payloads if type(p) is str)
+
+            if metrics is not None:
+                payloads_out += len(payloads)
+
+            if with_metadata:
+                metadata = get_record_metadata(record)
+                for payload in payloads:
+                    yield KinesisPayload(payload, *metadata)
+            else:
+                for payload in payloads:
+                    yield payload
+    finally:
+        if metrics is not None:
+            metrics.incr("PayloadsOut", payloads_out)
+            metrics.incr("ParseFailures", parse_failures)
+
+
+def _decode_json(payload: str, loads) -> Any:
+    try:
+        return loads(payload)
+    except json_backend.DecodeError:
+        return payload
+
+
+def parse_records_parallel(
+    raw_records: list,
+    decode_json: bool = False,
+    with_metadata: bool = False,
+    max_workers: int = None,
+    chunk_size: int = 1000,
+    min_parallel_records: int = 2000,
+    executor: "Executor" = None,
+    metrics: Metrics = None,
+    deduplicator: Deduplicator = None,
+) -> List[Any]:
+    """
+    Same as parse_records, but de-aggregates, decodes, decompresses and normalizes records on multiple CPU cores
+    with a process pool. Records are processed in chunks and results keep order of raw_records (and so the order
+    of records within every shard).
+
+    Small batches, where starting worker processes would take longer than parsing, are parsed in current process.
+    Current process is used as well if a process pool can not be created (e.g. AWS Lambda, which does not
+    support multiprocessing queues used by ProcessPoolExecutor, unless a custom executor is passed).
+
+    :param raw_records: Raw Kinesis records (usually event['Records'] in Lambda handler function)
+    :param decode_json: See parse_records
+    :param with_metadata: See parse_records
+    :param max_workers: Number of worker processes (default = number of CPUs)
+    :param chunk_size: Number of raw records processed by a worker at once
+    :param min_parallel_records: Minimum number of raw records to use worker processes for
+    :param executor: concurrent.futures Executor to reuse between calls instead of starting a new process pool
+    :param metrics: Metrics to record counters and timings in (see parse_records). Only PayloadsOut counter and
+                    ParseRecordsTime timing are recorded when records are parsed in worker processes.
+    :param deduplicator: See parse_records
+    :return: List of payloads (see parse_records)
+    """
+    if deduplicator is not None:
+        raw_records = skip_seen_records(raw_records, deduplicator, metrics)
+
+    if len(raw_records) < min_parallel_records or len(raw_records) <= chunk_size:
+        return list(parse_records(raw_records, decode_json, with_metadata, metrics))
+
+    chunks = list(split_list(raw_records, chunk_size))
+    work = partial(
+        _parse_records_chunk, decode_json=decode_json, with_metadata=with_metadata
+    )
+
+    if executor is None:
+        # importing multiprocessing takes a while, import it only when process pool is used
+        from concurrent.futures import ProcessPoolExecutor
+
+        try:
+            executor = ProcessPoolExecutor(max_workers=max_workers)
+        except (OSError, NotImplementedError) as e:
+            logger.warning(
+                f"Cannot start process pool, parsing records in current process: {e}"
+            )
+            return list(parse_records(raw_records, decode_json, with_metadata, metrics))
+
+        with executor:
+            return _map_chunks(executor, work, chunks, metrics)
+
+    return _map_chunks(executor, work, chunks, metrics)
+
+
+def _map_chunks(executor: "Executor", work, chunks: list, metrics: Metrics) -> list:
+    if metrics is None:
+        return [p for chunk in executor.map(work, chunks) for p in chunk]
 
-        # Kinesis data is base64 encoded
-        raw_data = base64.b64decode(record["kinesis"]["data"])
+    with metrics.timer("ParseRecordsTime"):
+        payloads = [p for chunk in executor.map(work, chunks) for p in chunk]
 
-        # decompress data if raw data is gzip (log data from CloudWatch Logs subscription filters comes gzipped)
-        # gzip magic number: 0x1f 0x8b
-        if raw_data[0] == 0x1F and raw_data[1] == 0x8B:
-            raw_data = gzip.decompress(raw_data)
+    metrics.incr("PayloadsOut", len(payloads))
+    return payloads
 
-        data = raw_data.decode()
-        payloads = normalize_cloudwatch_messages(data)
-        logger.debug(f"Normalized payloads: {payloads}")
 
-        for payload in payloads:
-            yield payload
+def _parse_records_chunk(
+    raw_records: list, decode_json: bool, with_metadata: bool
+) -> List[Any]:
+    # module-level function, so it can be pickled and sent to worker processes
+    return list(parse_records(raw_records, decode_json, with_metadata))
@@ -0,0 +1,181 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List
+
+# CloudWatch Embedded Metric Format limits:
+# https://docs.aws.amazon.com/AmazonCloudWatch/latest/monitoring/CloudWatch_Embedded_Metric_Format_Specification.html
+MAX_METRICS_PER_DOCUMENT = 100
+MAX_VALUES_PER_METRIC = 100
+
+
+class Metrics:
+    """
+    Counters and timings collected by functions in this package when a Metrics object is passed to them
+    (metrics=None, the default, skips instrumentation entirely).
+
+    Counters are summed until reset. Timings are recorded in milliseconds, one value per measurement.
+    Export them as CloudWatch Embedded Metric Format (EMF) JSON lines with to_emf, or print them to stdout
+    (picked up by CloudWatch Logs in Lambda) and reset with flush.
+    """
+
+    def __init__(
+        self,
+        namespace: str = "amazon_kinesis_utils",
+        dimensions: Dict[str, str] = None,
+        clock: Callable[[], float] = time.perf_counter,
+    ):
+        """
+        :param namespace: CloudWatch metrics namespace
+        :param dimensions: CloudWatch metric dimensions (e.g. {"FunctionName": "..."})
+        :param clock: Function returning current time in seconds, used for timings
+        """
+        self.namespace = namespace
+        self.dimensions = dict(dimensions or {})
+        self.clock = clock
+
+        self._counters = {}
+        self._timings = {}
+        self._lock = threading.Lock()
+
+    def incr(self, name: str, value: float = 1):
+        """
+        Add value to counter
+
+        :param name: Counter name
+        :param value: Value to add (default = 1)
+        """
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def timing(self, name: str, seconds: float):
+        """
+        Record a timing
+
+        :param name: Timing name
+        :param seconds: Duration in seconds (stored in milliseconds)
+        """
+        with self._lock:
+            self._timings.setdefault(name, []).append(seconds * 1000)
+
+    @contextmanager
+    def timer(self, name: str):
+        """
+        Context manager recording duration of its block as a timing
+
+        :param name: Timing name
+        """
+        start = self.clock()
+        try:
+            yield
+        finally:
+            self.timing(name, self.clock() - start)
+
+    def timed_iter(self, name: str, iterable: Iterable) -> Iterator:
+        """
+        Wrap an iterator (e.g. a generator), recording time spent producing items (excluding time spent
+        by consumer between items) as a single timing when iterator is exhausted or closed
+
+        :param name: Timing name
+        :param iterable: Iterable to wrap
+        :return: Iterator yielding same items
+        """
+        iterator = iter(iterable)
+        clock = self.clock
+        elapsed = 0.0
+
+        try:
+            while True:
+                start = clock()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    break
+                finally:
+                    elapsed += clock() - start
+
+                yield item
+        finally:
+            self.timing(name, elapsed)
+
+    def get_counters(self) -> Dict[str, float]:
+        with self._lock:
+            return dict(self._counters)
+
+    def get_timings(self) -> Dict[str, List[float]]:
+        with self._lock:
+            return {k: list(v) for k, v in self._timings.items()}
+
+    def reset(self):
+        with self._lock:
+            self._counters = {}
+            self._timings = {}
+
+    def to_emf(self, timestamp: int = None) -> List[str]:
+        """
+        Export counters and timings as CloudWatch Embedded Metric Format JSON lines.
+        Metrics are split into multiple lines to stay within EMF limits of metrics and values per document.
+
+        :param timestamp: Timestamp in milliseconds since epoch (default = current time)
+        :return: List of JSON str (one EMF document per line), empty if nothing was recorded
+        """
+        if timestamp is None:
+            timestamp = int(time.time() * 1000)
+
+        values = [(name, "Count", value) for name, value in self.get_counters().items()]
+        for name, timings in self.get_timings().items():
+            for i in range(0, len(timings), MAX_VALUES_PER_METRIC):
+                values.append(
+                    (name, "Milliseconds", timings[i : i + MAX_VALUES_PER_METRIC])
+                )
+
+        lines = []
+        document = None
+        for name, unit, value in values:
+            if (
+                document is None
+                or name in document
+                or len(document["_aws"]["CloudWatchMetrics"][0]["Metrics"])
+                >= MAX_METRICS_PER_DOCUMENT
+            ):
+                document = self._new_emf_document(timestamp)
+                lines.append(document)
+
+            document["_aws"]["CloudWatchMetrics"][0]["Metrics"].append(
+                {"Name": name, "Unit": unit}
+            )
+            document[name] = value
+
+        return [json.dumps(document, separators=(",", ":")) for document in lines]
+
+    def flush(self, print_func: Callable[[str], None] = print) -> List[str]:
+        """
+        Print EMF lines (see to_emf) and reset metrics
+
+        :param print_func: Function to output a single line with (default = print, stdout goes to CloudWatch Logs
+                           in Lambda)
+        :return: Printed lines
+        """
+        lines = self.to_emf()
+        self.reset()
+
+        for line in lines:
+            print_func(line)
+
+        return lines
+
+    def _new_emf_document(self, timestamp: int) -> dict:
+        return {
+            "_aws": {
+                "Timestamp": timestamp,
+                "CloudWatchMetrics": [
+                    {
+                        "Namespace": self.namespace,
+                        "Dimensions": [list(self.dimensions)],
+                        "Metrics": [],
+                    }
+                ],
+            },
+            **self.dimensions,
+        }
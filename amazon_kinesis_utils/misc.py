@@ -1,6 +1,8 @@
 import logging
 from typing import List, Any
 
+from .sampled_logging import sampled_logger
+
 logger = logging.getLogger("kinesis_logging_utils")
 logger.setLevel(logging.INFO)
 
@@ -30,9 +32,13 @@ def dict_get_default(
     """
     if key not in dictionary:
         if verbose:
-            logger.warning(
-                f'Cannot retrieve field "{key}" from data: {dictionary}, '
-                f"falling back to default value: {default}"
+            # rate-limited: malformed batches may have this field missing in every record
+            sampled_logger.warning(
+                f'missing field "{key}"',
+                'Cannot retrieve field "%s" from data: %s, falling back to default value: %s',
+                key,
+                dictionary,
+                default,
             )
         return default, True
 
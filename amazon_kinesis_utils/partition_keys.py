@@ -0,0 +1,158 @@
+import os
+from typing import List, Optional, Tuple
+
+from . import json_backend
+
+# Kinesis maps partition keys to 128-bit integer hash keys with MD5:
+# https://docs.aws.amazon.com/kinesis/latest/APIReference/API_PutRecord.html
+MAX_HASH_KEY = 2**128 - 1
+
+RANDOM_KEY_LENGTH = 20
+
+
+def random_partition_keys(count: int, length: int = RANDOM_KEY_LENGTH) -> List[str]:
+    """
+    Generate random hexadecimal partition keys in bulk
+
+    :param count: Number of keys to generate
+    :param length: Length of a single key (even number, max 256)
+    :return: List of random partition keys
+    """
+    random_hex = os.urandom(count * length // 2).hex()
+    return [random_hex[i : i + length] for i in range(0, count * length, length)]
+
+
+class PartitionKeyStrategy:
+    """
+    Base class for strategies that assign partition keys (and optionally explicit hash keys) to a batch of data
+    when creating Kinesis Records.
+    """
+
+    #: True if keys depend on data, i.e. records with same key must be kept together to keep their order
+    deterministic = False
+
+    def get_keys(self, data: List[str]) -> Tuple[List[str], Optional[List[str]]]:
+        """
+        :param data: List of strings to create records from
+        :return: Tuple of (partition key for every item in data,
+                 explicit hash key for every item in data or None to let Kinesis hash partition keys)
+        """
+        raise NotImplementedError
+
+
+class RandomPartitionKeys(PartitionKeyStrategy):
+    """
+    Random partition keys, spreading records over all shards without ordering guarantees (default)
+    """
+
+    def __init__(self, length: int = RANDOM_KEY_LENGTH):
+        """
+        :param length: Length of a single key (even number, max 256)
+        """
+        self.length = length
+
+    def get_keys(self, data: List[str]) -> Tuple[List[str], Optional[List[str]]]:
+        return random_partition_keys(len(data), self.length), None
+
+
+class FieldHashPartitionKeys(PartitionKeyStrategy):
+    """
+    Partition keys derived from a field of JSON object data (e.g. an entity ID), so all records for the same
+    entity go to the same shard in order. Data without the field gets a random key.
+    """
+
+    deterministic = True
+
+    def __init__(self, field: str):
+        """
+        :param field: Top-level field name in JSON object data to derive partition key from
+        """
+        self.field = field
+
+    def get_keys(self, data: List[str]) -> Tuple[List[str], Optional[List[str]]]:
+        # hashlib loads OpenSSL bindings, import it only when this strategy is used
+        import hashlib
+
+        keys = []
+        missing = []
+
+        loads = json_backend.get_backend().loads
+
+        for index, d in enumerate(data):
+            try:
+                payload = loads(d)
+                value = payload[self.field]
+            except (json_backend.DecodeError, TypeError, KeyError):
+                missing.append(index)
+                keys.append(None)
+                continue
+
+            # hash to keep keys short regardless of value length (max 256 chars)
+            keys.append(hashlib.md5(str(value).encode("utf-8")).hexdigest())
+
+        for index, key in zip(missing, random_partition_keys(len(missing))):
+            keys[index] = key
+
+        return keys, None
+
+
+class ExplicitHashKeys(PartitionKeyStrategy):
+    """
+    Explicit hash keys assigned round-robin over a known shard map, spreading records evenly over all shards
+    regardless of how partition keys would hash. Records for the same shard share a partition key.
+    """
+
+    deterministic = True
+
+    def __init__(self, hash_key_ranges: List[Tuple[int, int]]):
+        """
+        :param hash_key_ranges: List of (starting hash key, ending hash key) of open shards
+        """
+        # middle of every shard's range, as decimal strings expected by PutRecords API
+        self.hash_keys = [str((start + end) // 2) for start, end in hash_key_ranges]
+        self.next_index = 0
+
+    @classmethod
+    def from_shards(cls, shards: List[dict]):
+        """
+        Create strategy from shards returned by ListShards API, skipping closed shards
+
+        :param shards: Shards from ListShards API response (response['Shards'])
+        :return: ExplicitHashKeys
+        """
+        return cls(
+            [
+                (
+                    int(s["HashKeyRange"]["StartingHashKey"]),
+                    int(s["HashKeyRange"]["EndingHashKey"]),
+                )
+                for s in shards
+                if "EndingSequenceNumber" not in s["SequenceNumberRange"]
+            ]
+        )
+
+    @classmethod
+    def from_shard_count(cls, shard_count: int):
+        """
+        Create strategy for a stream with hash key space split evenly between shards
+        (e.g. a newly created stream or a stream resharded with UpdateShardCount)
+
+        :param shard_count: Number of open shards
+        :return: ExplicitHashKeys
+        """
+        step = (MAX_HASH_KEY + 1) // shard_count
+        return cls(
+            [
+                (i * step, MAX_HASH_KEY if i == shard_count - 1 else (i + 1) * step - 1)
+                for i in range(shard_count)
+            ]
+        )
+
+    def get_keys(self, data: List[str]) -> Tuple[List[str], Optional[List[str]]]:
+        shard_count = len(self.hash_keys)
+        start = self.next_index
+        self.next_index = (start + len(data)) % shard_count
+
+        indexes = [(start + i) % shard_count for i in range(len(data))]
+
+        return [str(i) for i in indexes], [self.hash_keys[i] for i in indexes]
@@ -0,0 +1,266 @@
+import collections
+import logging
+import threading
+import time
+from typing import List
+
+from .kinesis import (
+    MAX_BYTES_PER_RECORD,
+    MAX_BYTES_PER_REQUEST,
+    MAX_RECORDS_PER_REQUEST,
+    KinesisException,
+    _put_records_with_retries,
+    create_record,
+    get_record_size,
+)
+from .metrics import Metrics
+from .retry import RetryPolicy
+
+logger = logging.getLogger("kinesis_logging_utils")
+logger.setLevel(logging.INFO)
+
+DEFAULT_LINGER = 0.1
+DEFAULT_MAX_BUFFERED_RECORDS = 10 * MAX_RECORDS_PER_REQUEST
+DEFAULT_MAX_BUFFERED_BYTES = 4 * MAX_BYTES_PER_REQUEST
+
+
+class KinesisProducer:
+    """
+    Buffered producer putting records one at a time, sent in batches with PutRecords API by a background thread.
+
+    A batch is sent when it reaches max_batch_size records or max_batch_bytes, or when its oldest record has waited
+    for linger seconds. put blocks while buffer is full (backpressure), so a slow or throttled stream slows down
+    callers instead of growing memory without limit. Failed records are retried with the same semantics as
+    put_records_batch and returned by flush.
+
+    In Lambda, call flush at the end of every invocation: execution environment is frozen between invocations, and
+    records still buffered would only be sent on a later invocation (or never).
+
+    >>> producer = KinesisProducer(boto3.client("kinesis"), "my-stream", max_retries=3)
+    >>> producer.put('{"message": "hello"}')
+    >>> failed_records = producer.flush()
+    """
+
+    def __init__(
+        self,
+        client,
+        stream_name: str,
+        max_retries: int,
+        linger: float = DEFAULT_LINGER,
+        max_batch_size: int = MAX_RECORDS_PER_REQUEST,
+        max_batch_bytes: int = MAX_BYTES_PER_REQUEST,
+        max_buffered_records: int = DEFAULT_MAX_BUFFERED_RECORDS,
+        max_buffered_bytes: int = DEFAULT_MAX_BUFFERED_BYTES,
+        retry_policy: RetryPolicy = None,
+        metrics: Metrics = None,
+    ):
+        """
+        :param client: Kinesis API client (e.g. boto3.client('kinesis') )
+        :param stream_name: Kinesis Data Streams stream name
+        :param max_retries: Maximum retries for resending failed records
+        :param linger: Maximum seconds a record waits in buffer before its batch is sent
+        :param max_batch_size: Maximum number of records sent in a single PutRecords API call
+        :param max_batch_bytes: Maximum total size in bytes of records sent in a single PutRecords API call
+        :param max_buffered_records: Number of buffered records at which put blocks
+        :param max_buffered_bytes: Total size of buffered records at which put blocks
+        :param retry_policy: Backoff between retries (default = RetryPolicy() with exponential backoff and jitter)
+        :param metrics: Metrics to record counters and timings in (see put_records_batch)
+        """
+        self.client = client
+        self.stream_name = stream_name
+        self.max_retries = max_retries
+        self.linger = linger
+        self.max_batch_size = max_batch_size
+        self.max_batch_bytes = max_batch_bytes
+        self.max_buffered_records = max(max_buffered_records, max_batch_size)
+        self.max_buffered_bytes = max(max_buffered_bytes, MAX_BYTES_PER_RECORD)
+        self.retry_policy = retry_policy if retry_policy is not None else RetryPolicy()
+        self.metrics = metrics
+
+        # (record, size, time buffered) tuples
+        self._buffer = collections.deque()
+        self._buffer_bytes = 0
+        self._in_flight = False
+        self._flush_waiters = 0
+        self._closed = False
+        self._failed_records = []
+        self._condition = threading.Condition()
+
+        self._thread = threading.Thread(
+            target=self._run, name="kinesis-producer", daemon=True
+        )
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def put(
+        self,
+        data: str,
+        partition_key: str = None,
+        explicit_hash_key: str = None,
+        timeout: float = None,
+    ):
+        """
+        Buffer a record to be sent, blocking while buffer is full
+
+        :param data: A string to send
+        :param partition_key: Partition key (max 256 chars, default = random key)
+        :param explicit_hash_key: Explicit hash key to override partition key hash with (optional)
+        :param timeout: Maximum seconds to wait for space in buffer (default = wait indefinitely)
+        :raises KinesisException: if producer is closed or buffer is still full after timeout
+        """
+        record = create_record(data, partition_key, explicit_hash_key)
+        size = get_record_size(record)
+
+        with self._condition:
+            if self._closed:
+                raise KinesisException("Producer is closed")
+
+            if size > MAX_BYTES_PER_RECORD:
+                logger.error(
+                    f"A record exceeds {MAX_BYTES_PER_RECORD} bytes, giving up on it"
+                )
+                self._failed_records.append(record)
+                return
+
+            if not self._condition.wait_for(
+                lambda: self._closed
+                or len(self._buffer) < self.max_buffered_records
+                and self._buffer_bytes + size <= self.max_buffered_bytes,
+                timeout,
+            ):
+                raise KinesisException(
+                    f"Producer buffer is full ({len(self._buffer)} records, {self._buffer_bytes} bytes)"
+                )
+
+            if self._closed:
+                raise KinesisException("Producer is closed")
+
+            self._buffer.append((record, size, time.monotonic()))
+            self._buffer_bytes += size
+
+            # wake up sender only when it has to start linger timer or a batch is full
+            if len(self._buffer) == 1 or self._is_batch_full():
+                self._condition.notify_all()
+
+    def flush(self, timeout: float = None) -> List[dict]:
+        """
+        Send all buffered records now and wait until they are sent
+
+        :param timeout: Maximum seconds to wait (default = wait indefinitely)
+        :return: Records failed to put in Kinesis Data Stream since last flush (after all retries)
+        :raises KinesisException: if records are still being sent after timeout
+        """
+        with self._condition:
+            self._flush_waiters += 1
+            self._condition.notify_all()
+
+            try:
+                if not self._condition.wait_for(
+                    lambda: not self._buffer and not self._in_flight, timeout
+                ):
+                    raise KinesisException(
+                        f"Flush timed out with {len(self._buffer)} records buffered"
+                    )
+            finally:
+                self._flush_waiters -= 1
+
+            failed_records, self._failed_records = self._failed_records, []
+
+        if self.metrics is not None:
+            self.metrics.incr("PutRecordsFailedRecords", len(failed_records))
+
+        return failed_records
+
+    def close(self, timeout: float = None) -> List[dict]:
+        """
+        Flush buffered records and stop background thread. put raises KinesisException after close.
+
+        :param timeout: Maximum seconds to wait for flush (default = wait indefinitely)
+        :return: Records failed to put in Kinesis Data Stream since last flush (after all retries)
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+        failed_records = self.flush(timeout)
+        self._thread.join(timeout)
+
+        return failed_records
+
+    def _is_batch_full(self) -> bool:
+        return (
+            len(self._buffer) >= self.max_batch_size
+            or self._buffer_bytes >= self.max_batch_bytes
+        )
+
+    def _wait_for_batch(self) -> List[dict]:
+        # called with condition held, returns an empty list when producer is closed and buffer is empty
+        while True:
+            if self._buffer:
+                if self._closed or self._flush_waiters or self._is_batch_full():
+                    return self._take_batch()
+
+                remaining = self._buffer[0][2] + self.linger - time.monotonic()
+                if remaining <= 0:
+                    return self._take_batch()
+
+                self._condition.wait(remaining)
+            elif self._closed:
+                return []
+            else:
+                self._condition.wait()
+
+    def _take_batch(self) -> List[dict]:
+        batch = []
+        batch_bytes = 0
+
+        while self._buffer and len(batch) < self.max_batch_size:
+            record, size, _ = self._buffer[0]
+            if batch and batch_bytes + size > self.max_batch_bytes:
+                break
+
+            self._buffer.popleft()
+            batch.append(record)
+            batch_bytes += size
+
+        self._buffer_bytes -= batch_bytes
+
+        return batch
+
+    def _run(self):
+        while True:
+            with self._condition:
+                batch = self._wait_for_batch()
+                if not batch:
+                    return
+
+                self._in_flight = True
+                # space in buffer for blocked put calls
+                self._condition.notify_all()
+
+            try:
+                failed_records = _put_records_with_retries(
+                    self.client,
+                    self.stream_name,
+                    batch,
+                    self.max_retries,
+                    self.retry_policy,
+                    self.metrics,
+                )
+            except Exception as e:
+                logger.error(
+                    f"PutRecords failed, giving up on {len(batch)} records: {e}"
+                )
+                failed_records = batch
+
+            with self._condition:
+                if failed_records is not None:
+                    self._failed_records.extend(failed_records)
+
+                self._in_flight = False
+                self._condition.notify_all()
@@ -0,0 +1,85 @@
+from array import array
+from typing import Any, Iterator
+
+from . import json_backend
+
+
+class RecordBuffer:
+    """
+    Compact append-only buffer of JSON records. Records are serialized once when appended and stored as
+    newline-terminated UTF-8 JSON in a single bytearray, with an array of record offsets, instead of keeping
+    parsed Python objects (which usually take several times more memory than their JSON representation).
+
+    Supports the list operations log_dict records are used with: append, len, indexing and iteration
+    (yielding JSON str per record).
+    """
+
+    def __init__(self):
+        self._data = bytearray()
+        # start offset of every record, plus end offset of last record
+        self._offsets = array("Q", [0])
+
+    def append(self, record: Any):
+        """
+        Serialize record to JSON and append it to buffer
+
+        :param record: JSON-serializable object, or already serialized JSON str
+        """
+        if not isinstance(record, str):
+            record = json_backend.dumps(record)
+
+        self._data += record.encode()
+        self._data += b"\n"
+        self._offsets.append(len(self._data))
+
+    def extend(self, records):
+        """
+        :param records: Iterable of records to append (see append)
+        """
+        for record in records:
+            self.append(record)
+
+    @property
+    def nbytes(self) -> int:
+        """
+        :return: Size of serialized records in bytes (including newlines)
+        """
+        return len(self._data)
+
+    def getvalue(self) -> bytes:
+        """
+        :return: All records as newline-separated UTF-8 JSON
+        """
+        return bytes(self._data[:-1])
+
+    def iter_objects(self) -> Iterator[Any]:
+        """
+        :return: Iterator of decoded records
+        """
+        loads = json_backend.get_backend().loads
+
+        for record in self:
+            yield loads(record)
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index: int) -> str:
+        if index < 0:
+            index += len(self)
+
+        if not 0 <= index < len(self):
+            raise IndexError("RecordBuffer index out of range")
+
+        start, end = self._offsets[index], self._offsets[index + 1]
+        return self._data[start : end - 1].decode()
+
+    def __iter__(self) -> Iterator[str]:
+        data = self._data
+        offsets = self._offsets
+
+        for i in range(len(offsets) - 1):
+            yield data[offsets[i] : offsets[i + 1] - 1].decode()
+
+    def __repr__(self):
+        return f"RecordBuffer(records={len(self)}, nbytes={self.nbytes})"
@@ -0,0 +1,132 @@
+import logging
+import random
+import time
+from typing import Callable, Dict, Iterable, Optional
+
+logger = logging.getLogger("kinesis_logging_utils")
+logger.setLevel(logging.INFO)
+
+# Default base delays (seconds) for PutRecords per-record error codes:
+# https://docs.aws.amazon.com/kinesis/latest/APIReference/API_PutRecordsResultEntry.html
+# Throttled shards need noticeably more time to recover than transient internal failures.
+DEFAULT_ERROR_CODE_BASE_DELAYS = {
+    "ProvisionedThroughputExceededException": 0.5,
+    "InternalFailure": 0.05,
+}
+
+
+class RetryPolicy:
+    """
+    Capped exponential backoff with full jitter, with base delay selected by error code and an optional deadline.
+    For details on full jitter, see: https://aws.amazon.com/blogs/architecture/exponential-backoff-and-jitter/
+
+    Clock, sleep and random functions can be replaced (e.g. for testing with a fake clock).
+    """
+
+    def __init__(
+        self,
+        base_delay: float = 0.1,
+        max_delay: float = 5.0,
+        error_code_base_delays: Optional[Dict[str, float]] = None,
+        deadline: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+        random_func: Callable[[], float] = random.random,
+    ):
+        """
+        :param base_delay: Base delay in seconds for error codes not listed in error_code_base_delays
+        :param max_delay: Maximum delay in seconds between retries
+        :param error_code_base_delays: Dictionary of error code to base delay in seconds
+                                       (default = DEFAULT_ERROR_CODE_BASE_DELAYS)
+        :param deadline: Point in time (as returned by clock) after which no more retries are attempted
+        :param clock: Function returning current time in seconds
+        :param sleep: Function to wait for a given number of seconds
+        :param random_func: Function returning a random float in [0.0, 1.0)
+        """
+        if error_code_base_delays is None:
+            error_code_base_delays = DEFAULT_ERROR_CODE_BASE_DELAYS
+
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.error_code_base_delays = error_code_base_delays
+        self.deadline = deadline
+        self.clock = clock
+        self.sleep = sleep
+        self.random_func = random_func
+
+    @classmethod
+    def from_lambda_context(cls, context, safety_margin: float = 1.0, **kwargs):
+        """
+        Create a RetryPolicy with a deadline derived from remaining execution time of a Lambda invocation
+
+        :param context: Lambda context object (second argument of Lambda handler function)
+        :param safety_margin: Seconds to leave for work after giving up on retries
+        :param kwargs: Other arguments for RetryPolicy
+        :return: RetryPolicy
+        """
+        clock = kwargs.get("clock", time.monotonic)
+        remaining = context.get_remaining_time_in_millis() / 1000
+
+        return cls(deadline=clock() + remaining - safety_margin, **kwargs)
+
+    def get_delay(self, attempt: int, error_codes: Iterable[str] = ()) -> float:
+        """
+        Get randomized delay before next retry
+
+        :param attempt: Number of retries already made (0 for first retry)
+        :param error_codes: Error codes of failed records, slowest error code determines the delay
+        :return: Delay in seconds
+        """
+        base_delay = max(
+            (self.error_code_base_delays.get(c, self.base_delay) for c in error_codes),
+            default=self.base_delay,
+        )
+        cap = min(self.max_delay, base_delay * (2**attempt))
+
+        return self.random_func() * cap
+
+    def get_remaining_time(self) -> Optional[float]:
+        """
+        :return: Seconds left until deadline, None if there is no deadline
+        """
+        if self.deadline is None:
+            return None
+
+        return self.deadline - self.clock()
+
+    def get_backoff_delay(
+        self, attempt: int, error_codes: Iterable[str] = ()
+    ) -> Optional[float]:
+        """
+        Get delay before next retry, unless waiting would pass the deadline
+
+        :param attempt: Number of retries already made (0 for first retry)
+        :param error_codes: Error codes of failed records
+        :return: Delay in seconds, None if caller should give up as deadline would be passed
+        """
+        delay = self.get_delay(attempt, error_codes)
+
+        remaining = self.get_remaining_time()
+        if remaining is not None and delay >= remaining:
+            logger.error(
+                f"Retry after {delay:.3f} s would exceed deadline ({remaining:.3f} s left), giving up"
+            )
+            return None
+
+        logger.info(f"Waiting {delay * 1000:.0f} ms before retrying")
+        return delay
+
+    def backoff(self, attempt: int, error_codes: Iterable[str] = ()) -> bool:
+        """
+        Wait before next retry unless waiting would pass the deadline
+
+        :param attempt: Number of retries already made (0 for first retry)
+        :param error_codes: Error codes of failed records
+        :return: True if caller should retry, False if deadline would be passed
+        """
+        delay = self.get_backoff_delay(attempt, error_codes)
+        if delay is None:
+            return False
+
+        self.sleep(delay)
+        return True
@@ -0,0 +1,182 @@
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Tuple, Union
+
+# Maximum number of distinct log types with a cached routing decision
+MAX_CACHED_DECISIONS = 10000
+
+KeyPath = Union[str, Tuple[str, ...]]
+
+_MISSING = object()
+
+
+def compile_key_path(key: KeyPath) -> Callable[[dict], Tuple[Any, bool]]:
+    """
+    Compile a key path to a getter function
+
+    :param key: Key name, or tuple of key names for nested fields (e.g. ("kubernetes", "labels", "app"))
+    :return: Function returning (value, missing) tuple for a dict, like misc.dict_get_default with default None
+    """
+    if isinstance(key, str) or len(key) == 1:
+        key = key if isinstance(key, str) else key[0]
+
+        def get(dictionary: dict) -> Tuple[Any, bool]:
+            value = dictionary.get(key, _MISSING)
+            if value is _MISSING:
+                return None, True
+
+            return value, False
+
+        return get
+
+    path = tuple(key)
+
+    def get_nested(dictionary: dict) -> Tuple[Any, bool]:
+        value = dictionary
+        for k in path:
+            if type(value) is not dict:
+                return None, True
+
+            value = value.get(k, _MISSING)
+            if value is _MISSING:
+                return None, True
+
+        return value, False
+
+    return get_nested
+
+
+class _PatternSet:
+    """
+    Set of exact names and prefix patterns (names ending with "*")
+    """
+
+    def __init__(self, patterns: Iterable[str]):
+        patterns = list(patterns)
+
+        self.names = frozenset(p for p in patterns if not p.endswith("*"))
+        # str.startswith with a tuple checks all prefixes in a single C call
+        self.prefixes = tuple(sorted(p[:-1] for p in patterns if p.endswith("*")))
+
+    def match(self, name: str) -> bool:
+        return name in self.names or (
+            bool(self.prefixes) and name.startswith(self.prefixes)
+        )
+
+
+class RoutingRules:
+    """
+    Log type routing rules compiled once into sets, prefix tuples and key path getters.
+    Routing decisions are cached per log type, so routing a record costs a field lookup and a dict lookup.
+
+    Patterns are exact log type names or prefixes ending with "*" (e.g. "app_*"). Deny patterns take
+    precedence over allow patterns, and rename rules are applied to allowed log types.
+
+    >>> rules = RoutingRules(
+    ...     log_type_key=("kubernetes", "labels", "log_type"),
+    ...     allow=["nginx_*", "app"],
+    ...     deny=["nginx_debug"],
+    ...     rename={"app": "application"},
+    ... )
+    >>> rules.route({"kubernetes": {"labels": {"log_type": "app"}}})
+    ('application', False)
+    """
+
+    def __init__(
+        self,
+        log_type_key: KeyPath = "log_type",
+        allow: Iterable[str] = None,
+        deny: Iterable[str] = None,
+        rename: Dict[str, str] = None,
+    ):
+        """
+        :param log_type_key: Log type key name, or tuple of key names for nested field
+        :param allow: Log type patterns to keep (default = keep all log types)
+        :param deny: Log type patterns to drop (default = drop none)
+        :param rename: Dictionary of log type to destination log type
+        """
+        self.get_log_type = compile_key_path(log_type_key)
+        self.allow = None if allow is None else _PatternSet(allow)
+        self.deny = _PatternSet(deny or [])
+        self.rename = dict(rename or {})
+
+        self._decisions = {}
+
+    def route_log_type(self, log_type: Any) -> Optional[str]:
+        """
+        :param log_type: Log type of a record (non-str values are converted with str)
+        :return: Destination log type, or None if records of this log type should be dropped
+        """
+        if not isinstance(log_type, str):
+            log_type = str(log_type)
+
+        try:
+            return self._decisions[log_type]
+        except KeyError:
+            pass
+
+        if len(self._decisions) >= MAX_CACHED_DECISIONS:
+            self._decisions.clear()
+
+        decision = self._decide(log_type)
+        self._decisions[log_type] = decision
+
+        return decision
+
+    def route(self, payload: dict) -> Optional[Tuple[Optional[str], bool]]:
+        """
+        Route a single record
+
+        :param payload: Record
+        :return: (destination log type, log type missing) tuple, or None if record should be dropped.
+                 Log type is None if record has no log type field.
+        """
+        log_type, missing = self.get_log_type(payload)
+        if missing:
+            return None, True
+
+        log_type = self.route_log_type(log_type)
+        if log_type is None:
+            return None
+
+        return log_type, False
+
+    def route_batch(
+        self, payloads: Iterable[Any]
+    ) -> Iterator[Tuple[dict, Optional[str], bool]]:
+        """
+        Route a batch of records, skipping dropped records and records that are not dicts
+
+        :param payloads: Records
+        :return: Iterator of (record, destination log type, log type missing) tuples
+        """
+        get_log_type = self.get_log_type
+        decisions = self._decisions
+        route_log_type = self.route_log_type
+
+        for payload in payloads:
+            if type(payload) is not dict:
+                continue
+
+            log_type, missing = get_log_type(payload)
+            if missing:
+                yield payload, None, True
+                continue
+
+            # inlined cache lookup of route_log_type
+            destination = _MISSING
+            if type(log_type) is str:
+                destination = decisions.get(log_type, _MISSING)
+
+            if destination is _MISSING:
+                destination = route_log_type(log_type)
+
+            if destination is not None:
+                yield payload, destination, False
+
+    def _decide(self, log_type: str) -> Optional[str]:
+        if self.deny.match(log_type):
+            return None
+
+        if self.allow is not None and not self.allow.match(log_type):
+            return None
+
+        return self.rename.get(log_type, log_type)
@@ -1,28 +1,261 @@
-import gzip
 import io
 import logging
+from typing import Iterable, Union
+
+from .compression import Codec, get_codec
 
 logger = logging.getLogger("kinesis_logging_utils")
 logger.setLevel(logging.INFO)
 
+# S3 multipart upload limits:
+# https://docs.aws.amazon.com/AmazonS3/latest/userguide/qfacts.html
+MIN_PART_SIZE = 5 * 1024 * 1024
+DEFAULT_PART_SIZE = 8 * 1024 * 1024
+
+# Amount of uncompressed data collected before it is passed to compressor
+WRITE_CHUNK_SIZE = 256 * 1024
 
-def put_str_data(client, bucket: str, key: str, data: str, gzip_compress: bool = False):
+
+def resolve_codec(gzip_compress: bool = False, compression: str = None) -> Codec:
     """
-    Put str data to S3 bucket with optional gzip compression
+    Get compression codec from compression name, falling back to gzip_compress switch if name is not specified
+
+    :param gzip_compress: Boolean switch to control gzip compression
+    :param compression: Compression codec name ("none", "gzip" or "zstd"), overrides gzip_compress
+    :return: Codec
+    """
+    if compression is None:
+        compression = "gzip" if gzip_compress else "none"
+
+    return get_codec(compression)
+
+
+def put_str_data(
+    client,
+    bucket: str,
+    key: str,
+    data: Union[str, bytes],
+    gzip_compress: bool = False,
+    compression: str = None,
+    compression_level: int = None,
+) -> int:
+    """
+    Put str (or already encoded bytes) data to S3 bucket with optional compression
 
     :param client: S3 API client (e.g. boto3.client('s3') )
     :param bucket: S3 bucket name
     :param key: S3 object key
     :param data: Data to save
     :param gzip_compress: Boolean switch to control gzip compression (default = False)
+    :param compression: Compression codec name ("none", "gzip" or "zstd"), overrides gzip_compress
+    :param compression_level: Compression level (default = codec default, e.g. 6 for gzip)
+    :return: Size of uploaded object in bytes
     """
-    if gzip_compress:
-        # gzip and put data to s3 in-memory
-        data_p = gzip.compress(data.encode(), compresslevel=9)
-    else:
-        data_p = data.encode()
+    # compress and put data to s3 in-memory
+    codec = resolve_codec(gzip_compress, compression)
+    if isinstance(data, str):
+        data = data.encode()
+
+    data_p = codec.compress(data, compression_level)
 
     with io.BytesIO(data_p) as fileobj:
         s3_results = client.upload_fileobj(fileobj, bucket, key)
 
     logger.info(f"S3 upload errors: {s3_results}")
+    return len(data_p)
+
+
+def put_lines(
+    client,
+    bucket: str,
+    key: str,
+    lines: Iterable[str],
+    gzip_compress: bool = False,
+    part_size: int = DEFAULT_PART_SIZE,
+    compression: str = None,
+    compression_level: int = None,
+) -> int:
+    """
+    Put lines of str data to S3 bucket with optional compression, streaming data through S3 multipart upload.
+    Peak memory usage is bounded by part_size instead of data size.
+
+    :param client: S3 API client (e.g. boto3.client('s3') )
+    :param bucket: S3 bucket name
+    :param key: S3 object key
+    :param lines: Lines to save, joined with newlines
+    :param gzip_compress: Boolean switch to control gzip compression (default = False)
+    :param part_size: Size of a single multipart upload part in bytes (min 5 MiB)
+    :param compression: Compression codec name ("none", "gzip" or "zstd"), overrides gzip_compress
+    :param compression_level: Compression level (default = codec default, e.g. 6 for gzip)
+    :return: Size of uploaded object in bytes
+    """
+    with S3StreamWriter(
+        client,
+        bucket,
+        key,
+        gzip_compress,
+        part_size,
+        compression=compression,
+        compression_level=compression_level,
+    ) as writer:
+        for line in lines:
+            writer.write_line(line)
+
+    return writer.bytes_uploaded
+
+
+class S3StreamWriter:
+    """
+    Incremental writer that compresses data as it is written and uploads it in parts with S3 multipart upload.
+    Data smaller than a single part is uploaded with a single upload_fileobj call instead.
+
+    Use as a context manager: the upload is completed on exit, or aborted if an exception was raised.
+    """
+
+    def __init__(
+        self,
+        client,
+        bucket: str,
+        key: str,
+        gzip_compress: bool = False,
+        part_size: int = DEFAULT_PART_SIZE,
+        compression: str = None,
+        compression_level: int = None,
+    ):
+        """
+        :param client: S3 API client (e.g. boto3.client('s3') )
+        :param bucket: S3 bucket name
+        :param key: S3 object key
+        :param gzip_compress: Boolean switch to control gzip compression (default = False)
+        :param part_size: Size of a single multipart upload part in bytes (min 5 MiB)
+        :param compression: Compression codec name ("none", "gzip" or "zstd"), overrides gzip_compress
+        :param compression_level: Compression level (default = codec default, e.g. 6 for gzip)
+        """
+        if part_size < MIN_PART_SIZE:
+            raise ValueError(
+                f"part_size must be at least {MIN_PART_SIZE} bytes, got {part_size}"
+            )
+
+        self.client = client
+        self.bucket = bucket
+        self.key = key
+        self.part_size = part_size
+
+        self.bytes_uploaded = 0
+
+        self._compressor = resolve_codec(gzip_compress, compression).compressor(
+            compression_level
+        )
+        self._chunk = []
+        self._chunk_size = 0
+        self._buffer = bytearray()
+        self._first_line = True
+
+        self._upload_id = None
+        self._parts = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def write_line(self, line: str):
+        """
+        Write a single line, lines are separated with newlines
+
+        :param line: Line to write (without trailing newline)
+        """
+        if self._first_line:
+            self._first_line = False
+        else:
+            self._chunk.append(b"\n")
+
+        data = line.encode()
+        self._chunk.append(data)
+        self._chunk_size += len(data) + 1
+
+        if self._chunk_size >= WRITE_CHUNK_SIZE:
+            self._flush_chunk()
+
+    def close(self):
+        """
+        Flush remaining data and complete the upload. Multipart upload is aborted if this fails.
+        """
+        try:
+            self._complete()
+        except Exception:
+            self.abort()
+            raise
+
+    def _complete(self):
+        self._flush_chunk()
+        self._buffer += self._compressor.flush()
+
+        if self._upload_id is None:
+            # everything fit in a single part, no need for multipart upload
+            with io.BytesIO(self._buffer) as fileobj:
+                s3_results = self.client.upload_fileobj(fileobj, self.bucket, self.key)
+
+            self.bytes_uploaded += len(self._buffer)
+            self._buffer = bytearray()
+            logger.info(f"S3 upload errors: {s3_results}")
+            return
+
+        if len(self._buffer) > 0:
+            self._upload_part()
+
+        self.client.complete_multipart_upload(
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self._upload_id,
+            MultipartUpload={"Parts": self._parts},
+        )
+        logger.info(
+            f"Completed multipart upload of {len(self._parts)} parts to s3://{self.bucket}/{self.key}"
+        )
+
+    def abort(self):
+        """
+        Abort multipart upload (if started) and discard buffered data
+        """
+        self._chunk = []
+        self._buffer = bytearray()
+
+        if self._upload_id is not None:
+            logger.error(f"Aborting multipart upload to s3://{self.bucket}/{self.key}")
+            self.client.abort_multipart_upload(
+                Bucket=self.bucket, Key=self.key, UploadId=self._upload_id
+            )
+
+    def _flush_chunk(self):
+        data = b"".join(self._chunk)
+        self._chunk = []
+        self._chunk_size = 0
+        self._buffer += self._compressor.compress(data)
+
+        if len(self._buffer) >= self.part_size:
+            self._upload_part()
+
+    def _upload_part(self):
+        if self._upload_id is None:
+            response = self.client.create_multipart_upload(
+                Bucket=self.bucket, Key=self.key
+            )
+            self._upload_id = response["UploadId"]
+
+        part_number = len(self._parts) + 1
+        response = self.client.upload_part(
+            Bucket=self.bucket,
+            Key=self.key,
+            PartNumber=part_number,
+            UploadId=self._upload_id,
+            Body=bytes(self._buffer),
+        )
+        self._parts.append({"ETag": response["ETag"], "PartNumber": part_number})
+
+        self.bytes_uploaded += len(self._buffer)
+        self._buffer = bytearray()
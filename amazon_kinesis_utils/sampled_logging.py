@@ -0,0 +1,106 @@
+import logging
+import random
+import threading
+from typing import Callable, Dict
+
+logger = logging.getLogger("kinesis_logging_utils")
+logger.setLevel(logging.INFO)
+
+# Number of messages logged per key until next flush, before messages are only counted (and sampled)
+DEFAULT_MAX_MESSAGES_PER_KEY = 5
+
+
+class SampledLogger:
+    """
+    Rate-limited, sampled logging for messages that can be logged once per record (e.g. malformed records).
+
+    Every message has a key (e.g. 'missing field "log_type"'). Occurrences of every key are counted, only first
+    max_messages_per_key messages per key are logged, and the rest are sampled with sample_rate. Messages are
+    formatted lazily by logging module (%-style args), so suppressed messages cost a counter increment.
+    Call flush() once per batch to log aggregated counters ("N records: <key>") and reset them.
+    """
+
+    def __init__(
+        self,
+        target_logger: logging.Logger = logger,
+        max_messages_per_key: int = DEFAULT_MAX_MESSAGES_PER_KEY,
+        sample_rate: float = 0.0,
+        random_func: Callable[[], float] = random.random,
+    ):
+        """
+        :param target_logger: Logger to log messages with
+        :param max_messages_per_key: Messages logged per key until next flush (default = 5)
+        :param sample_rate: Fraction of messages logged after max_messages_per_key is reached (default = 0.0)
+        :param random_func: Function returning a random float in [0.0, 1.0), used for sampling
+        """
+        self.logger = target_logger
+        self.max_messages_per_key = max_messages_per_key
+        self.sample_rate = sample_rate
+        self.random_func = random_func
+
+        self._counts = {}
+        self._levels = {}
+        self._lock = threading.Lock()
+
+    def log(self, level: int, key: str, msg: str, *args):
+        """
+        Count an occurrence of key and log message if it is not rate-limited
+
+        :param level: Logging level (e.g. logging.WARNING)
+        :param key: Message key, counters are aggregated by key
+        :param msg: Message format string (%-style, formatted only if message is logged)
+        :param args: Message format arguments
+        """
+        with self._lock:
+            count = self._counts.get(key, 0) + 1
+            self._counts[key] = count
+            self._levels[key] = max(level, self._levels.get(key, level))
+
+        if count <= self.max_messages_per_key or (
+            self.sample_rate > 0.0 and self.random_func() < self.sample_rate
+        ):
+            self.logger.log(level, msg, *args)
+
+    def info(self, key: str, msg: str, *args):
+        self.log(logging.INFO, key, msg, *args)
+
+    def warning(self, key: str, msg: str, *args):
+        self.log(logging.WARNING, key, msg, *args)
+
+    def error(self, key: str, msg: str, *args):
+        self.log(logging.ERROR, key, msg, *args)
+
+    def get_counts(self) -> Dict[str, int]:
+        """
+        :return: Dictionary of key to number of occurrences since last flush
+        """
+        with self._lock:
+            return dict(self._counts)
+
+    def flush(self) -> Dict[str, int]:
+        """
+        Log aggregated counters (one message per key, at highest level used for key) and reset them
+
+        :return: Dictionary of key to number of occurrences since last flush
+        """
+        with self._lock:
+            counts, levels = self._counts, self._levels
+            self._counts, self._levels = {}, {}
+
+        for key, count in counts.items():
+            self.logger.log(levels[key], "%d records: %s", count, key)
+
+        return counts
+
+
+#: SampledLogger used in this package
+sampled_logger = SampledLogger()
+
+
+def flush() -> Dict[str, int]:
+    """
+    Log and reset aggregated counters of package SampledLogger, e.g. at the end of Lambda invocation
+
+    :return: Dictionary of key to number of occurrences since last flush
+    """
+    return sampled_logger.flush()
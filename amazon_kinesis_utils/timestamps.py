@@ -0,0 +1,128 @@
+import datetime
+import functools
+import re
+
+# epoch seconds (or milliseconds) as string, e.g. "1592558220" or "1592558220.123". Only lengths of seconds
+# (9-10 digits) and milliseconds (12-13 digits) since 1973, so ISO 8601 basic format dates (e.g. "20200618") are not
+# mistaken for epoch timestamps
+EPOCH_PATTERN = re.compile(r"^(\d{9,10}|\d{12,13})(\.\d+)?$")
+
+# ISO 8601 subset accepted by datetime.fromisoformat, used on Python 3.6 which does not have it
+ISO8601_PATTERN = re.compile(
+    r"^(\d{4})-(\d{2})-(\d{2})"
+    r"(?:[T ](\d{2}):(\d{2})(?::(\d{2})(?:\.(\d{1,6}))?)?"
+    r"(?:([+-])(\d{2}):(\d{2}))?)?$"
+)
+
+# epoch values larger than this are treated as milliseconds (year 5138 in seconds)
+MAX_EPOCH_SECONDS = 10**11
+
+
+def parse_timestamp(value) -> datetime.datetime:
+    """
+    Parse a timestamp from log data. ISO 8601 strings and epoch seconds/milliseconds (numbers or numeric strings)
+    are parsed without dateutil, other formats fall back to dateutil.parser.parse.
+    Parsed strings are cached, as log records in a batch usually have many identical timestamps.
+
+    :param value: Timestamp (str, int, float or datetime)
+    :return: Parsed timestamp (timezone-aware if timezone was specified, epoch timestamps are in UTC)
+    :raises TypeError: if value is not a supported type
+    :raises ValueError: if value can not be parsed
+    """
+    if isinstance(value, datetime.datetime):
+        return value
+
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return _parse_epoch(value)
+
+    if isinstance(value, str):
+        return _parse_timestamp_str(value)
+
+    raise TypeError(f"Unsupported timestamp type: {type(value)}")
+
+
+@functools.lru_cache(maxsize=4096)
+def _parse_timestamp_str(value: str) -> datetime.datetime:
+    if EPOCH_PATTERN.match(value):
+        return _parse_epoch(float(value))
+
+    try:
+        return _parse_iso8601(value)
+    except ValueError:
+        pass
+
+    # dateutil is slow to import and to parse with, only use it for formats not handled above
+    import dateutil.parser
+
+    return dateutil.parser.parse(value)
+
+
+def _parse_iso8601(value: str) -> datetime.datetime:
+    # datetime.fromisoformat does not accept "Z" suffix before Python 3.11
+    if value.endswith("Z"):
+        value = value[:-1] + "+00:00"
+
+    if hasattr(datetime.datetime, "fromisoformat"):
+        return datetime.datetime.fromisoformat(value)
+
+    return _parse_iso8601_pattern(value)
+
+
+def _parse_iso8601_pattern(value: str) -> datetime.datetime:
+    match = ISO8601_PATTERN.match(value)
+    if match is None:
+        raise ValueError(f"Invalid ISO 8601 timestamp: {value}")
+
+    (
+        year,
+        month,
+        day,
+        hour,
+        minute,
+        second,
+        fraction,
+        sign,
+        offset_hours,
+        offset_minutes,
+    ) = match.groups()
+
+    tzinfo = None
+    if sign is not None:
+        offset = datetime.timedelta(
+            hours=int(offset_hours), minutes=int(offset_minutes)
+        )
+        tzinfo = datetime.timezone(-offset if sign == "-" else offset)
+
+    return datetime.datetime(
+        int(year),
+        int(month),
+        int(day),
+        int(hour or 0),
+        int(minute or 0),
+        int(second or 0),
+        int((fraction or "0").ljust(6, "0")),
+        tzinfo=tzinfo,
+    )
+
+
+def _parse_epoch(value: float) -> datetime.datetime:
+    if value > MAX_EPOCH_SECONDS:
+        value = value / 1000
+
+    return datetime.datetime.fromtimestamp(value, tz=datetime.timezone.utc)
+
+
+def floor_timestamp(
+    timestamp: datetime.datetime, bucket_seconds: int = 3600
+) -> datetime.datetime:
+    """
+    Round timestamp down to the start of its time bucket (e.g. start of hour)
+
+    :param timestamp: Timestamp to round
+    :param bucket_seconds: Bucket size in seconds (should divide a day evenly, default = 1 hour)
+    :return: Start of time bucket, with same timezone as timestamp
+    """
+    midnight = timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+    seconds = int((timestamp - midnight).total_seconds())
+
+    return midnight + datetime.timedelta(seconds=seconds - seconds % bucket_seconds)
@@ -0,0 +1,6 @@
+"""
+Micro-benchmarks for amazon_kinesis_utils. Not part of the distributed package.
+
+Run a benchmark from repository root, e.g.: python -m benchmarks.bench_partition_keys
+Run the whole suite with JSON report: python -m benchmarks.run
+"""
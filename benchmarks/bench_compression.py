@@ -0,0 +1,100 @@
+"""
+Compression codecs and levels on representative log corpora: throughput (MB/s of input) and compression ratio.
+
+Usage: python -m benchmarks.bench_compression [approximate corpus size in MB]
+"""
+
+import json
+import random
+import sys
+import time
+import uuid
+
+from amazon_kinesis_utils import compression
+
+PATHS = ["/", "/api/users", "/api/orders", "/healthcheck", "/static/app.js"]
+LEVELS = ["INFO", "INFO", "INFO", "WARN", "ERROR", "DEBUG"]
+
+
+def access_log(i: int) -> dict:
+    return {
+        "log_type": "access_log",
+        "log_id": str(uuid.uuid4()),
+        "time": f"2020-06-19T09:{i // 60 % 60:02d}:{i % 60:02d}.{i % 1000:03d}Z",
+        "method": random.choice(["GET", "GET", "GET", "POST", "PUT"]),
+        "path": random.choice(PATHS),
+        "status": random.choice([200, 200, 200, 201, 304, 404, 500]),
+        "latency_ms": round(random.expovariate(1 / 40), 3),
+        "user_agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36",
+        "remote_addr": f"10.0.{random.randint(0, 255)}.{random.randint(0, 255)}",
+    }
+
+
+def application_log(i: int) -> dict:
+    return {
+        "log_type": "application_log",
+        "log_id": str(uuid.uuid4()),
+        "time": f"2020-06-19T09:{i // 60 % 60:02d}:{i % 60:02d}.{i % 1000:03d}Z",
+        "level": random.choice(LEVELS),
+        "message": " ".join(
+            random.choice(["user", "order", "created", "failed", "retry", "cache"])
+            for _ in range(random.randint(3, 20))
+        ),
+        "request_id": uuid.uuid4().hex,
+        "context": {"user_id": random.randint(1, 100000), "feature": "checkout"},
+    }
+
+
+CORPORA = {
+    "access_log": access_log,
+    "application_log": application_log,
+}
+
+
+def generate_corpus(generator, size: int) -> bytes:
+    lines = []
+    total = 0
+    i = 0
+
+    while total < size:
+        line = json.dumps(generator(i))
+        lines.append(line)
+        total += len(line) + 1
+        i += 1
+
+    return "\n".join(lines).encode()
+
+
+def measure(codec, level, data: bytes, repeat: int = 3) -> tuple:
+    best = None
+    compressed = b""
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        compressed = codec.compress(data, level)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    return len(data) / best / 1e6, len(data) / len(compressed)
+
+
+def main(size_mb: int = 8):
+    random.seed(0)
+
+    cases = [("gzip", level) for level in (1, 3, 6, 9)]
+    if "zstd" in compression.available_codecs():
+        cases += [("zstd", level) for level in (1, 3, 9, 19)]
+
+    print(f"{'corpus':18s} {'codec':6s} {'level':>5s} {'MB/s':>10s} {'ratio':>8s}")
+    for corpus_name, generator in CORPORA.items():
+        data = generate_corpus(generator, size_mb * 1024 * 1024)
+
+        for codec_name, level in cases:
+            mb_per_sec, ratio = measure(compression.get_codec(codec_name), level, data)
+            print(
+                f"{corpus_name:18s} {codec_name:6s} {level:5d} {mb_per_sec:10.1f} {ratio:8.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:]])
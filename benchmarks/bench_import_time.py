@@ -0,0 +1,58 @@
+"""
+Import time of package modules (cold start latency), measured with python -X importtime in fresh interpreters.
+
+Usage: python -m benchmarks.bench_import_time [runs] [module ...]
+"""
+
+import statistics
+import subprocess
+import sys
+
+MODULES = [
+    "amazon_kinesis_utils.kinesis",
+    "amazon_kinesis_utils.baikonur_logging",
+    "amazon_kinesis_utils.s3",
+    "amazon_kinesis_utils.misc",
+]
+
+
+def import_times(module: str) -> dict:
+    """
+    :return: Dictionary of imported module name to cumulative import time in microseconds
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    )
+
+    times = {}
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+
+        _, cumulative, name = line[len("import time:") :].split("|")
+        times[name.strip()] = int(cumulative)
+
+    return times
+
+
+def main(runs: int = 10, *modules):
+    modules = modules or MODULES
+
+    for module in modules:
+        samples = [import_times(module) for _ in range(runs)]
+        total = statistics.median(s[module] for s in samples) / 1000
+
+        print(f"{module:45s} {total:8.2f} ms (median of {runs})")
+
+        # slowest dependencies, imported directly or indirectly
+        slowest = sorted(samples[-1].items(), key=lambda x: x[1], reverse=True)
+        for name, cumulative in slowest[1:6]:
+            print(f"    {name:41s} {cumulative / 1000:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main(*([int(sys.argv[1])] + sys.argv[2:] if len(sys.argv) > 1 else []))
@@ -0,0 +1,78 @@
+"""
+parse_records throughput: previous per-record generator vs current batch decode path and process pool.
+
+Usage: python -m benchmarks.bench_parse_records [record count]
+"""
+
+import base64
+import gzip
+import sys
+import timeit
+from json import JSONDecodeError, loads
+
+from aws_kinesis_agg.deaggregator import iter_deaggregate_records
+
+from amazon_kinesis_utils import kinesis
+from benchmarks.events import aggregated_event, cloudwatch_event, plain_event
+
+
+def legacy_normalize_cloudwatch_messages(payload: str) -> list:
+    if len(payload) < 1:
+        return []
+
+    try:
+        payload_json = loads(payload)
+        if type(payload_json) is not dict:
+            return []
+
+    except JSONDecodeError:
+        return [payload]
+
+    if "messageType" not in payload_json:
+        return [payload]
+
+    return kinesis.extract_data_from_json_cwl_message(payload_json)
+
+
+def legacy_parse_records(raw_records: list):
+    for record in iter_deaggregate_records(raw_records):
+        kinesis.logger.debug(f"Raw Kinesis record: {record}")
+
+        raw_data = base64.b64decode(record["kinesis"]["data"])
+
+        if raw_data[0] == 0x1F and raw_data[1] == 0x8B:
+            raw_data = gzip.decompress(raw_data)
+
+        data = raw_data.decode()
+        payloads = legacy_normalize_cloudwatch_messages(data)
+        kinesis.logger.debug(f"Normalized payloads: {payloads}")
+
+        for payload in payloads:
+            yield payload
+
+
+def main(count: int = 10000, repeat: int = 5):
+    events = {
+        "plain JSON": plain_event(count),
+        "gzipped CloudWatch Logs": cloudwatch_event(count),
+        "KPL aggregated": aggregated_event(count),
+    }
+
+    for event_name, raw_records in events.items():
+        assert list(legacy_parse_records(raw_records)) == list(
+            kinesis.parse_records(raw_records)
+        )
+
+        for name, func in [
+            ("legacy parse_records", legacy_parse_records),
+            ("parse_records", kinesis.parse_records),
+            ("parse_records_parallel", kinesis.parse_records_parallel),
+        ]:
+            seconds = min(
+                timeit.repeat(lambda: list(func(raw_records)), number=1, repeat=repeat)
+            )
+            print(f"{event_name:25s} {name:22s} {count / seconds:>12,.0f} records/s")
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,47 @@
+"""
+Partition key generation: previous per-record random.choices implementation vs bulk strategies.
+
+Usage: python -m benchmarks.bench_partition_keys [record count]
+"""
+
+import json
+import random
+import string
+import sys
+import timeit
+
+from amazon_kinesis_utils import kinesis, partition_keys
+
+
+def legacy_create_record(data: str) -> dict:
+    random_alphanumerical = (
+        string.ascii_lowercase + string.ascii_uppercase + string.digits
+    )
+
+    data_blob = data.encode("utf-8")
+    partition_key: str = "".join(random.choices(random_alphanumerical, k=20))
+    return {"Data": data_blob, "PartitionKey": partition_key}
+
+
+def main(count: int = 100000, repeat: int = 5):
+    data = [json.dumps({"user_id": i % 1000, "message": "hello"}) for i in range(count)]
+
+    cases = {
+        "legacy create_record loop": lambda: [legacy_create_record(d) for d in data],
+        "create_record loop": lambda: [kinesis.create_record(d) for d in data],
+        "create_records (RandomPartitionKeys)": lambda: kinesis.create_records(data),
+        "create_records (FieldHashPartitionKeys)": lambda: kinesis.create_records(
+            data, partition_keys.FieldHashPartitionKeys("user_id")
+        ),
+        "create_records (ExplicitHashKeys)": lambda: kinesis.create_records(
+            data, partition_keys.ExplicitHashKeys.from_shard_count(16)
+        ),
+    }
+
+    for name, func in cases.items():
+        seconds = min(timeit.repeat(func, number=1, repeat=repeat))
+        print(f"{name:45s} {count / seconds:>12,.0f} records/s")
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,52 @@
+"""
+Memory usage of log_dict records: list of parsed dicts vs RecordBuffer (serialized JSON), measured with tracemalloc.
+
+Usage: python -m benchmarks.bench_record_buffer [record count]
+"""
+
+import json
+import random
+import sys
+import time
+import tracemalloc
+
+from amazon_kinesis_utils.record_buffer import RecordBuffer
+from benchmarks.bench_compression import CORPORA
+
+
+def measure(container_factory, payloads: list) -> tuple:
+    tracemalloc.start()
+    start = time.perf_counter()
+
+    container = container_factory()
+    for payload in payloads:
+        # parse inside measured section, as parse_records does for every record
+        container.append(json.loads(payload))
+
+    elapsed = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return current, peak, elapsed
+
+
+def main(count: int = 100000):
+    random.seed(0)
+
+    print(
+        f"{'corpus':18s} {'container':12s} {'JSON MB':>8s} {'held MB':>8s} {'peak MB':>8s} {'ratio':>6s} {'s':>6s}"
+    )
+    for corpus_name, generator in CORPORA.items():
+        payloads = [json.dumps(generator(i)) for i in range(count)]
+        json_size = sum(len(p) + 1 for p in payloads)
+
+        for container_name, factory in [("list", list), ("RecordBuffer", RecordBuffer)]:
+            current, peak, elapsed = measure(factory, payloads)
+            print(
+                f"{corpus_name:18s} {container_name:12s} {json_size / 1e6:8.1f} {current / 1e6:8.1f} "
+                f"{peak / 1e6:8.1f} {current / json_size:6.2f} {elapsed:6.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:]])
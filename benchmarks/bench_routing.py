@@ -0,0 +1,95 @@
+"""
+Routing throughput: parse_payload_to_log_dict with log type whitelist vs precompiled RoutingRules (per record and
+batched with parse_payloads_to_log_dict).
+
+Usage: python -m benchmarks.bench_routing [record count]
+"""
+
+import random
+import sys
+import time
+
+from amazon_kinesis_utils import baikonur_logging
+from amazon_kinesis_utils.routing import RoutingRules
+
+LOG_TYPES = [f"service_{i}_{kind}" for i in range(20) for kind in ("access", "app")]
+WHITELIST = [t for t in LOG_TYPES if not t.startswith("service_1")]
+
+KWARGS = dict(
+    log_id_key="log_id",
+    log_timestamp_key="time",
+    log_type_unknown_prefix="unknown",
+)
+
+
+def generate_payloads(count: int) -> list:
+    return [
+        {
+            "log_type": random.choice(LOG_TYPES),
+            "log_id": str(i),
+            "time": f"2020-06-19T09:{i // 60 % 60:02d}:{i % 60:02d}Z",
+            "message": "GET /api/users 200",
+        }
+        for i in range(count)
+    ]
+
+
+def whitelist(payloads: list):
+    log_dict, failed_dict = {}, {}
+    for payload in payloads:
+        baikonur_logging.parse_payload_to_log_dict(
+            payload,
+            log_dict,
+            failed_dict,
+            log_type_key="log_type",
+            log_type_whitelist=WHITELIST,
+            **KWARGS,
+        )
+
+
+def rules_per_record(payloads: list):
+    rules = RoutingRules(deny=["service_1*"])
+    log_dict, failed_dict = {}, {}
+    for payload in payloads:
+        baikonur_logging.parse_payload_to_log_dict(
+            payload,
+            log_dict,
+            failed_dict,
+            log_type_key=None,
+            routing_rules=rules,
+            **KWARGS,
+        )
+
+
+def rules_batch(payloads: list):
+    rules = RoutingRules(deny=["service_1*"])
+    baikonur_logging.parse_payloads_to_log_dict(
+        payloads, {}, {}, routing_rules=rules, **KWARGS
+    )
+
+
+def route_only(payloads: list):
+    rules = RoutingRules(deny=["service_1*"])
+    for _ in rules.route_batch(payloads):
+        pass
+
+
+def main(count: int = 1000000):
+    random.seed(0)
+    payloads = generate_payloads(count)
+
+    print(f"{'case':18s} {'s':>8s} {'records/s':>12s}")
+    for name, function in [
+        ("whitelist", whitelist),
+        ("rules_per_record", rules_per_record),
+        ("rules_batch", rules_batch),
+        ("route_batch_only", route_only),
+    ]:
+        start = time.perf_counter()
+        function(payloads)
+        elapsed = time.perf_counter() - start
+        print(f"{name:18s} {elapsed:8.2f} {count / elapsed:12.0f}")
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,138 @@
+"""
+Synthetic Lambda Kinesis events for benchmarks: plain and KPL aggregated records, gzipped CloudWatch Logs
+subscription filter envelopes, mixed log types and configurable payload sizes.
+"""
+
+import base64
+import gzip
+import json
+import random
+
+from amazon_kinesis_utils import kinesis
+
+LOG_TYPES = ["access_log", "application_log", "audit_log", "debug_log"]
+
+SHARD_ID = "shardId-000000000000"
+
+
+def lambda_record(data: bytes, sequence_number: int = 0) -> dict:
+    sequence_number = (
+        f"{49590338271490256608559692538361571095921575989136588898 + sequence_number}"
+    )
+
+    return {
+        "kinesis": {
+            "kinesisSchemaVersion": "1.0",
+            "partitionKey": "0",
+            "sequenceNumber": sequence_number,
+            "data": base64.b64encode(data).decode(),
+            "approximateArrivalTimestamp": 1592558220.000,
+        },
+        "eventSource": "aws:kinesis",
+        "eventID": f"{SHARD_ID}:{sequence_number}",
+    }
+
+
+def log_line(i: int, log_type: str = None, size: int = 200) -> str:
+    """
+    :param i: Record number, used for IDs and timestamps
+    :param log_type: Log type (default = one of LOG_TYPES, by record number)
+    :param size: Approximate JSON size in bytes
+    """
+    if log_type is None:
+        log_type = LOG_TYPES[i % len(LOG_TYPES)]
+
+    record = {
+        "log_type": log_type,
+        "log_id": f"{i:032x}",
+        "time": f"2020-06-19T09:{i // 60 % 60:02d}:{i % 60:02d}.000Z",
+        "message": "",
+    }
+    padding = max(0, size - len(json.dumps(record)))
+    record["message"] = ("hello world " * (padding // 12 + 1))[:padding]
+
+    return json.dumps(record)
+
+
+def log_lines(count: int, size: int = 200, log_types: list = None) -> list:
+    """
+    :param count: Number of log lines
+    :param size: Approximate size of every line in bytes
+    :param log_types: Log types to choose from at random (default = LOG_TYPES cycled in order)
+    """
+    if log_types is None:
+        return [log_line(i, size=size) for i in range(count)]
+
+    rng = random.Random(0)
+    return [log_line(i, rng.choice(log_types), size) for i in range(count)]
+
+
+def plain_event(count: int, size: int = 200) -> list:
+    """
+    :return: Lambda event records with one JSON log line per record
+    """
+    return [
+        lambda_record(line.encode(), i) for i, line in enumerate(log_lines(count, size))
+    ]
+
+
+def cloudwatch_event(count: int, events_per_record: int = 10, size: int = 200) -> list:
+    """
+    :return: Lambda event records with gzipped CloudWatch Logs DATA_MESSAGE envelopes,
+             events_per_record log events each (count log events in total)
+    """
+    lines = log_lines(count, size)
+    records = []
+
+    for r in range(0, count, events_per_record):
+        message = {
+            "messageType": "DATA_MESSAGE",
+            "owner": "000000000000",
+            "logGroup": "log-group",
+            "logStream": "log-stream",
+            "subscriptionFilters": ["filter"],
+            "logEvents": [
+                {"id": str(r + i), "timestamp": 1592558220000, "message": line}
+                for i, line in enumerate(lines[r : r + events_per_record])
+            ],
+        }
+        records.append(
+            lambda_record(gzip.compress(json.dumps(message).encode()), len(records))
+        )
+
+    return records
+
+
+def aggregated_event(count: int, size: int = 200) -> list:
+    """
+    :return: Lambda event records with KPL aggregated records (count user records in total)
+    """
+    aggregated, _ = kinesis.aggregate_records(
+        kinesis.create_records(log_lines(count, size)),
+        group_by_partition_key=False,
+    )
+    return [lambda_record(r["Data"], i) for i, r in enumerate(aggregated)]
+
+
+def mixed_event(count: int, size: int = 200) -> list:
+    """
+    :return: Lambda event records mixing plain, gzipped CloudWatch Logs and aggregated records
+             (about count user records in total)
+    """
+    third = count // 3
+    records = (
+        plain_event(third, size)
+        + cloudwatch_event(third, size=size)
+        + aggregated_event(count - 2 * third, size)
+    )
+    random.Random(0).shuffle(records)
+
+    return records
+
+
+EVENTS = {
+    "plain": plain_event,
+    "cloudwatch": cloudwatch_event,
+    "aggregated": aggregated_event,
+    "mixed": mixed_event,
+}
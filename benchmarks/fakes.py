@@ -0,0 +1,78 @@
+"""
+In-memory fake AWS clients for benchmarks. They accept requests instantly and keep only sizes,
+so benchmarks measure time spent in this package instead of network or memory of stored data.
+"""
+
+import random
+import threading
+
+
+class FakeKinesisClient:
+    def __init__(self, throttle_rate: float = 0.0, seed: int = 0):
+        """
+        :param throttle_rate: Fraction of records failed with ProvisionedThroughputExceededException
+        :param seed: Random seed for throttling
+        """
+        self.throttle_rate = throttle_rate
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.records = 0
+        self.bytes = 0
+        self.lock = threading.Lock()
+
+    def put_records(self, Records, StreamName):
+        results = []
+        failed = 0
+
+        with self.lock:
+            self.requests += 1
+
+            for record in Records:
+                if self.throttle_rate and self.random.random() < self.throttle_rate:
+                    failed += 1
+                    results.append(
+                        {
+                            "ErrorCode": "ProvisionedThroughputExceededException",
+                            "ErrorMessage": "Rate exceeded",
+                        }
+                    )
+                    continue
+
+                self.records += 1
+                self.bytes += len(record["Data"])
+                results.append({"SequenceNumber": "0", "ShardId": "shardId-0"})
+
+        return {"FailedRecordCount": failed, "Records": results}
+
+
+class FakeS3Client:
+    def __init__(self):
+        self.objects = {}
+        self.multipart_uploads = {}
+        self.lock = threading.Lock()
+
+    def upload_fileobj(self, fileobj, bucket, key):
+        size = len(fileobj.read())
+        with self.lock:
+            self.objects[(bucket, key)] = size
+
+    def create_multipart_upload(self, Bucket, Key):
+        with self.lock:
+            upload_id = f"upload-{len(self.multipart_uploads)}"
+            self.multipart_uploads[upload_id] = 0
+
+        return {"UploadId": upload_id}
+
+    def upload_part(self, Bucket, Key, PartNumber, UploadId, Body):
+        with self.lock:
+            self.multipart_uploads[UploadId] += len(Body)
+
+        return {"ETag": f"etag-{PartNumber}"}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        with self.lock:
+            self.objects[(Bucket, Key)] = self.multipart_uploads.pop(UploadId)
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        with self.lock:
+            self.multipart_uploads.pop(UploadId)
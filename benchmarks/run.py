@@ -0,0 +1,251 @@
+"""
+Benchmark suite: parse_records, baikonur_logging pipeline, put_records_batch and put_str_data against
+in-memory fake clients, reporting throughput, latency percentiles and peak memory as JSON.
+
+Every scenario processes a batch of items (like a single Lambda invocation) several times. Latency percentiles
+are per batch, throughput is items per second at median latency, and peak memory is measured with tracemalloc
+in a separate run (tracing slows code down).
+
+Usage:
+    python -m benchmarks.run [--scale N] [--repeat N] [--filter SUBSTRING] [--output report.json]
+                             [--baseline previous_report.json]
+"""
+
+import argparse
+import functools
+import json
+import logging
+import platform
+import sys
+import time
+import tracemalloc
+
+from amazon_kinesis_utils import baikonur_logging, json_backend, kinesis, s3
+from amazon_kinesis_utils.retry import RetryPolicy
+from amazon_kinesis_utils.routing import RoutingRules
+from benchmarks import events
+from benchmarks.fakes import FakeKinesisClient, FakeS3Client
+
+REPORT_VERSION = 1
+
+
+def percentile(values: list, p: float) -> float:
+    # nearest-rank percentile
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(p / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def measure(function, repeat: int) -> dict:
+    # warm up caches (JSON backend selection, timestamp parsing, imports)
+    function()
+
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        latencies.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "latency_ms": {
+            "p50": percentile(latencies, 50) * 1000,
+            "p95": percentile(latencies, 95) * 1000,
+            "p99": percentile(latencies, 99) * 1000,
+        },
+        "peak_memory_bytes": peak,
+        "median_seconds": percentile(latencies, 50),
+    }
+
+
+def parse_records(raw_records: list, **kwargs):
+    for _ in kinesis.parse_records(raw_records, **kwargs):
+        pass
+
+
+def logging_pipeline(raw_records: list, compact: bool):
+    log_dict, failed_dict = {}, {}
+    baikonur_logging.parse_payloads_to_log_dict(
+        kinesis.parse_records(raw_records, decode_json=True),
+        log_dict,
+        failed_dict,
+        log_id_key="log_id",
+        log_timestamp_key="time",
+        log_type_unknown_prefix="unknown",
+        routing_rules=RoutingRules(deny=["debug_*"]),
+        compact=compact,
+    )
+    baikonur_logging.save_json_logs_to_s3(
+        FakeS3Client(), log_dict, key_prefix="bucket", reason="benchmark"
+    )
+
+
+def put_records_batch(data: list, throttle_rate: float):
+    kinesis.put_records_batch(
+        FakeKinesisClient(throttle_rate),
+        "stream",
+        data,
+        max_retries=10,
+        # measure time spent in this package, not in backoff sleeps
+        retry_policy=RetryPolicy(sleep=lambda seconds: None),
+    )
+
+
+def scenarios(scale: int) -> list:
+    """
+    :param scale: Number of user records in every batch
+    :return: List of (name, number of items, function) tuples
+    """
+    cases = []
+
+    for event_name, generator in events.EVENTS.items():
+        for size in (200, 2000):
+            raw_records = generator(scale, size=size)
+            cases.append(
+                (
+                    f"parse_records/{event_name}/{size}B",
+                    scale,
+                    functools.partial(parse_records, raw_records),
+                )
+            )
+
+    mixed = events.mixed_event(scale)
+    cases.append(
+        (
+            "parse_records/mixed/200B/decode_json",
+            scale,
+            functools.partial(parse_records, mixed, decode_json=True),
+        )
+    )
+
+    for compact in (False, True):
+        cases.append(
+            (
+                f"logging_pipeline/mixed/200B{'/compact' if compact else ''}",
+                scale,
+                functools.partial(logging_pipeline, mixed, compact),
+            )
+        )
+
+    lines = events.log_lines(scale)
+    for throttle_rate in (0.0, 0.05):
+        cases.append(
+            (
+                f"put_records_batch/200B/throttle={throttle_rate}",
+                scale,
+                functools.partial(put_records_batch, lines, throttle_rate),
+            )
+        )
+
+    data = "\n".join(lines)
+    cases.append(
+        (
+            "put_str_data/gzip",
+            scale,
+            functools.partial(
+                s3.put_str_data, FakeS3Client(), "bucket", "key", data, True
+            ),
+        )
+    )
+
+    return cases
+
+
+def run(scale: int, repeat: int, name_filter: str = None) -> dict:
+    results = []
+
+    for name, items, function in scenarios(scale):
+        if name_filter and name_filter not in name:
+            continue
+
+        result = measure(function, repeat)
+        results.append(
+            {
+                "name": name,
+                "items": items,
+                "runs": repeat,
+                "throughput_per_s": items / result.pop("median_seconds"),
+                **result,
+            }
+        )
+
+    return {
+        "version": REPORT_VERSION,
+        "timestamp": int(time.time()),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "json_backend": json_backend.get_backend().name,
+        "scale": scale,
+        "results": results,
+    }
+
+
+def compare(report: dict, baseline: dict) -> list:
+    """
+    :return: List of (name, throughput change ratio, p99 latency change ratio) for scenarios in both reports
+    """
+    baseline_results = {r["name"]: r for r in baseline["results"]}
+    changes = []
+
+    for result in report["results"]:
+        base = baseline_results.get(result["name"])
+        if base is None:
+            continue
+
+        changes.append(
+            (
+                result["name"],
+                result["throughput_per_s"] / base["throughput_per_s"],
+                result["latency_ms"]["p99"] / base["latency_ms"]["p99"],
+            )
+        )
+
+    return changes
+
+
+def main(argv: list = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--scale", type=int, default=10000, help="records per batch")
+    parser.add_argument("--repeat", type=int, default=20, help="batches per scenario")
+    parser.add_argument("--filter", help="run scenarios with names containing this")
+    parser.add_argument("--output", help="write JSON report to this file")
+    parser.add_argument("--baseline", help="compare with JSON report in this file")
+    args = parser.parse_args(argv)
+
+    # log records of package would be written for every batch, measure processing only
+    logging.getLogger("kinesis_logging_utils").disabled = True
+
+    report = run(args.scale, args.repeat, args.filter)
+
+    for r in report["results"]:
+        print(
+            f"{r['name']:45s} {r['throughput_per_s']:>12,.0f} items/s "
+            f"p50 {r['latency_ms']['p50']:8.2f} ms  p99 {r['latency_ms']['p99']:8.2f} ms  "
+            f"peak {r['peak_memory_bytes'] / 1e6:8.1f} MB",
+            file=sys.stderr,
+        )
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+        for name, throughput, p99 in compare(report, baseline):
+            print(
+                f"{name:45s} throughput x{throughput:.2f}  p99 latency x{p99:.2f}",
+                file=sys.stderr,
+            )
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
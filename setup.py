@@ -18,12 +18,17 @@ setup(
     long_description=long_description,
     long_description_content_type="text/markdown",
     install_requires=requirements,
+    extras_require={
+        "zstd": ["zstandard"],
+        "orjson": ["orjson"],
+        "simdjson": ["pysimdjson"],
+    },
     zip_safe=True,
     url="https://amazon-kinesis-utils.readthedocs.io/en/latest/",
     project_urls={
         "Source Code": "https://github.com/baikonur-oss/amazon-kinesis-utils",
     },
-    packages=find_packages(exclude=("tests",)),
+    packages=find_packages(exclude=("tests", "benchmarks")),
     classifiers=[
         "Development Status :: 4 - Beta",
         "Intended Audience :: Developers",
@@ -0,0 +1,280 @@
+import asyncio
+import gzip
+import unittest
+
+from amazon_kinesis_utils.aio import baikonur_logging as aio_baikonur_logging
+from amazon_kinesis_utils.aio import kinesis as aio_kinesis
+from amazon_kinesis_utils.aio import s3 as aio_s3
+from amazon_kinesis_utils.dedup import LRUDeduplicator
+from amazon_kinesis_utils.metrics import Metrics
+from amazon_kinesis_utils.retry import RetryPolicy
+from tests.test_baikonur_logging import generate_sample_log_dict
+from tests.test_retry import FakeClock, fake_retry_policy
+
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+class FakeAsyncKinesisClient:
+    def __init__(self, failures: int = 0):
+        """
+        :param failures: Number of put_records calls to fail every record in before succeeding
+        """
+        self.failures = failures
+        self.put_records_calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def put_records(self, Records, StreamName):
+        self.put_records_calls.append(list(Records))
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+        # let other tasks run, so concurrent calls overlap
+        await asyncio.sleep(0.001)
+        self.in_flight -= 1
+
+        if self.failures > 0:
+            self.failures -= 1
+            return {
+                "FailedRecordCount": len(Records),
+                "Records": [
+                    {
+                        "ErrorCode": "ProvisionedThroughputExceededException",
+                        "ErrorMessage": "Rate exceeded",
+                    }
+                    for _ in Records
+                ],
+            }
+
+        return {
+            "FailedRecordCount": 0,
+            "Records": [{"SequenceNumber": "0", "ShardId": "0"} for _ in Records],
+        }
+
+
+class FakeAsyncS3Client:
+    def __init__(self, fail_keys_containing: str = None):
+        self.fail_keys_containing = fail_keys_containing
+        self.objects = {}
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def put_object(self, Bucket, Key, Body):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.001)
+        self.in_flight -= 1
+
+        if self.fail_keys_containing and self.fail_keys_containing in Key:
+            raise IOError("upload failed")
+
+        self.objects[(Bucket, Key)] = Body
+
+
+class AioTests(unittest.TestCase):
+    def test_put_records_batch(self):
+        client = FakeAsyncKinesisClient()
+        data = [f"test-data-{x}" for x in range(1200)]
+
+        failed = run(aio_kinesis.put_records_batch(client, "stream", data, 0))
+
+        self.assertIsNone(failed)
+        self.assertEqual([len(c) for c in client.put_records_calls], [500, 500, 200])
+        self.assertEqual(client.max_in_flight, 1)
+
+    def test_put_records_batch_concurrent(self):
+        client = FakeAsyncKinesisClient()
+        data = [f"test-data-{x}" for x in range(1000)]
+
+        failed = run(
+            aio_kinesis.put_records_batch(
+                client, "stream", data, 0, max_batch_size=100, max_concurrency=4
+            )
+        )
+
+        self.assertIsNone(failed)
+        self.assertEqual(len(client.put_records_calls), 10)
+        self.assertEqual(client.max_in_flight, 4)
+
+    def test_put_records_batch_retry_backoff(self):
+        client = FakeAsyncKinesisClient(failures=3)
+        clock = FakeClock()
+        metrics = Metrics()
+
+        failed = run(
+            aio_kinesis.put_records_batch(
+                client,
+                "stream",
+                [f"test-data-{x}" for x in range(10)],
+                max_retries=5,
+                retry_policy=fake_retry_policy(
+                    clock,
+                    error_code_base_delays={
+                        "ProvisionedThroughputExceededException": 0.5
+                    },
+                ),
+                metrics=metrics,
+            )
+        )
+
+        self.assertIsNone(failed)
+        self.assertEqual(clock.sleeps, [0.5, 1.0, 2.0])
+        self.assertEqual(metrics.get_counters()["PutRecordsRetries"], 3)
+
+    def test_put_records_batch_gives_up(self):
+        client = FakeAsyncKinesisClient(failures=10)
+        data = [f"test-data-{x}" for x in range(10)]
+
+        # default time.sleep is replaced with asyncio.sleep
+        failed = run(
+            aio_kinesis.put_records_batch(
+                client,
+                "stream",
+                data,
+                max_retries=1,
+                retry_policy=RetryPolicy(base_delay=0.001, error_code_base_delays={}),
+            )
+        )
+
+        self.assertEqual(len(client.put_records_calls), 2)
+        self.assertEqual([r["Data"].decode() for r in failed], data)
+
+    def test_put_records_batch_sequential_matches_concurrent(self):
+        data = [f"test-data-{x}" for x in range(10)]
+        results = []
+
+        for max_concurrency in (1, 3):
+            client = FakeAsyncKinesisClient(failures=100)
+            metrics = Metrics()
+            failed = run(
+                aio_kinesis.put_records_batch(
+                    client,
+                    "stream",
+                    data,
+                    max_retries=0,
+                    max_batch_size=2,
+                    max_concurrency=max_concurrency,
+                    metrics=metrics,
+                )
+            )
+
+            self.assertEqual(len(client.put_records_calls), 5)
+            self.assertEqual(metrics.get_counters()["PutRecordsFailedRecords"], 10)
+            results.append([r["Data"].decode() for r in failed])
+
+        self.assertEqual(results[0], results[1])
+        self.assertEqual(results[0], data)
+
+    def test_backoff_async_sleep(self):
+        sleeps = []
+
+        async def sleep(seconds: float):
+            sleeps.append(seconds)
+
+        retry_policy = RetryPolicy(sleep=sleep, random_func=lambda: 1.0)
+
+        self.assertTrue(run(aio_kinesis.backoff(retry_policy, 1)))
+        self.assertEqual(sleeps, [0.2])
+
+    def test_put_str_data(self):
+        client = FakeAsyncS3Client()
+        data = "line\n" * 100000
+
+        for gzip_compress in (False, True):
+            size = run(
+                aio_s3.put_str_data(client, "bucket", "key", data, gzip_compress)
+            )
+
+            body = client.objects[("bucket", "key")]
+            self.assertEqual(size, len(body))
+            self.assertEqual(
+                gzip.decompress(body) if gzip_compress else body, data.encode()
+            )
+
+    def test_save_json_logs_to_s3(self):
+        log_dict = generate_sample_log_dict([f"type-{x}" for x in range(10)], 10)
+
+        for max_concurrency in (1, 4):
+            client = FakeAsyncS3Client()
+            results = run(
+                aio_baikonur_logging.save_json_logs_to_s3(
+                    client,
+                    log_dict,
+                    key_prefix="prefix",
+                    max_concurrency=max_concurrency,
+                )
+            )
+
+            self.assertEqual(len(client.objects), 10)
+            self.assertEqual(client.max_in_flight, max_concurrency)
+            self.assertEqual(
+                gzip.decompress(
+                    client.objects[
+                        ("prefix", "prefix/2020-06/19/2020-06-19-09:17:00-type-0-id.gz")
+                    ]
+                ).decode(),
+                "\n".join(str(r) for r in log_dict["type-0"]["records"]),
+            )
+            for key, result in results.items():
+                self.assertEqual(result["bytes"], len(client.objects[("prefix", key)]))
+
+    def test_save_json_logs_to_s3_errors(self):
+        log_dict = generate_sample_log_dict(["a", "b", "c"], 10)
+
+        for max_concurrency in (1, 3):
+            client = FakeAsyncS3Client(fail_keys_containing="b-id")
+            results = run(
+                aio_baikonur_logging.save_json_logs_to_s3(
+                    client,
+                    log_dict,
+                    key_prefix="prefix",
+                    max_concurrency=max_concurrency,
+                    raise_on_error=False,
+                )
+            )
+
+            errors = {r["log_type"]: r["error"] for r in results.values()}
+            self.assertIsNone(errors["a"])
+            self.assertIsInstance(errors["b"], IOError)
+            self.assertEqual(len(client.objects), 2)
+
+            with self.assertRaises(IOError):
+                run(
+                    aio_baikonur_logging.save_json_logs_to_s3(
+                        FakeAsyncS3Client(fail_keys_containing="b-id"),
+                        log_dict,
+                        key_prefix="prefix",
+                        max_concurrency=max_concurrency,
+                    )
+                )
+
+    def test_save_json_logs_to_s3_deduplicator(self):
+        log_dict = generate_sample_log_dict(["a", "b"], 10)
+        deduplicator = LRUDeduplicator()
+
+        run(
+            aio_baikonur_logging.save_json_logs_to_s3(
+                FakeAsyncS3Client(fail_keys_containing="b-id"),
+                log_dict,
+                key_prefix="prefix",
+                raise_on_error=False,
+                deduplicator=deduplicator,
+            )
+        )
+
+        client = FakeAsyncS3Client()
+        results = run(
+            aio_baikonur_logging.save_json_logs_to_s3(
+                client, log_dict, key_prefix="prefix", deduplicator=deduplicator
+            )
+        )
+
+        self.assertEqual(len(client.objects), 1)
+        skipped = {r["log_type"]: r["skipped"] for r in results.values()}
+        self.assertEqual(skipped, {"a": True, "b": False})
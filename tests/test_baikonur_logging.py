@@ -0,0 +1,598 @@
+import contextlib
+import datetime
+import gzip
+import json
+import unittest
+
+from amazon_kinesis_utils import baikonur_logging, kinesis
+from amazon_kinesis_utils.dedup import LRUDeduplicator
+from amazon_kinesis_utils.metrics import Metrics
+from amazon_kinesis_utils.record_buffer import RecordBuffer
+from amazon_kinesis_utils.routing import RoutingRules
+from tests.test_kinesis import generate_sample_kinesis_records
+from tests.test_s3 import MockedS3Client
+
+
+class FailingS3Client(MockedS3Client):
+    def __init__(self, fail_keys_containing: str):
+        super().__init__()
+        self.fail_keys_containing = fail_keys_containing
+
+    def upload_fileobj(self, fileobj, bucket, key):
+        if self.fail_keys_containing in key:
+            raise IOError("upload failed")
+
+        super().upload_fileobj(fileobj, bucket, key)
+
+
+def generate_sample_log_dict(log_types: list, count: int) -> dict:
+    log_dict = {}
+
+    for log_type in log_types:
+        for i in range(count):
+            baikonur_logging.append_to_log_dict(
+                log_dict,
+                log_type=log_type,
+                log_data={"log_type": log_type, "i": i},
+                log_timestamp="2020-06-19T09:17:00",
+                log_id=f"{log_type}-id",
+            )
+
+    return log_dict
+
+
+class BaikonurLoggingTests(unittest.TestCase):
+    def test_append_to_log_dict(self):
+        log_dict = generate_sample_log_dict(["a", "b"], 3)
+
+        self.assertEqual(sorted(log_dict), ["a", "b"])
+        self.assertEqual(len(log_dict["a"]["records"]), 3)
+        self.assertEqual(
+            log_dict["a"]["first_timestamp"], datetime.datetime(2020, 6, 19, 9, 17)
+        )
+        self.assertEqual(log_dict["a"]["first_id"], "a-id")
+
+    def test_parse_payload_to_log_dict(self):
+        log_dict = {}
+        failed_dict = {}
+
+        for payload in [
+            {"log_type": "a", "time": "2020-06-19T09:17:00", "log_id": "1"},
+            {"log_type": "b", "log_id": "2"},
+            {"log_type": "c", "log_id": "3"},
+            {"time": "2020-06-19T09:17:00", "log_id": "4"},
+        ]:
+            baikonur_logging.parse_payload_to_log_dict(
+                payload,
+                log_dict,
+                failed_dict,
+                log_id_key="log_id",
+                log_timestamp_key="time",
+                log_type_key="log_type",
+                log_type_unknown_prefix="unknown",
+                log_type_whitelist=["a", "b"],
+                timestamp_required=True,
+            )
+
+        self.assertEqual(list(log_dict), ["a"])
+        self.assertEqual(
+            sorted(failed_dict), ["unknown/b/no_timestamp", "unknown/unknown_type"]
+        )
+
+    def test_save_json_logs_to_s3(self):
+        log_dict = generate_sample_log_dict(["a"], 3)
+        s3_client = MockedS3Client()
+
+        baikonur_logging.save_json_logs_to_s3(s3_client, log_dict, key_prefix="prefix")
+
+        (bucket, key), data = list(s3_client.uploaded_objects.items())[0]
+        self.assertEqual(bucket, "prefix")
+        self.assertEqual(key, "prefix/2020-06/19/2020-06-19-09:17:00-a-id.gz")
+        self.assertEqual(
+            gzip.decompress(data).decode(),
+            "\n".join(str(r) for r in log_dict["a"]["records"]),
+        )
+
+    def test_save_json_logs_to_s3_streaming(self):
+        log_dict = generate_sample_log_dict(["a", "b"], 100)
+
+        s3_client = MockedS3Client()
+        baikonur_logging.save_json_logs_to_s3(s3_client, log_dict, key_prefix="prefix")
+
+        streaming_s3_client = MockedS3Client()
+        baikonur_logging.save_json_logs_to_s3(
+            streaming_s3_client, log_dict, key_prefix="prefix", streaming=True
+        )
+
+        self.assertEqual(len(streaming_s3_client.uploaded_objects), 2)
+        for key, data in s3_client.uploaded_objects.items():
+            self.assertEqual(
+                gzip.decompress(streaming_s3_client.uploaded_objects[key]),
+                gzip.decompress(data),
+            )
+
+    def test_save_json_logs_to_s3_extension(self):
+        log_dict = generate_sample_log_dict(["a"], 3)
+
+        for kwargs, extension in [
+            ({}, ".gz"),
+            ({"gzip_compress": False}, ""),
+            ({"compression": "gzip", "compression_level": 1}, ".gz"),
+        ]:
+            s3_client = MockedS3Client()
+            baikonur_logging.save_json_logs_to_s3(
+                s3_client, log_dict, key_prefix="prefix", **kwargs
+            )
+
+            _, key = list(s3_client.uploaded_objects)[0]
+            self.assertEqual(
+                key, "prefix/2020-06/19/2020-06-19-09:17:00-a-id" + extension
+            )
+
+    def test_save_json_logs_to_s3_parallel(self):
+        log_types = [f"type-{x}" for x in range(20)]
+        log_dict = generate_sample_log_dict(log_types, 10)
+
+        s3_client = MockedS3Client()
+        results = baikonur_logging.save_json_logs_to_s3(
+            s3_client, log_dict, key_prefix="prefix", max_workers=4
+        )
+
+        self.assertEqual(len(results), 20)
+        self.assertEqual(len(s3_client.uploaded_objects), 20)
+        for key, result in results.items():
+            self.assertIsNone(result["error"])
+            self.assertEqual(
+                result["bytes"], len(s3_client.uploaded_objects[("prefix", key)])
+            )
+            self.assertTrue(key.endswith(result["log_type"] + "-id.gz"))
+
+    def test_save_json_logs_to_s3_errors(self):
+        log_dict = generate_sample_log_dict(["a", "b", "c"], 10)
+
+        for max_workers in (1, 3):
+            s3_client = FailingS3Client(fail_keys_containing="b-id")
+            results = baikonur_logging.save_json_logs_to_s3(
+                s3_client,
+                log_dict,
+                key_prefix="prefix",
+                max_workers=max_workers,
+                raise_on_error=False,
+            )
+
+            errors = {r["log_type"]: r["error"] for r in results.values()}
+            self.assertIsNone(errors["a"])
+            self.assertIsInstance(errors["b"], IOError)
+            self.assertIsNone(errors["c"])
+            self.assertEqual(len(s3_client.uploaded_objects), 2)
+
+            with self.assertRaises(IOError):
+                baikonur_logging.save_json_logs_to_s3(
+                    FailingS3Client(fail_keys_containing="b-id"),
+                    log_dict,
+                    key_prefix="prefix",
+                    max_workers=max_workers,
+                )
+
+    def test_append_to_log_dict_bad_timestamp(self):
+        log_dict = {}
+
+        for log_type, timestamp in [("a", "not a timestamp"), ("b", ["list"])]:
+            before = datetime.datetime.now()
+            baikonur_logging.append_to_log_dict(
+                log_dict, log_type, {}, log_timestamp=timestamp, log_id="id"
+            )
+
+            # falls back to current time
+            self.assertGreaterEqual(log_dict[log_type]["first_timestamp"], before)
+
+    def test_log_partitioner_time_buckets(self):
+        partitioner = baikonur_logging.LogPartitioner()
+
+        for i, timestamp in enumerate(
+            [
+                "2020-06-19T09:17:00",
+                "2020-06-19T10:01:00",
+                "2020-06-19T09:59:59",
+                "not a timestamp",
+            ]
+        ):
+            baikonur_logging.append_to_log_dict(
+                partitioner, "a", {"i": i}, log_timestamp=timestamp, log_id=str(i)
+            )
+
+        nine = datetime.datetime(2020, 6, 19, 9)
+        ten = datetime.datetime(2020, 6, 19, 10)
+        self.assertEqual(len(partitioner), 3)
+        self.assertEqual(partitioner[("a", nine, 0)]["records"], [{"i": 0}, {"i": 2}])
+        self.assertEqual(partitioner[("a", ten, 0)]["records"], [{"i": 1}])
+        self.assertEqual(partitioner[("a", nine, 0)]["first_id"], "0")
+        self.assertEqual(partitioner[("a", nine, 0)]["log_type"], "a")
+
+    def test_log_partitioner_rollover(self):
+        for kwargs in ({"max_records": 4}, {"max_bytes": 4 * len('{"i":0}')}):
+            partitioner = baikonur_logging.LogPartitioner(**kwargs)
+
+            for i in range(10):
+                partitioner.append("a", {"i": i}, "2020-06-19T09:17:00", log_id=str(i))
+
+            sizes = [len(v["records"]) for v in partitioner.values()]
+            self.assertEqual(sizes, [4, 4, 2])
+            self.assertEqual([k[2] for k in partitioner], [0, 1, 2])
+
+    def test_log_partitioner_flush(self):
+        flushed = []
+        partitioner = baikonur_logging.LogPartitioner(
+            max_records=4, flush=flushed.append
+        )
+
+        for i in range(10):
+            partitioner.append("a", {"i": i}, "2020-06-19T09:17:00", log_id=str(i))
+
+        # full partitions are flushed and removed immediately
+        self.assertEqual(len(flushed), 2)
+        self.assertEqual(len(partitioner), 1)
+
+        partitioner.flush_all()
+        self.assertEqual(len(flushed), 3)
+        self.assertEqual(len(partitioner), 0)
+        self.assertEqual(
+            [r["i"] for f in flushed for v in f.values() for r in v["records"]],
+            list(range(10)),
+        )
+
+    def test_log_partitioner_flush_error(self):
+        flushed = []
+
+        def flush(log_dict):
+            if fail:
+                raise IOError("upload failed")
+            flushed.append(log_dict)
+
+        fail = True
+        partitioner = baikonur_logging.LogPartitioner(max_records=4, flush=flush)
+
+        for i in range(4):
+            with contextlib.suppress(IOError):
+                partitioner.append(
+                    "a",
+                    {"i": i},
+                    "2020-06-19T09:17:00",
+                    log_id=str(i),
+                    sequence_number="1",
+                )
+
+        with self.assertRaises(IOError):
+            partitioner.flush_all()
+
+        # records of failed flushes are kept
+        self.assertEqual(len(partitioner), 1)
+        partition = list(partitioner.values())[0]
+        self.assertEqual(len(partition["records"]), 4)
+        self.assertEqual(partition["first_sequence_number"], "1")
+
+        fail = False
+        partitioner.flush_all()
+        self.assertEqual(len(partitioner), 0)
+        self.assertEqual(len(flushed), 1)
+
+    def test_log_partitioner_flush_all_without_flush(self):
+        partitioner = baikonur_logging.LogPartitioner(max_records=4)
+
+        for i in range(10):
+            partitioner.append("a", {"i": i}, "2020-06-19T09:17:00", log_id=str(i))
+
+        # records are kept, not discarded
+        partitioner.flush_all()
+        self.assertEqual(len(partitioner), 3)
+        self.assertEqual(
+            [r["i"] for v in partitioner.values() for r in v["records"]],
+            list(range(10)),
+        )
+
+    def test_save_json_logs_to_s3_partitioner(self):
+        partitioner = baikonur_logging.LogPartitioner(max_records=2)
+
+        for i, timestamp in enumerate(
+            ["2020-06-19T09:17:00", "2020-06-19T09:18:00", "2020-06-19T10:17:00"] * 2
+        ):
+            partitioner.append("a", {"i": i}, timestamp, log_id=str(i))
+
+        s3_client = MockedS3Client()
+        results = baikonur_logging.save_json_logs_to_s3(
+            s3_client, partitioner, key_prefix="prefix"
+        )
+
+        self.assertEqual(
+            sorted(results),
+            [
+                "prefix/2020-06/19/2020-06-19-09:17:00-0.gz",
+                "prefix/2020-06/19/2020-06-19-09:17:00-3.gz",
+                "prefix/2020-06/19/2020-06-19-10:17:00-2.gz",
+            ],
+        )
+        self.assertEqual({r["log_type"] for r in results.values()}, {"a"})
+
+    def test_save_json_logs_to_s3_partitioner_same_first_record(self):
+        partitioner = baikonur_logging.LogPartitioner(max_records=2)
+
+        # all partitions start with same timestamp second and log ID
+        for i in range(5):
+            partitioner.append("a", {"i": i}, "2020-06-19T09:17:00", log_id="id")
+
+        s3_client = MockedS3Client()
+        results = baikonur_logging.save_json_logs_to_s3(
+            s3_client, partitioner, key_prefix="prefix"
+        )
+
+        self.assertEqual(
+            sorted(results),
+            [
+                "prefix/2020-06/19/2020-06-19-09:17:00-id-1.gz",
+                "prefix/2020-06/19/2020-06-19-09:17:00-id-2.gz",
+                "prefix/2020-06/19/2020-06-19-09:17:00-id.gz",
+            ],
+        )
+        self.assertEqual(len(s3_client.uploaded_objects), 3)
+
+    def test_save_json_logs_to_s3_key_collision(self):
+        timestamp = datetime.datetime(2020, 6, 19, 9, 17)
+        log_dict = {}
+        for log_type in ("a", "b"):
+            baikonur_logging.append_to_log_dict(
+                log_dict, log_type, {}, log_timestamp=timestamp, log_id="id"
+            )
+
+        with self.assertRaises(ValueError):
+            baikonur_logging.save_json_logs_to_s3(
+                MockedS3Client(), log_dict, key_prefix="prefix"
+            )
+
+    def test_save_json_logs_to_s3_compact(self):
+        log_dict = {}
+        for i in range(100):
+            baikonur_logging.append_to_log_dict(
+                log_dict,
+                "a",
+                {"i": i, "text": "ü"},
+                log_timestamp="2020-06-19T09:17:00",
+                log_id="a-id",
+                compact=True,
+            )
+
+        self.assertIsInstance(log_dict["a"]["records"], RecordBuffer)
+
+        for streaming in (False, True):
+            s3_client = MockedS3Client()
+            baikonur_logging.save_json_logs_to_s3(
+                s3_client, log_dict, key_prefix="prefix", streaming=streaming
+            )
+
+            data = s3_client.uploaded_objects[
+                ("prefix", "prefix/2020-06/19/2020-06-19-09:17:00-a-id.gz")
+            ]
+            self.assertEqual(
+                [json.loads(line) for line in gzip.decompress(data).splitlines()],
+                [{"i": i, "text": "ü"} for i in range(100)],
+            )
+
+    def test_log_partitioner_compact(self):
+        partitioner = baikonur_logging.LogPartitioner(
+            max_bytes=4 * len('{"i":0}\n'), compact=True
+        )
+
+        for i in range(10):
+            partitioner.append("a", {"i": i}, "2020-06-19T09:17:00", log_id=str(i))
+
+        sizes = [len(v["records"]) for v in partitioner.values()]
+        self.assertEqual(sizes, [4, 4, 2])
+
+    def test_parse_payloads_to_log_dict_routing_rules(self):
+        payloads = [
+            {"meta": {"type": "a"}, "time": "2020-06-19T09:17:00", "log_id": "1"},
+            {"meta": {"type": "b"}, "log_id": "2"},
+            {"meta": {"type": "c"}, "time": "2020-06-19T09:17:00", "log_id": "3"},
+            {"meta": {"type": "debug_x"}, "time": "2020-06-19T09:17:00"},
+            {"time": "2020-06-19T09:17:00", "log_id": "4"},
+        ]
+        rules = RoutingRules(
+            log_type_key=("meta", "type"),
+            allow=["a", "b", "debug_*"],
+            deny=["debug_*"],
+            rename={"a": "renamed"},
+        )
+        kwargs = dict(
+            log_id_key="log_id",
+            log_timestamp_key="time",
+            log_type_unknown_prefix="unknown",
+            timestamp_required=True,
+        )
+
+        log_dict, failed_dict = {}, {}
+        baikonur_logging.parse_payloads_to_log_dict(
+            payloads, log_dict, failed_dict, routing_rules=rules, **kwargs
+        )
+
+        single_log_dict, single_failed_dict = {}, {}
+        for payload in payloads:
+            baikonur_logging.parse_payload_to_log_dict(
+                payload,
+                single_log_dict,
+                single_failed_dict,
+                log_type_key=None,
+                routing_rules=rules,
+                **kwargs,
+            )
+
+        for ld, fd in [(log_dict, failed_dict), (single_log_dict, single_failed_dict)]:
+            self.assertEqual(list(ld), ["renamed"])
+            self.assertEqual(
+                sorted(fd), ["unknown/b/no_timestamp", "unknown/unknown_type"]
+            )
+
+    def test_save_json_logs_to_s3_metrics(self):
+        log_dict = generate_sample_log_dict(["a", "b"], 10)
+        metrics = Metrics()
+
+        results = baikonur_logging.save_json_logs_to_s3(
+            FailingS3Client(fail_keys_containing="b-id"),
+            log_dict,
+            key_prefix="prefix",
+            raise_on_error=False,
+            metrics=metrics,
+        )
+
+        counters = metrics.get_counters()
+        self.assertEqual(counters["S3Objects"], 1)
+        self.assertEqual(
+            counters["S3BytesUploaded"], sum(r["bytes"] or 0 for r in results.values())
+        )
+        self.assertEqual(counters["S3UploadErrors"], 1)
+        self.assertEqual(len(metrics.get_timings()["S3UploadLatency"]), 2)
+
+    def test_save_json_logs_to_s3_deduplicator(self):
+        log_dict = generate_sample_log_dict(["a", "b", "c"], 10)
+        deduplicator = LRUDeduplicator()
+
+        for max_workers in (1, 3):
+            # first attempt fails to upload "b"
+            s3_client = FailingS3Client(fail_keys_containing="b-id")
+            baikonur_logging.save_json_logs_to_s3(
+                s3_client,
+                log_dict,
+                key_prefix="prefix",
+                max_workers=max_workers,
+                raise_on_error=False,
+                deduplicator=deduplicator,
+            )
+            self.assertEqual(len(s3_client.uploaded_objects), 2)
+
+            # retry uploads only "b"
+            s3_client = MockedS3Client()
+            metrics = Metrics()
+            results = baikonur_logging.save_json_logs_to_s3(
+                s3_client,
+                log_dict,
+                key_prefix="prefix",
+                max_workers=max_workers,
+                metrics=metrics,
+                deduplicator=deduplicator,
+            )
+
+            self.assertEqual(
+                [key for _, key in s3_client.uploaded_objects],
+                [k for k, r in results.items() if r["log_type"] == "b"],
+            )
+            skipped = {r["log_type"]: r["skipped"] for r in results.values()}
+            self.assertEqual(skipped, {"a": True, "b": False, "c": True})
+            self.assertEqual(metrics.get_counters()["S3ObjectsSkipped"], 2)
+
+            deduplicator = LRUDeduplicator()
+
+    def test_save_json_logs_to_s3_deduplicator_different_records(self):
+        deduplicator = LRUDeduplicator()
+        baikonur_logging.save_json_logs_to_s3(
+            MockedS3Client(),
+            generate_sample_log_dict(["a"], 5),
+            key_prefix="prefix",
+            deduplicator=deduplicator,
+        )
+
+        # retried batch has the same first record (and S3 object key) but more records
+        s3_client = MockedS3Client()
+        results = baikonur_logging.save_json_logs_to_s3(
+            s3_client,
+            generate_sample_log_dict(["a"], 10),
+            key_prefix="prefix",
+            deduplicator=deduplicator,
+        )
+
+        self.assertEqual([r["skipped"] for r in results.values()], [False])
+        self.assertEqual(len(s3_client.uploaded_objects), 1)
+        self.assertEqual(len(gzip.decompress(s3_client.uploaded_data).splitlines()), 10)
+
+        # same records again are skipped
+        results = baikonur_logging.save_json_logs_to_s3(
+            MockedS3Client(),
+            generate_sample_log_dict(["a"], 10),
+            key_prefix="prefix",
+            deduplicator=deduplicator,
+        )
+        self.assertEqual([r["skipped"] for r in results.values()], [True])
+
+    def test_batch_item_failures(self):
+        raw_records = generate_sample_kinesis_records(
+            [
+                json.dumps({"log_type": log_type, "log_id": f"{log_type}-id-{i}"})
+                for i, log_type in enumerate(["a", "b", "a", "b", "c"])
+            ]
+        )
+        for i, record in enumerate(raw_records):
+            record["kinesis"]["sequenceNumber"] = str(1000 + i)
+
+        for log_dict in ({}, baikonur_logging.LogPartitioner()):
+            baikonur_logging.parse_payloads_to_log_dict(
+                kinesis.parse_records(
+                    raw_records, decode_json=True, with_metadata=True
+                ),
+                log_dict,
+                {},
+                log_id_key="log_id",
+                log_timestamp_key="time",
+                log_type_unknown_prefix="unknown",
+                routing_rules=RoutingRules(),
+                with_metadata=True,
+            )
+
+            first_sequence_numbers = {
+                v["records"][0]["log_type"]: v["first_sequence_number"]
+                for v in log_dict.values()
+            }
+            self.assertEqual(
+                first_sequence_numbers, {"a": "1000", "b": "1001", "c": "1004"}
+            )
+
+            results = baikonur_logging.save_json_logs_to_s3(
+                FailingS3Client(fail_keys_containing="b-id"),
+                log_dict,
+                key_prefix="prefix",
+                raise_on_error=False,
+            )
+            failed = baikonur_logging.get_failed_sequence_numbers(results)
+
+            self.assertEqual(failed, ["1001"])
+            self.assertEqual(
+                kinesis.get_batch_item_failures(failed, raw_records),
+                {"batchItemFailures": [{"itemIdentifier": "1001"}]},
+            )
+
+    def test_parse_payloads_to_log_dict_metrics(self):
+        payloads = [
+            {"log_type": "a", "time": "2020-06-19T09:17:00"},
+            {"log_type": "a"},
+            {"log_type": "b", "time": "2020-06-19T09:17:00"},
+            "not a dict",
+        ]
+        metrics = Metrics()
+
+        baikonur_logging.parse_payloads_to_log_dict(
+            iter(payloads),
+            {},
+            {},
+            log_id_key="log_id",
+            log_timestamp_key="time",
+            log_type_unknown_prefix="unknown",
+            routing_rules=RoutingRules(deny=["b"]),
+            timestamp_required=True,
+            metrics=metrics,
+        )
+
+        self.assertEqual(
+            metrics.get_counters(),
+            {
+                "LogRecordsIn": 4,
+                "LogRecordsOut": 1,
+                "LogRecordsFailed": 1,
+                "LogRecordsDropped": 2,
+            },
+        )
@@ -0,0 +1,74 @@
+import gzip
+import unittest
+
+from amazon_kinesis_utils import compression
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+class CompressionTests(unittest.TestCase):
+    data = b'{"log_type": "test", "message": "hello"}\n' * 1000
+
+    def test_raw(self):
+        codec = compression.get_codec("none")
+
+        self.assertEqual(codec.extension, "")
+        self.assertEqual(codec.compress(self.data), self.data)
+
+    def test_gzip(self):
+        codec = compression.get_codec("gzip")
+
+        self.assertEqual(codec.extension, ".gz")
+        for level in (None, 1, 9):
+            self.assertEqual(
+                gzip.decompress(codec.compress(self.data, level)), self.data
+            )
+
+    def test_gzip_one_shot_matches_incremental(self):
+        # one-shot compression must not depend on zlib.compress wbits argument (Python 3.11+)
+        codec = compression.get_codec("gzip")
+
+        for level in (None, 1, 9):
+            compressor = codec.compressor(level)
+            self.assertEqual(
+                codec.compress(self.data, level),
+                compressor.compress(self.data) + compressor.flush(),
+            )
+
+    def test_gzip_incremental(self):
+        compressor = compression.get_codec("gzip").compressor(1)
+
+        compressed = b"".join(compressor.compress(self.data) for _ in range(3))
+        compressed += compressor.flush()
+
+        self.assertEqual(gzip.decompress(compressed), self.data * 3)
+
+    @unittest.skipIf(zstandard is None, "zstandard is not installed")
+    def test_zstd(self):
+        codec = compression.get_codec("zstd")
+
+        self.assertEqual(codec.extension, ".zst")
+
+        compressor = codec.compressor()
+        compressed = compressor.compress(self.data) + compressor.flush()
+        decompressor = zstandard.ZstdDecompressor()
+
+        self.assertEqual(decompressor.decompressobj().decompress(compressed), self.data)
+        self.assertEqual(
+            decompressor.decompressobj().decompress(codec.compress(self.data, 10)),
+            self.data,
+        )
+
+    def test_unknown_codec(self):
+        with self.assertRaises(ValueError):
+            compression.get_codec("lzma")
+
+    def test_available_codecs(self):
+        available = compression.available_codecs()
+
+        self.assertIn("none", available)
+        self.assertIn("gzip", available)
+        self.assertEqual("zstd" in available, zstandard is not None)
@@ -0,0 +1,457 @@
+import datetime
+import json
+import os
+import tempfile
+import threading
+import unittest
+
+from amazon_kinesis_utils import consumer
+from amazon_kinesis_utils.consumer import (
+    SHARD_END,
+    InMemoryCheckpointStore,
+    ShardConsumer,
+    SQLiteCheckpointStore,
+    StreamConsumer,
+)
+from amazon_kinesis_utils.retry import RetryPolicy
+from tests.test_retry import FakeClock, fake_retry_policy
+
+
+class FakeClientError(Exception):
+    def __init__(self, code: str):
+        super().__init__(code)
+        self.response = {"Error": {"Code": code, "Message": code}}
+
+
+class FakeKinesisClient:
+    """
+    Local fake of Kinesis ListShards, GetShardIterator and GetRecords APIs.
+    Shard iterators are "<shard ID>:<position>" strings.
+    """
+
+    def __init__(self, shards: dict, closed: set = None, parents: dict = None):
+        """
+        :param shards: Dictionary of shard ID to list of record data (bytes)
+        :param closed: Shard IDs of closed shards (GetRecords returns no NextShardIterator at the end)
+        :param parents: Dictionary of shard ID to parent shard ID
+        """
+        self.records = {
+            shard_id: [
+                {
+                    "Data": data,
+                    "PartitionKey": "pk",
+                    "SequenceNumber": str(1000 + i),
+                    "ApproximateArrivalTimestamp": datetime.datetime(
+                        2020, 1, 1, tzinfo=datetime.timezone.utc
+                    ),
+                }
+                for i, data in enumerate(records)
+            ]
+            for shard_id, records in shards.items()
+        }
+        self.closed = closed or set()
+        self.parents = parents or {}
+        self.errors = []
+        self.get_records_calls = []
+        self.lock = threading.Lock()
+
+    def list_shards(self, StreamName=None, NextToken=None):
+        shards = []
+        for shard_id in self.records:
+            shard = {"ShardId": shard_id}
+            if shard_id in self.parents:
+                shard["ParentShardId"] = self.parents[shard_id]
+            shards.append(shard)
+
+        return {"Shards": shards}
+
+    def get_shard_iterator(
+        self, StreamName, ShardId, ShardIteratorType, StartingSequenceNumber=None
+    ):
+        records = self.records[ShardId]
+
+        if ShardIteratorType == "TRIM_HORIZON":
+            position = 0
+        elif ShardIteratorType == "LATEST":
+            position = len(records)
+        elif ShardIteratorType == "AFTER_SEQUENCE_NUMBER":
+            position = [r["SequenceNumber"] for r in records].index(
+                StartingSequenceNumber
+            ) + 1
+        else:
+            raise ValueError(ShardIteratorType)
+
+        return {"ShardIterator": f"{ShardId}:{position}"}
+
+    def get_records(self, ShardIterator, Limit):
+        with self.lock:
+            self.get_records_calls.append(ShardIterator)
+            if self.errors:
+                raise FakeClientError(self.errors.pop(0))
+
+        shard_id, position = ShardIterator.rsplit(":", 1)
+        position = int(position)
+        records = self.records[shard_id][position : position + Limit]
+        end = position + len(records)
+
+        response = {
+            "Records": records,
+            "MillisBehindLatest": 1000 if end < len(self.records[shard_id]) else 0,
+        }
+        if not (shard_id in self.closed and end == len(self.records[shard_id])):
+            response["NextShardIterator"] = f"{shard_id}:{end}"
+
+        return response
+
+
+def log_lines(n: int) -> list:
+    return [json.dumps({"i": i}).encode() for i in range(n)]
+
+
+class ToLambdaRecordsTest(unittest.TestCase):
+    def test_to_lambda_records(self):
+        client = FakeKinesisClient({"shardId-000": [b"hello"]})
+        records = consumer.to_lambda_records(
+            client.records["shardId-000"], "shardId-000"
+        )
+
+        self.assertEqual(
+            records[0]["kinesis"]["data"],
+            "aGVsbG8=",
+        )
+        self.assertEqual(records[0]["eventID"], "shardId-000:1000")
+        self.assertEqual(
+            records[0]["kinesis"]["approximateArrivalTimestamp"], 1577836800.0
+        )
+
+
+class CheckpointStoreTest(unittest.TestCase):
+    def check_store(self, store):
+        self.assertIsNone(store.get_checkpoint("stream", "shard-0"))
+
+        store.set_checkpoint("stream", "shard-0", "1")
+        store.set_checkpoint("stream", "shard-0", "2")
+        store.set_checkpoint("stream", "shard-1", "3")
+
+        self.assertEqual(store.get_checkpoint("stream", "shard-0"), "2")
+        self.assertEqual(store.get_checkpoint("stream", "shard-1"), "3")
+        self.assertIsNone(store.get_checkpoint("other", "shard-0"))
+
+    def test_in_memory(self):
+        self.check_store(InMemoryCheckpointStore())
+
+    def test_sqlite(self):
+        self.check_store(SQLiteCheckpointStore())
+
+    def test_sqlite_persists(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "checkpoints.db")
+
+            store = SQLiteCheckpointStore(path)
+            store.set_checkpoint("stream", "shard-0", "42")
+            store.close()
+
+            store = SQLiteCheckpointStore(path)
+            self.assertEqual(store.get_checkpoint("stream", "shard-0"), "42")
+            store.close()
+
+
+class ShardConsumerTest(unittest.TestCase):
+    def create_consumer(self, client, store, processor, **kwargs):
+        return ShardConsumer(
+            client,
+            "stream",
+            "shardId-000",
+            processor,
+            store,
+            min_poll_interval=0.0,
+            max_poll_interval=0.0,
+            **kwargs,
+        )
+
+    def test_closed_shard(self):
+        client = FakeKinesisClient({"shardId-000": log_lines(25)}, {"shardId-000"})
+        store = InMemoryCheckpointStore()
+        batches = []
+
+        c = self.create_consumer(
+            client,
+            store,
+            lambda payloads, shard_id: batches.append(payloads),
+            limit=10,
+            decode_json=True,
+        )
+        c.run()
+
+        self.assertTrue(c.finished)
+        self.assertEqual([len(b) for b in batches], [10, 10, 5])
+        self.assertEqual([p.data["i"] for b in batches for p in b], list(range(25)))
+        self.assertEqual(batches[0][0].shard_id, "shardId-000")
+        self.assertEqual(batches[0][0].sequence_number, "1000")
+        self.assertEqual(store.get_checkpoint("stream", "shardId-000"), SHARD_END)
+
+        # shard that has ended is not read again
+        calls = len(client.get_records_calls)
+        self.create_consumer(client, store, None).run()
+        self.assertEqual(len(client.get_records_calls), calls)
+
+    def test_resume_from_checkpoint(self):
+        client = FakeKinesisClient({"shardId-000": log_lines(10)}, {"shardId-000"})
+        store = InMemoryCheckpointStore()
+        store.set_checkpoint("stream", "shardId-000", "1006")
+        payloads = []
+
+        c = self.create_consumer(
+            client, store, lambda p, shard_id: payloads.extend(p), decode_json=True
+        )
+        c.run()
+
+        self.assertEqual([p.data["i"] for p in payloads], [7, 8, 9])
+
+    def test_processor_error_keeps_checkpoint(self):
+        client = FakeKinesisClient({"shardId-000": log_lines(10)}, {"shardId-000"})
+        store = InMemoryCheckpointStore()
+        calls = []
+
+        def processor(payloads, shard_id):
+            calls.append(payloads)
+            if len(calls) == 2:
+                raise RuntimeError("processing failed")
+
+        c = self.create_consumer(client, store, processor, limit=4)
+        with self.assertRaises(RuntimeError):
+            c.run()
+
+        self.assertEqual(store.get_checkpoint("stream", "shardId-000"), "1003")
+
+    def test_prefetch(self):
+        client = FakeKinesisClient({"shardId-000": log_lines(10)}, {"shardId-000"})
+        seen_calls = []
+
+        def processor(payloads, shard_id):
+            # next GetRecords call runs in background, wait for it while first batch is processed
+            for _ in range(1000):
+                if len(client.get_records_calls) > 1:
+                    break
+                threading.Event().wait(0.001)
+            seen_calls.append(len(client.get_records_calls))
+
+        c = self.create_consumer(client, InMemoryCheckpointStore(), processor, limit=5)
+        c.run()
+
+        self.assertEqual(seen_calls[0], 2)
+
+    def test_retry_errors(self):
+        client = FakeKinesisClient({"shardId-000": log_lines(3)}, {"shardId-000"})
+        client.errors = [
+            "ExpiredIteratorException",
+            "ProvisionedThroughputExceededException",
+        ]
+        payloads = []
+
+        c = self.create_consumer(
+            client,
+            InMemoryCheckpointStore(),
+            lambda p, s: payloads.extend(p),
+            retry_policy=RetryPolicy(random_func=lambda: 0.0),
+        )
+        c.run()
+
+        self.assertEqual(len(payloads), 3)
+        self.assertEqual(len(client.get_records_calls), 3)
+
+    def test_throttled_past_deadline(self):
+        client = FakeKinesisClient({"shardId-000": log_lines(3)})
+        client.errors = ["ProvisionedThroughputExceededException"]
+
+        c = self.create_consumer(
+            client,
+            InMemoryCheckpointStore(),
+            None,
+            retry_policy=fake_retry_policy(FakeClock(), deadline=0.0),
+        )
+        with self.assertRaises(FakeClientError):
+            c.run()
+
+    def test_unknown_error(self):
+        client = FakeKinesisClient({"shardId-000": log_lines(3)})
+        client.errors = ["ResourceNotFoundException"]
+
+        c = self.create_consumer(client, InMemoryCheckpointStore(), None)
+        with self.assertRaises(FakeClientError):
+            c.run()
+
+    def test_stop(self):
+        client = FakeKinesisClient({"shardId-000": log_lines(3)})
+        store = InMemoryCheckpointStore()
+
+        c = ShardConsumer(
+            client,
+            "stream",
+            "shardId-000",
+            lambda p, s: None,
+            store,
+            min_poll_interval=0.01,
+            max_poll_interval=60.0,
+        )
+        thread = threading.Thread(target=c.run)
+        thread.start()
+
+        # wait for first batch, then stop consumer waiting for its next poll
+        for _ in range(1000):
+            if store.get_checkpoint("stream", "shardId-000") is not None:
+                break
+            threading.Event().wait(0.001)
+        c.stop()
+        thread.join(5)
+
+        self.assertFalse(thread.is_alive())
+        self.assertFalse(c.finished)
+        self.assertEqual(store.get_checkpoint("stream", "shardId-000"), "1002")
+
+    def test_next_poll_interval(self):
+        c = ShardConsumer(
+            None,
+            "stream",
+            "shardId-000",
+            None,
+            None,
+            min_poll_interval=0.2,
+            max_poll_interval=1.0,
+        )
+
+        empty = {"Records": [], "MillisBehindLatest": 0}
+        behind = {"Records": [{}], "MillisBehindLatest": 5000}
+        at_tip = {"Records": [{}], "MillisBehindLatest": 0}
+
+        self.assertEqual(c._next_poll_interval(empty, 0.2), 0.4)
+        self.assertEqual(c._next_poll_interval(empty, 0.8), 1.0)
+        self.assertEqual(c._next_poll_interval(behind, 1.0), 0.2)
+        self.assertEqual(c._next_poll_interval(at_tip, 0.4), 0.2)
+        self.assertEqual(c._next_poll_interval(at_tip, 0.1), 0.2)
+        # shard becoming active after backing off to max_poll_interval
+        self.assertEqual(c._next_poll_interval(at_tip, 1.0), 0.2)
+
+
+class StreamConsumerTest(unittest.TestCase):
+    def test_resharded_stream(self):
+        client = FakeKinesisClient(
+            {
+                "shardId-000": log_lines(5),
+                "shardId-001": log_lines(3),
+                "shardId-002": log_lines(4),
+            },
+            closed={"shardId-000", "shardId-001", "shardId-002"},
+            parents={"shardId-002": "shardId-000"},
+        )
+        store = SQLiteCheckpointStore()
+        lock = threading.Lock()
+        shard_order = []
+        payloads = {}
+
+        def processor(batch, shard_id):
+            with lock:
+                shard_order.append(shard_id)
+                payloads.setdefault(shard_id, []).extend(p.data for p in batch)
+
+        c = StreamConsumer(
+            client,
+            "stream",
+            processor,
+            store,
+            shard_refresh_interval=5.0,
+            min_poll_interval=0.0,
+            max_poll_interval=0.0,
+            limit=2,
+            decode_json=True,
+        )
+        c.run()
+
+        self.assertEqual(
+            {k: len(v) for k, v in payloads.items()},
+            {
+                "shardId-000": 5,
+                "shardId-001": 3,
+                "shardId-002": 4,
+            },
+        )
+        # child shard is consumed after its parent has ended
+        self.assertGreater(
+            shard_order.index("shardId-002"),
+            len(shard_order) - 1 - shard_order[::-1].index("shardId-000"),
+        )
+        for shard_id in payloads:
+            self.assertEqual(store.get_checkpoint("stream", shard_id), SHARD_END)
+
+    def test_resharded_stream_two_levels(self):
+        # shardId-000 -> shardId-001 -> shardId-002, first shard is slow to process
+        client = FakeKinesisClient(
+            {
+                "shardId-000": log_lines(3),
+                "shardId-001": log_lines(2),
+                "shardId-002": log_lines(2),
+            },
+            closed={"shardId-000", "shardId-001", "shardId-002"},
+            parents={"shardId-001": "shardId-000", "shardId-002": "shardId-001"},
+        )
+        store = InMemoryCheckpointStore()
+        lock = threading.Lock()
+        shard_order = []
+
+        def processor(batch, shard_id):
+            if shard_id == "shardId-000":
+                threading.Event().wait(0.05)
+
+            with lock:
+                shard_order.append(shard_id)
+
+        c = StreamConsumer(
+            client,
+            "stream",
+            processor,
+            store,
+            shard_refresh_interval=5.0,
+            min_poll_interval=0.0,
+            max_poll_interval=0.0,
+            limit=1,
+        )
+        c.run()
+
+        self.assertEqual(
+            shard_order,
+            ["shardId-000"] * 3 + ["shardId-001"] * 2 + ["shardId-002"] * 2,
+        )
+
+    def test_shard_ended_by_checkpoint(self):
+        client = FakeKinesisClient(
+            {"shardId-000": log_lines(3), "shardId-001": log_lines(1)},
+            closed={"shardId-000", "shardId-001"},
+            parents={"shardId-001": "shardId-000"},
+        )
+        store = InMemoryCheckpointStore()
+        store.set_checkpoint("stream", "shardId-000", SHARD_END)
+        c = StreamConsumer(client, "stream", None, store)
+
+        self.assertTrue(c._is_shard_ended("shardId-000"))
+        self.assertFalse(c._is_shard_ended("shardId-001"))
+
+    def test_worker_error(self):
+        client = FakeKinesisClient({"shardId-000": log_lines(3), "shardId-001": []})
+
+        def processor(batch, shard_id):
+            raise RuntimeError("processing failed")
+
+        c = StreamConsumer(
+            client,
+            "stream",
+            processor,
+            InMemoryCheckpointStore(),
+            min_poll_interval=0.0,
+            max_poll_interval=0.01,
+        )
+        with self.assertRaises(RuntimeError):
+            c.run()
+
+
+if __name__ == "__main__":
+    unittest.main()
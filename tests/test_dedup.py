@@ -0,0 +1,113 @@
+import os
+import tempfile
+import unittest
+
+from amazon_kinesis_utils.dedup import (
+    BloomDeduplicator,
+    LRUDeduplicator,
+    SQLiteDeduplicator,
+)
+
+
+class DedupTests(unittest.TestCase):
+    def check_deduplicator(self, deduplicator):
+        self.assertFalse(deduplicator.contains("a"))
+
+        deduplicator.add("a")
+        deduplicator.add_many(["b", "c"])
+
+        self.assertTrue(deduplicator.contains("a"))
+        self.assertTrue(deduplicator.contains("c"))
+        self.assertFalse(deduplicator.contains("d"))
+        self.assertEqual(deduplicator.find_seen(["a", "b", "d", "e"]), {"a", "b"})
+        self.assertEqual(deduplicator.find_seen([]), set())
+
+    def test_lru(self):
+        self.check_deduplicator(LRUDeduplicator())
+
+    def test_bloom(self):
+        self.check_deduplicator(BloomDeduplicator(capacity=1000))
+
+    def test_sqlite(self):
+        self.check_deduplicator(SQLiteDeduplicator())
+
+    def test_lru_evicts_least_recently_used(self):
+        deduplicator = LRUDeduplicator(max_size=2)
+        deduplicator.add_many(["a", "b"])
+
+        # "a" becomes most recently used
+        self.assertTrue(deduplicator.contains("a"))
+        deduplicator.add("c")
+
+        self.assertEqual(len(deduplicator), 2)
+        self.assertEqual(deduplicator.find_seen(["a", "b", "c"]), {"a", "c"})
+
+    def test_bloom_false_positive_rate(self):
+        deduplicator = BloomDeduplicator(capacity=10000, false_positive_rate=0.01)
+        deduplicator.add_many(str(i) for i in range(10000))
+
+        for i in range(0, 10000, 97):
+            self.assertTrue(deduplicator.contains(str(i)))
+
+        false_positives = len(
+            deduplicator.find_seen(f"other-{i}" for i in range(10000))
+        )
+        self.assertLess(false_positives, 300)
+
+    def test_bloom_rotation(self):
+        deduplicator = BloomDeduplicator(capacity=100)
+        size = len(deduplicator._bits)
+
+        deduplicator.add_many(f"old-{i}" for i in range(100))
+        deduplicator.add_many(f"new-{i}" for i in range(100))
+        self.assertTrue(deduplicator.contains("old-0"))
+        self.assertTrue(deduplicator.contains("new-0"))
+
+        # oldest keys are forgotten after two rotations, memory stays bounded
+        deduplicator.add_many(f"newest-{i}" for i in range(100))
+        self.assertEqual(len(deduplicator._bits), size)
+        self.assertLess(len(deduplicator.find_seen(f"old-{i}" for i in range(100))), 10)
+
+    def test_backend(self):
+        backend = SQLiteDeduplicator()
+        backend.add("persisted")
+
+        for deduplicator in (
+            LRUDeduplicator(backend=backend),
+            BloomDeduplicator(capacity=1000, backend=backend),
+        ):
+            self.assertTrue(deduplicator.contains("persisted"))
+            self.assertEqual(
+                deduplicator.find_seen(["persisted", "new"]), {"persisted"}
+            )
+
+        LRUDeduplicator(backend=backend).add_many(["x", "y"])
+        self.assertEqual(backend.find_seen(["x", "y", "z"]), {"x", "y"})
+
+    def test_sqlite_persists(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "dedup.db")
+
+            deduplicator = SQLiteDeduplicator(path)
+            deduplicator.add_many(str(i) for i in range(1200))
+            deduplicator.close()
+
+            deduplicator = SQLiteDeduplicator(path)
+            # more keys than SQLite parameters per statement
+            self.assertEqual(
+                len(deduplicator.find_seen(str(i) for i in range(1500))), 1200
+            )
+            deduplicator.close()
+
+    def test_sqlite_max_entries(self):
+        deduplicator = SQLiteDeduplicator(max_entries=3)
+        deduplicator.add_many(["a", "b", "c", "d"])
+        deduplicator.add("e")
+
+        self.assertEqual(
+            deduplicator.find_seen(["a", "b", "c", "d", "e"]), {"c", "d", "e"}
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+import subprocess
+import sys
+import unittest
+
+# modules slow to import, which should only be imported by functions using them
+HEAVY_MODULES = [
+    "aws_kinesis_agg",
+    "google.protobuf",
+    "dateutil",
+    "uuid",
+    "multiprocessing",
+    "zstandard",
+    "orjson",
+    "simdjson",
+]
+
+# random (used for jitter and sampling) imports hashlib before Python 3.7
+if sys.version_info >= (3, 7):
+    HEAVY_MODULES.append("hashlib")
+
+
+def imported_modules(module: str, candidates: list) -> list:
+    # fresh interpreter, as other tests import everything
+    code = (
+        f"import sys, {module}\n"
+        f"print(' '.join(m for m in {candidates!r} if m in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        stdout=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    )
+    return result.stdout.split()
+
+
+class ImportTimeTests(unittest.TestCase):
+    def test_kinesis_lazy_imports(self):
+        self.assertEqual(
+            imported_modules("amazon_kinesis_utils.kinesis", HEAVY_MODULES), []
+        )
+
+    def test_baikonur_logging_lazy_imports(self):
+        self.assertEqual(
+            imported_modules(
+                "amazon_kinesis_utils.baikonur_logging",
+                HEAVY_MODULES + ["amazon_kinesis_utils.s3"],
+            ),
+            [],
+        )
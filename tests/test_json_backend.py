@@ -0,0 +1,92 @@
+import json
+import unittest
+
+from amazon_kinesis_utils import json_backend, kinesis
+
+
+class CountingBackend(json_backend.JSONBackend):
+    def __init__(self):
+        super().__init__("counting", self.count_loads, json.dumps)
+        self.loads_calls = 0
+
+    def count_loads(self, data):
+        self.loads_calls += 1
+        return json.loads(data)
+
+
+class JSONBackendTests(unittest.TestCase):
+    def setUp(self):
+        self.backend_factories = json_backend._BACKEND_FACTORIES
+
+    def tearDown(self):
+        json_backend._BACKEND_FACTORIES = self.backend_factories
+        json_backend._backend = None
+
+    def test_available_backends(self):
+        available = json_backend.available_backends()
+
+        self.assertIn("json", available)
+        self.assertEqual(json_backend.set_backend().name, available[0])
+
+    def test_default_backend(self):
+        # faster backends are opt-in, as they can decode numbers differently (e.g. orjson and big integers)
+        json_backend._backend = None
+
+        self.assertEqual(json_backend.get_backend().name, "json")
+        self.assertEqual(
+            json_backend.loads('{"id": 18446744073709551616}'),
+            {"id": 18446744073709551616},
+        )
+
+    def test_backends_round_trip(self):
+        data = {"a": [1, 2.5, None, True], "b": {"c": "日本語"}}
+
+        for name in json_backend.available_backends():
+            backend = json_backend.set_backend(name)
+
+            self.assertEqual(backend.name, name)
+            self.assertEqual(json_backend.loads(json_backend.dumps(data)), data)
+            self.assertEqual(json.loads(json_backend.dumps(data)), data)
+
+            with self.assertRaises(json_backend.DecodeError):
+                json_backend.loads("{not json")
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            json_backend.set_backend("unknown")
+
+    def test_normalize_prefilter(self):
+        backend = CountingBackend()
+        json_backend.register_backend(backend)
+        json_backend.set_backend("counting")
+
+        # JSON objects that can not be CloudWatch Logs messages are not decoded
+        payload = json.dumps({"log_type": "a"})
+        self.assertEqual(
+            kinesis.normalize_cloudwatch_messages_parsed(payload), ([payload], None)
+        )
+        self.assertEqual(
+            kinesis.normalize_cloudwatch_messages_parsed("{invalid"),
+            (["{invalid"], None),
+        )
+        self.assertEqual(backend.loads_calls, 0)
+
+        # decoded object is returned when payload had to be decoded
+        payload = json.dumps({"log_type": "a", "data": {"messageType": "x"}})
+        messages, parsed = kinesis.normalize_cloudwatch_messages_parsed(payload)
+        self.assertEqual(messages, [payload])
+        self.assertEqual(parsed, json.loads(payload))
+        self.assertEqual(backend.loads_calls, 1)
+
+        # non-object JSON is still skipped
+        self.assertEqual(kinesis.normalize_cloudwatch_messages("[1, 2]"), [])
+
+    def test_register_preferred_backend(self):
+        backend = CountingBackend()
+        json_backend.register_backend(backend, preferred=True)
+
+        self.assertEqual(json_backend.available_backends()[0], "counting")
+        self.assertIs(json_backend.set_backend(), backend)
+
+        json_backend.register_backend(backend)
+        self.assertEqual(json_backend.available_backends()[-1], "counting")
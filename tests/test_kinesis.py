@@ -1,9 +1,15 @@
 import base64
+import gzip
 import json
+import threading
+import time
 import unittest
 from typing import List, Dict
 
 from amazon_kinesis_utils import kinesis
+from amazon_kinesis_utils.dedup import LRUDeduplicator
+from amazon_kinesis_utils.metrics import Metrics
+from tests.test_retry import FakeClock, fake_retry_policy
 
 
 def generate_sample_kinesis_records(data: list, encode=True) -> List[Dict]:
@@ -32,6 +38,82 @@ def generate_sample_kinesis_records(data: list, encode=True) -> List[Dict]:
     return ret
 
 
+def generate_cwl_payload(messages: List[str]) -> str:
+    """
+    Generate base64 encoded, gzipped CloudWatch Logs subscription filters DATA_MESSAGE
+    """
+    message = {
+        "messageType": "DATA_MESSAGE",
+        "owner": "000000000000",
+        "logGroup": "log-group",
+        "logStream": "log-stream",
+        "subscriptionFilters": ["filter"],
+        "logEvents": [
+            {"id": str(i), "timestamp": 1592558220000, "message": m}
+            for i, m in enumerate(messages)
+        ],
+    }
+
+    return base64.b64encode(gzip.compress(json.dumps(message).encode())).decode()
+
+
+class MockedKinesisClient:
+    def __init__(self, latency: float = 0.0, failures: int = 0):
+        """
+        :param latency: Seconds to wait in every put_records call
+        :param failures: Number of put_records calls to fail every record in before succeeding
+        """
+        self.latency = latency
+        self.failures = failures
+        self.put_records_calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def put_records(self, Records, StreamName):
+        with self.lock:
+            self.put_records_calls.append(list(Records))
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            fail = self.failures > 0
+            if fail:
+                self.failures -= 1
+
+        time.sleep(self.latency)
+
+        with self.lock:
+            self.in_flight -= 1
+
+        if fail:
+            return {
+                "FailedRecordCount": len(Records),
+                "Records": [
+                    {
+                        "ErrorCode": "ProvisionedThroughputExceededException",
+                        "ErrorMessage": "Rate exceeded",
+                    }
+                    for _ in Records
+                ],
+            }
+
+        return {
+            "FailedRecordCount": 0,
+            "Records": [
+                {"SequenceNumber": "0", "ShardId": "shardId-000000000000"}
+                for _ in Records
+            ],
+        }
+
+
+class MockedExecutor:
+    def __init__(self):
+        self.map_calls = 0
+
+    def map(self, func, *iterables):
+        self.map_calls += 1
+        return map(func, *iterables)
+
+
 class KinesisTests(unittest.TestCase):
     def test_create_record(self):
         data = "test_data"
@@ -174,3 +256,468 @@ class KinesisTests(unittest.TestCase):
 
         self.assertEqual(records[0], "hello1")
         self.assertEqual(records[1], "hello2")
+
+    def test_put_records_batch(self):
+        client = MockedKinesisClient()
+        data = [f"test-data-{x}" for x in range(1200)]
+
+        failed = kinesis.put_records_batch(client, "stream", data, max_retries=0)
+
+        self.assertIsNone(failed)
+        self.assertEqual([len(c) for c in client.put_records_calls], [500, 500, 200])
+
+    def test_put_records_batch_gives_up(self):
+        client = MockedKinesisClient(failures=10)
+        clock = FakeClock()
+        data = [f"test-data-{x}" for x in range(10)]
+
+        failed = kinesis.put_records_batch(
+            client,
+            "stream",
+            data,
+            max_retries=1,
+            retry_policy=fake_retry_policy(clock),
+        )
+
+        self.assertEqual(len(client.put_records_calls), 2)
+        self.assertEqual(len(clock.sleeps), 1)
+        self.assertEqual([r["Data"].decode() for r in failed], data)
+
+    def test_put_records_batch_retry_backoff(self):
+        client = MockedKinesisClient(failures=3)
+        clock = FakeClock()
+        data = [f"test-data-{x}" for x in range(10)]
+
+        failed = kinesis.put_records_batch(
+            client,
+            "stream",
+            data,
+            max_retries=5,
+            retry_policy=fake_retry_policy(
+                clock,
+                error_code_base_delays={"ProvisionedThroughputExceededException": 0.5},
+            ),
+        )
+
+        self.assertIsNone(failed)
+        self.assertEqual(len(client.put_records_calls), 4)
+        self.assertEqual(clock.sleeps, [0.5, 1.0, 2.0])
+
+    def test_put_records_batch_retry_deadline(self):
+        client = MockedKinesisClient(failures=10)
+        clock = FakeClock()
+        data = [f"test-data-{x}" for x in range(10)]
+
+        failed = kinesis.put_records_batch(
+            client,
+            "stream",
+            data,
+            max_retries=10,
+            retry_policy=fake_retry_policy(clock, deadline=1.0, base_delay=0.5),
+        )
+
+        # second retry would wait past deadline
+        self.assertEqual(len(client.put_records_calls), 2)
+        self.assertEqual(clock.sleeps, [0.5])
+        self.assertEqual([r["Data"].decode() for r in failed], data)
+
+    def test_put_records_batch_concurrent(self):
+        latency = 0.1
+        batch_count = 8
+        data = [f"test-data-{x}" for x in range(batch_count * 10)]
+
+        client = MockedKinesisClient(latency=latency)
+        start = time.monotonic()
+        failed = kinesis.put_records_batch(
+            client, "stream", data, max_retries=0, max_batch_size=10, max_concurrency=4
+        )
+        elapsed = time.monotonic() - start
+
+        self.assertIsNone(failed)
+        self.assertEqual(len(client.put_records_calls), batch_count)
+        self.assertEqual(client.max_in_flight, 4)
+        # sequential sending would take batch_count * latency
+        self.assertLess(elapsed, batch_count * latency / 2)
+
+        sent = [r["Data"].decode() for c in client.put_records_calls for r in c]
+        self.assertEqual(sorted(sent), sorted(data))
+
+    def test_put_records_batch_concurrent_failed(self):
+        client = MockedKinesisClient(failures=100)
+        data = [f"test-data-{x}" for x in range(30)]
+
+        failed = kinesis.put_records_batch(
+            client, "stream", data, max_retries=0, max_batch_size=10, max_concurrency=3
+        )
+
+        # all batches are sent, failed records are returned in input order
+        self.assertEqual([r["Data"].decode() for r in failed], data)
+
+    def test_put_records_batch_sequential_matches_concurrent(self):
+        data = [f"test-data-{x}" for x in range(30)]
+        results = []
+
+        for max_concurrency in (1, 3):
+            client = MockedKinesisClient(failures=100)
+            metrics = Metrics()
+            failed = kinesis.put_records_batch(
+                client,
+                "stream",
+                data,
+                max_retries=0,
+                max_batch_size=10,
+                max_concurrency=max_concurrency,
+                metrics=metrics,
+            )
+
+            self.assertEqual(len(client.put_records_calls), 3)
+            self.assertEqual(metrics.get_counters()["PutRecordsFailedRecords"], 30)
+            results.append([r["Data"].decode() for r in failed])
+
+        self.assertEqual(results[0], results[1])
+        self.assertEqual(results[0], data)
+
+    def test_split_records(self):
+        records = kinesis.create_records(["a" * 80 for _ in range(10)])
+        record_size = kinesis.get_record_size(records[0])
+        self.assertEqual(record_size, 100)
+
+        # limited by byte size
+        batches, rejected = kinesis.split_records(
+            records, max_batch_size=500, max_batch_bytes=350
+        )
+        self.assertEqual([len(b) for b in batches], [3, 3, 3, 1])
+        self.assertEqual(rejected, [])
+
+        # limited by record count
+        batches, rejected = kinesis.split_records(
+            records, max_batch_size=4, max_batch_bytes=10000
+        )
+        self.assertEqual([len(b) for b in batches], [4, 4, 2])
+
+        # order is kept
+        self.assertEqual([r for b in batches for r in b], records)
+
+    def test_split_records_oversized(self):
+        records = kinesis.create_records(["small", "x" * 1000, "small"])
+
+        batches, rejected = kinesis.split_records(records, max_record_bytes=500)
+
+        self.assertEqual(len(batches), 1)
+        self.assertEqual([r["Data"] for r in batches[0]], [b"small", b"small"])
+        self.assertEqual(rejected, [records[1]])
+
+    def test_put_records_batch_oversized(self):
+        client = MockedKinesisClient()
+        oversized = "x" * kinesis.MAX_BYTES_PER_RECORD
+        data = ["small", oversized, "small"]
+
+        failed = kinesis.put_records_batch(client, "stream", data, max_retries=0)
+
+        self.assertEqual(len(client.put_records_calls), 1)
+        self.assertEqual(len(client.put_records_calls[0]), 2)
+        self.assertEqual([r["Data"].decode() for r in failed], [oversized])
+
+    def test_aggregate_records_round_trip(self):
+        data = [json.dumps({"id": x, "message": "hello"}) for x in range(1000)]
+
+        aggregated, rejected = kinesis.aggregate_records(
+            kinesis.create_records(data), group_by_partition_key=False
+        )
+
+        self.assertEqual(len(aggregated), 1)
+        self.assertEqual(rejected, [])
+
+        raw_records = generate_sample_kinesis_records(
+            [base64.b64encode(r["Data"]).decode() for r in aggregated], encode=False
+        )
+        self.assertEqual(list(kinesis.parse_records(raw_records)), data)
+
+    def test_aggregate_records_size_limit(self):
+        data = ["x" * 1000 for _ in range(100)]
+        max_record_bytes = 10 * 1024
+
+        aggregated, rejected = kinesis.aggregate_records(
+            kinesis.create_records(data),
+            max_record_bytes=max_record_bytes,
+            group_by_partition_key=False,
+        )
+
+        self.assertGreater(len(aggregated), 1)
+        for r in aggregated:
+            self.assertLessEqual(kinesis.get_record_size(r), max_record_bytes)
+
+        raw_records = generate_sample_kinesis_records(
+            [base64.b64encode(r["Data"]).decode() for r in aggregated], encode=False
+        )
+        self.assertEqual(list(kinesis.parse_records(raw_records)), data)
+
+    def test_aggregate_records_grouped_by_partition_key(self):
+        records = [
+            {"Data": f"{key}-{x}".encode(), "PartitionKey": key}
+            for x in range(10)
+            for key in ("a", "b")
+        ]
+
+        aggregated, rejected = kinesis.aggregate_records(records)
+
+        self.assertEqual(sorted(r["PartitionKey"] for r in aggregated), ["a", "b"])
+        for r in aggregated:
+            raw_records = generate_sample_kinesis_records(
+                [base64.b64encode(r["Data"]).decode()], encode=False
+            )
+            payloads = list(kinesis.parse_records(raw_records))
+            self.assertEqual(payloads, [f"{r['PartitionKey']}-{x}" for x in range(10)])
+
+    def test_aggregate_records_oversized(self):
+        records = kinesis.create_records(["small", "x" * 2000])
+
+        aggregated, rejected = kinesis.aggregate_records(
+            records, max_record_bytes=1024, group_by_partition_key=False
+        )
+
+        self.assertEqual(len(aggregated), 1)
+        self.assertEqual(rejected, [records[1]])
+
+    def test_put_records_batch_aggregate(self):
+        client = MockedKinesisClient()
+        data = [f"test-data-{x}" for x in range(1200)]
+
+        failed = kinesis.put_records_batch(
+            client, "stream", data, max_retries=0, aggregate=True
+        )
+
+        self.assertIsNone(failed)
+        self.assertEqual(len(client.put_records_calls), 1)
+        self.assertEqual(len(client.put_records_calls[0]), 1)
+
+        raw_records = generate_sample_kinesis_records(
+            [base64.b64encode(r["Data"]).decode() for r in client.put_records_calls[0]],
+            encode=False,
+        )
+        self.assertEqual(list(kinesis.parse_records(raw_records)), data)
+
+    def test_parse_records_decode_json(self):
+        json_data = [{"a": 1}, {"b": {"messageType": "nested"}}]
+        data = [json.dumps(x) for x in json_data] + ["plain text", "[1, 2]"]
+
+        event = {"Records": generate_sample_kinesis_records(data)}
+
+        records = list(kinesis.parse_records(event["Records"], decode_json=True))
+
+        # non-object JSON is skipped, non-JSON is passed through as str
+        self.assertEqual(records, json_data + ["plain text"])
+
+    def test_parse_records_decode_json_cwl(self):
+        messages = [json.dumps({"a": 1}), "plain text", json.dumps({"b": 2})]
+
+        raw_records = generate_sample_kinesis_records(
+            [generate_cwl_payload(messages)], encode=False
+        )
+
+        records = list(kinesis.parse_records(raw_records, decode_json=True))
+
+        self.assertEqual(records, [{"a": 1}, "plain text", {"b": 2}])
+
+    def test_parse_records_with_metadata(self):
+        raw_records = generate_sample_kinesis_records(
+            [generate_cwl_payload(["hello1", "hello2"])], encode=False
+        )
+
+        records = list(kinesis.parse_records(raw_records, with_metadata=True))
+
+        self.assertEqual(len(records), 2)
+        self.assertEqual([r.data for r in records], ["hello1", "hello2"])
+        for r in records:
+            self.assertEqual(r.sequence_number, "0" * 47)
+            self.assertIsNone(r.sub_sequence_number)
+            self.assertEqual(r.partition_key, "0")
+            self.assertEqual(r.shard_id, "shardId-000000000000")
+            self.assertEqual(r.approximate_arrival_timestamp, 1592558220.000)
+
+    def test_parse_records_with_metadata_aggregated(self):
+        records = [
+            {"Data": json.dumps({"i": x}).encode(), "PartitionKey": f"key-{x}"}
+            for x in range(3)
+        ]
+        aggregated, _ = kinesis.aggregate_records(records, group_by_partition_key=False)
+        raw_records = generate_sample_kinesis_records(
+            [base64.b64encode(r["Data"]).decode() for r in aggregated], encode=False
+        )
+
+        payloads = list(
+            kinesis.parse_records(raw_records, decode_json=True, with_metadata=True)
+        )
+
+        self.assertEqual([p.data for p in payloads], [{"i": x} for x in range(3)])
+        self.assertEqual([p.sub_sequence_number for p in payloads], [0, 1, 2])
+        self.assertEqual(
+            [p.partition_key for p in payloads], [f"key-{x}" for x in range(3)]
+        )
+
+    def test_decode_records_truncated_gzip(self):
+        compressed = gzip.compress(b"gzipped data " * 100)
+
+        for data in (
+            compressed[: len(compressed) // 2],
+            gzip.compress(b"first member") + compressed[:-10],
+        ):
+            raw_records = [{"kinesis": {"data": base64.b64encode(data).decode()}}]
+
+            with self.assertRaises(EOFError):
+                list(kinesis.decode_records(raw_records))
+
+    def test_decode_records(self):
+        aggregated, _ = kinesis.aggregate_records(
+            kinesis.create_records(["agg-1", "agg-2"]), group_by_partition_key=False
+        )
+        data = [
+            base64.b64encode(b"plain").decode(),
+            base64.b64encode(gzip.compress(b"gzipped")).decode(),
+            # concatenated gzip members
+            base64.b64encode(
+                gzip.compress(b"multi-") + gzip.compress(b"member")
+            ).decode(),
+            base64.b64encode(aggregated[0]["Data"]).decode(),
+            "",
+        ]
+
+        raw_records = generate_sample_kinesis_records(data, encode=False)
+        decoded = list(kinesis.decode_records(raw_records))
+
+        self.assertEqual(
+            [d for _, d in decoded],
+            ["plain", "gzipped", "multi-member", "agg-1", "agg-2", ""],
+        )
+        self.assertIs(decoded[0][0], raw_records[0])
+        self.assertEqual(decoded[4][0]["kinesis"]["subSequenceNumber"], 1)
+
+    def test_parse_records_parallel(self):
+        data = [json.dumps({"i": x}) for x in range(100)]
+        raw_records = generate_sample_kinesis_records(data)
+        raw_records += generate_sample_kinesis_records(
+            [generate_cwl_payload([f"cwl-{x}" for x in range(5)])], encode=False
+        )
+
+        expected = list(
+            kinesis.parse_records(raw_records, decode_json=True, with_metadata=True)
+        )
+
+        records = kinesis.parse_records_parallel(
+            raw_records,
+            decode_json=True,
+            with_metadata=True,
+            max_workers=2,
+            chunk_size=10,
+            min_parallel_records=0,
+        )
+
+        self.assertEqual(records, expected)
+
+    def test_parse_records_parallel_small_batch(self):
+        data = [f"test-data-{x}" for x in range(10)]
+        raw_records = generate_sample_kinesis_records(data)
+        executor = MockedExecutor()
+
+        records = kinesis.parse_records_parallel(
+            raw_records, chunk_size=2, min_parallel_records=100, executor=executor
+        )
+        self.assertEqual(records, data)
+        self.assertEqual(executor.map_calls, 0)
+
+        records = kinesis.parse_records_parallel(
+            raw_records, chunk_size=2, min_parallel_records=0, executor=executor
+        )
+        self.assertEqual(records, data)
+        self.assertEqual(executor.map_calls, 1)
+
+    def test_parse_records_metrics(self):
+        raw_records = generate_sample_kinesis_records(
+            [json.dumps({"a": 1}), "plain text"]
+        ) + generate_sample_kinesis_records(
+            [generate_cwl_payload(["hello1", "hello2"])], encode=False
+        )
+        metrics = Metrics()
+
+        records = list(
+            kinesis.parse_records(raw_records, decode_json=True, metrics=metrics)
+        )
+
+        self.assertEqual(len(records), 4)
+        counters = metrics.get_counters()
+        self.assertEqual(counters["RecordsIn"], 3)
+        self.assertEqual(counters["PayloadsOut"], 4)
+        self.assertEqual(counters["ParseFailures"], 3)
+        self.assertEqual(
+            counters["BytesDecompressed"],
+            len(gzip.decompress(base64.b64decode(raw_records[2]["kinesis"]["data"]))),
+        )
+        self.assertGreater(counters["BytesIn"], 0)
+        self.assertEqual(len(metrics.get_timings()["ParseRecordsTime"]), 1)
+
+    def test_parse_records_deduplicator(self):
+        raw_records = generate_sample_kinesis_records([f"data-{i}" for i in range(5)])
+        for i, record in enumerate(raw_records):
+            record["kinesis"]["sequenceNumber"] = str(i)
+
+        deduplicator = LRUDeduplicator()
+        # first attempt processed and committed records 0-2 before failing
+        deduplicator.add_many(kinesis.get_sequence_numbers(raw_records[:3]))
+        metrics = Metrics()
+
+        self.assertEqual(
+            list(
+                kinesis.parse_records(
+                    raw_records, deduplicator=deduplicator, metrics=metrics
+                )
+            ),
+            ["data-3", "data-4"],
+        )
+        self.assertEqual(metrics.get_counters()["RecordsSkipped"], 3)
+        self.assertEqual(
+            kinesis.parse_records_parallel(raw_records, deduplicator=deduplicator),
+            ["data-3", "data-4"],
+        )
+
+    def test_get_batch_item_failures(self):
+        raw_records = generate_sample_kinesis_records(["a", "b", "c"])
+        for i, record in enumerate(raw_records):
+            record["kinesis"]["sequenceNumber"] = str(99 + i)
+
+        self.assertEqual(kinesis.get_batch_item_failures([]), {"batchItemFailures": []})
+        # sequence numbers are compared as numbers, not strings
+        self.assertEqual(
+            kinesis.get_batch_item_failures(["101", "99", "100"]),
+            {"batchItemFailures": [{"itemIdentifier": "99"}]},
+        )
+        self.assertEqual(
+            kinesis.get_batch_item_failures(["101", None], raw_records),
+            {"batchItemFailures": [{"itemIdentifier": "99"}]},
+        )
+        with self.assertRaises(kinesis.KinesisException):
+            kinesis.get_batch_item_failures([None])
+
+    def test_put_records_batch_metrics(self):
+        client = MockedKinesisClient(failures=2)
+        metrics = Metrics()
+
+        failed = kinesis.put_records_batch(
+            client,
+            "stream",
+            [f"test-data-{x}" for x in range(10)],
+            max_retries=5,
+            retry_policy=fake_retry_policy(FakeClock()),
+            metrics=metrics,
+        )
+
+        self.assertIsNone(failed)
+        self.assertEqual(
+            metrics.get_counters(),
+            {
+                "PutRecordsRequests": 3,
+                "PutRecordsErrors.ProvisionedThroughputExceededException": 20,
+                "PutRecordsRetries": 2,
+                "PutRecordsFailedRecords": 0,
+            },
+        )
+        self.assertEqual(len(metrics.get_timings()["PutRecordsLatency"]), 3)
@@ -0,0 +1,105 @@
+import json
+import unittest
+
+from amazon_kinesis_utils import metrics
+from tests.test_retry import FakeClock
+
+
+class MetricsTests(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.metrics = metrics.Metrics(
+            namespace="test", dimensions={"Function": "f"}, clock=self.clock.time
+        )
+
+    def test_counters_and_timings(self):
+        self.metrics.incr("a")
+        self.metrics.incr("a", 2)
+
+        with self.metrics.timer("t"):
+            self.clock.sleep(0.5)
+
+        self.metrics.timing("t", 0.25)
+
+        self.assertEqual(self.metrics.get_counters(), {"a": 3})
+        self.assertEqual(self.metrics.get_timings(), {"t": [500.0, 250.0]})
+
+    def test_timed_iter(self):
+        def produce():
+            for i in range(3):
+                self.clock.sleep(1.0)
+                yield i
+
+        items = []
+        for item in self.metrics.timed_iter("t", produce()):
+            # time spent by consumer is not measured
+            self.clock.sleep(10.0)
+            items.append(item)
+
+        self.assertEqual(items, [0, 1, 2])
+        self.assertEqual(self.metrics.get_timings(), {"t": [3000.0]})
+
+    def test_to_emf(self):
+        self.metrics.incr("a", 3)
+        with self.metrics.timer("t"):
+            self.clock.sleep(0.5)
+
+        lines = self.metrics.to_emf(timestamp=1592558220000)
+
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(
+            json.loads(lines[0]),
+            {
+                "_aws": {
+                    "Timestamp": 1592558220000,
+                    "CloudWatchMetrics": [
+                        {
+                            "Namespace": "test",
+                            "Dimensions": [["Function"]],
+                            "Metrics": [
+                                {"Name": "a", "Unit": "Count"},
+                                {"Name": "t", "Unit": "Milliseconds"},
+                            ],
+                        }
+                    ],
+                },
+                "Function": "f",
+                "a": 3,
+                "t": [500.0],
+            },
+        )
+
+    def test_to_emf_limits(self):
+        for i in range(150):
+            self.metrics.incr(f"counter-{i}")
+        for _ in range(250):
+            self.metrics.timing("t", 0.001)
+
+        documents = [json.loads(line) for line in self.metrics.to_emf()]
+
+        names = [
+            m["Name"]
+            for d in documents
+            for m in d["_aws"]["CloudWatchMetrics"][0]["Metrics"]
+        ]
+        self.assertEqual(len(names), 153)
+        for document in documents:
+            self.assertLessEqual(
+                len(document["_aws"]["CloudWatchMetrics"][0]["Metrics"]),
+                metrics.MAX_METRICS_PER_DOCUMENT,
+            )
+        self.assertEqual(
+            sum(len(d["t"]) for d in documents if "t" in d),
+            250,
+        )
+
+    def test_flush(self):
+        self.metrics.incr("a")
+        printed = []
+
+        lines = self.metrics.flush(print_func=printed.append)
+
+        self.assertEqual(lines, printed)
+        self.assertEqual(len(printed), 1)
+        self.assertEqual(self.metrics.get_counters(), {})
+        self.assertEqual(self.metrics.to_emf(), [])
@@ -0,0 +1,95 @@
+import json
+import unittest
+
+from amazon_kinesis_utils import kinesis, partition_keys
+
+
+class PartitionKeysTests(unittest.TestCase):
+    def test_random_partition_keys(self):
+        keys = partition_keys.random_partition_keys(1000)
+
+        self.assertEqual(len(keys), 1000)
+        self.assertEqual(len(set(keys)), 1000)
+        for key in keys:
+            self.assertEqual(len(key), partition_keys.RANDOM_KEY_LENGTH)
+
+    def test_field_hash_partition_keys(self):
+        data = [
+            json.dumps({"user_id": "a"}),
+            json.dumps({"user_id": "b"}),
+            json.dumps({"user_id": "a"}),
+            json.dumps({"other": "a"}),
+            "not json",
+        ]
+
+        keys, explicit_hash_keys = partition_keys.FieldHashPartitionKeys(
+            "user_id"
+        ).get_keys(data)
+
+        self.assertIsNone(explicit_hash_keys)
+        self.assertEqual(keys[0], keys[2])
+        self.assertNotEqual(keys[0], keys[1])
+        # data without the field gets random keys
+        self.assertNotEqual(keys[3], keys[4])
+        for key in keys:
+            self.assertLessEqual(len(key), 256)
+
+    def test_explicit_hash_keys_from_shard_count(self):
+        strategy = partition_keys.ExplicitHashKeys.from_shard_count(4)
+
+        keys, explicit_hash_keys = strategy.get_keys(["a"] * 6)
+        self.assertEqual(keys, ["0", "1", "2", "3", "0", "1"])
+
+        # round-robin continues over batches
+        keys, _ = strategy.get_keys(["a"] * 2)
+        self.assertEqual(keys, ["2", "3"])
+
+        # every shard gets a hash key in its own quarter of the hash key space
+        quarter = 2**128 // 4
+        for i, hash_key in enumerate(explicit_hash_keys[:4]):
+            self.assertEqual(int(hash_key) // quarter, i)
+
+    def test_explicit_hash_keys_from_shards(self):
+        shards = [
+            {
+                "ShardId": "shardId-000000000000",
+                "HashKeyRange": {"StartingHashKey": "0", "EndingHashKey": "99"},
+                "SequenceNumberRange": {"StartingSequenceNumber": "0"},
+            },
+            {
+                "ShardId": "shardId-000000000001",
+                "HashKeyRange": {"StartingHashKey": "100", "EndingHashKey": "199"},
+                "SequenceNumberRange": {
+                    "StartingSequenceNumber": "0",
+                    "EndingSequenceNumber": "1",
+                },
+            },
+            {
+                "ShardId": "shardId-000000000002",
+                "HashKeyRange": {"StartingHashKey": "200", "EndingHashKey": "299"},
+                "SequenceNumberRange": {"StartingSequenceNumber": "0"},
+            },
+        ]
+
+        strategy = partition_keys.ExplicitHashKeys.from_shards(shards)
+
+        # closed shard is skipped
+        self.assertEqual(strategy.hash_keys, ["49", "249"])
+
+    def test_create_records_with_strategy(self):
+        data = ["a", "b", "c"]
+
+        records = kinesis.create_records(
+            data, partition_keys.ExplicitHashKeys.from_shard_count(2)
+        )
+
+        self.assertEqual([r["Data"] for r in records], [b"a", b"b", b"c"])
+        self.assertEqual([r["PartitionKey"] for r in records], ["0", "1", "0"])
+        self.assertEqual(records[0]["ExplicitHashKey"], records[2]["ExplicitHashKey"])
+
+    def test_create_record_explicit_keys(self):
+        record = kinesis.create_record("a", partition_key="pk", explicit_hash_key="1")
+
+        self.assertEqual(
+            record, {"Data": b"a", "PartitionKey": "pk", "ExplicitHashKey": "1"}
+        )
@@ -0,0 +1,210 @@
+import threading
+import time
+import unittest
+
+from amazon_kinesis_utils.kinesis import KinesisException, MAX_BYTES_PER_RECORD
+from amazon_kinesis_utils.metrics import Metrics
+from amazon_kinesis_utils.producer import KinesisProducer
+from amazon_kinesis_utils.retry import RetryPolicy
+
+
+class FakeKinesisClient:
+    def __init__(self, failures: int = 0):
+        """
+        :param failures: Number of put_records calls to fail every record in before succeeding
+        """
+        self.failures = failures
+        self.put_records_calls = []
+        # put_records blocks while cleared
+        self.unblocked = threading.Event()
+        self.unblocked.set()
+
+    def put_records(self, Records, StreamName):
+        self.unblocked.wait()
+        self.put_records_calls.append(list(Records))
+
+        if self.failures > 0:
+            self.failures -= 1
+            return {
+                "FailedRecordCount": len(Records),
+                "Records": [
+                    {
+                        "ErrorCode": "ProvisionedThroughputExceededException",
+                        "ErrorMessage": "Rate exceeded",
+                    }
+                    for _ in Records
+                ],
+            }
+
+        return {
+            "FailedRecordCount": 0,
+            "Records": [{"SequenceNumber": "0", "ShardId": "0"} for _ in Records],
+        }
+
+    def sent_data(self) -> list:
+        return [r["Data"].decode() for call in self.put_records_calls for r in call]
+
+
+def no_sleep_retry_policy() -> RetryPolicy:
+    return RetryPolicy(sleep=lambda seconds: None)
+
+
+class KinesisProducerTest(unittest.TestCase):
+    def test_flush(self):
+        client = FakeKinesisClient()
+
+        with KinesisProducer(client, "stream", max_retries=1, linger=60.0) as producer:
+            for i in range(10):
+                producer.put(str(i))
+
+            self.assertEqual(producer.flush(), [])
+            self.assertEqual(client.sent_data(), [str(i) for i in range(10)])
+            self.assertEqual(len(client.put_records_calls), 1)
+
+    def test_batch_size(self):
+        client = FakeKinesisClient()
+
+        with KinesisProducer(
+            client, "stream", max_retries=1, linger=60.0, max_batch_size=4
+        ) as producer:
+            for i in range(10):
+                producer.put(str(i))
+            producer.flush()
+
+        self.assertEqual([len(c) for c in client.put_records_calls], [4, 4, 2])
+        self.assertEqual(client.sent_data(), [str(i) for i in range(10)])
+
+    def test_batch_bytes(self):
+        client = FakeKinesisClient()
+
+        # each record is 10 bytes of data and 1 byte of partition key
+        with KinesisProducer(
+            client, "stream", max_retries=1, linger=60.0, max_batch_bytes=25
+        ) as producer:
+            for i in range(5):
+                producer.put(str(i) * 10, partition_key="k")
+            producer.flush()
+
+        self.assertEqual([len(c) for c in client.put_records_calls], [2, 2, 1])
+
+    def test_full_batch_sent_without_flush(self):
+        client = FakeKinesisClient()
+        producer = KinesisProducer(
+            client, "stream", max_retries=1, linger=60.0, max_batch_size=3
+        )
+
+        for i in range(3):
+            producer.put(str(i))
+
+        for _ in range(1000):
+            if client.put_records_calls:
+                break
+            time.sleep(0.001)
+
+        self.assertEqual(client.sent_data(), ["0", "1", "2"])
+        producer.close()
+
+    def test_linger(self):
+        client = FakeKinesisClient()
+        producer = KinesisProducer(client, "stream", max_retries=1, linger=0.01)
+
+        producer.put("a")
+        for _ in range(1000):
+            if client.put_records_calls:
+                break
+            time.sleep(0.001)
+
+        self.assertEqual(client.sent_data(), ["a"])
+        producer.close()
+
+    def test_retries(self):
+        client = FakeKinesisClient(failures=1)
+
+        with KinesisProducer(
+            client, "stream", max_retries=1, retry_policy=no_sleep_retry_policy()
+        ) as producer:
+            producer.put("a")
+            self.assertEqual(producer.flush(), [])
+
+        self.assertEqual(len(client.put_records_calls), 2)
+
+    def test_failed_records(self):
+        client = FakeKinesisClient(failures=2)
+        metrics = Metrics()
+
+        with KinesisProducer(
+            client,
+            "stream",
+            max_retries=1,
+            retry_policy=no_sleep_retry_policy(),
+            metrics=metrics,
+        ) as producer:
+            producer.put("a", partition_key="k")
+            producer.put("b" * MAX_BYTES_PER_RECORD, partition_key="k")
+            failed_records = producer.flush()
+
+            # failed records are returned only once
+            self.assertEqual(producer.flush(), [])
+
+        self.assertEqual(len(failed_records), 2)
+        self.assertEqual(failed_records[0]["Data"][:1], b"b")
+        self.assertEqual(failed_records[1], {"Data": b"a", "PartitionKey": "k"})
+        self.assertEqual(metrics.get_counters()["PutRecordsFailedRecords"], 2)
+
+    def test_client_error(self):
+        class BrokenClient:
+            def put_records(self, Records, StreamName):
+                raise RuntimeError("connection reset")
+
+        with KinesisProducer(BrokenClient(), "stream", max_retries=1) as producer:
+            producer.put("a")
+            self.assertEqual(len(producer.flush()), 1)
+
+    def test_backpressure(self):
+        client = FakeKinesisClient()
+        client.unblocked.clear()
+        producer = KinesisProducer(
+            client,
+            "stream",
+            max_retries=1,
+            linger=60.0,
+            max_batch_size=2,
+            max_buffered_records=2,
+        )
+
+        # first full batch is taken by sender (blocked in put_records), second fills buffer
+        for i in range(4):
+            producer.put(str(i), timeout=1.0)
+
+        with self.assertRaises(KinesisException):
+            producer.put("4", timeout=0.01)
+
+        client.unblocked.set()
+        producer.put("4", timeout=1.0)
+        producer.close()
+
+        self.assertEqual(client.sent_data(), [str(i) for i in range(5)])
+
+    def test_flush_timeout(self):
+        client = FakeKinesisClient()
+        client.unblocked.clear()
+        producer = KinesisProducer(client, "stream", max_retries=1)
+
+        producer.put("a")
+        with self.assertRaises(KinesisException):
+            producer.flush(timeout=0.01)
+
+        client.unblocked.set()
+        producer.close()
+        self.assertEqual(client.sent_data(), ["a"])
+
+    def test_closed(self):
+        producer = KinesisProducer(FakeKinesisClient(), "stream", max_retries=1)
+        producer.close()
+
+        with self.assertRaises(KinesisException):
+            producer.put("a")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,39 @@
+import json
+import unittest
+
+from amazon_kinesis_utils.record_buffer import RecordBuffer
+
+
+class RecordBufferTests(unittest.TestCase):
+    def test_append_and_iterate(self):
+        records = [{"a": 1}, {"b": "ü"}, [1, 2], "already serialized"]
+
+        buffer = RecordBuffer()
+        buffer.extend(records)
+
+        self.assertEqual(len(buffer), 4)
+        self.assertEqual(
+            [json.loads(r) for r in list(buffer)[:3]], [{"a": 1}, {"b": "ü"}, [1, 2]]
+        )
+        self.assertEqual(buffer[3], "already serialized")
+        self.assertEqual(buffer[-1], "already serialized")
+        self.assertEqual(buffer.getvalue(), "\n".join(buffer).encode())
+        self.assertEqual(buffer.nbytes, len(buffer.getvalue()) + 1)
+
+        with self.assertRaises(IndexError):
+            buffer[4]
+
+    def test_iter_objects(self):
+        records = [{"i": i, "nested": {"x": [i]}} for i in range(100)]
+
+        buffer = RecordBuffer()
+        buffer.extend(records)
+
+        self.assertEqual(list(buffer.iter_objects()), records)
+
+    def test_empty(self):
+        buffer = RecordBuffer()
+
+        self.assertEqual(len(buffer), 0)
+        self.assertEqual(list(buffer), [])
+        self.assertEqual(buffer.getvalue(), b"")
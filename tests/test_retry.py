@@ -0,0 +1,83 @@
+import unittest
+
+from amazon_kinesis_utils.retry import RetryPolicy
+
+
+class FakeClock:
+    def __init__(self, now: float = 0.0):
+        self.now = now
+        self.sleeps = []
+
+    def time(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class MockedLambdaContext:
+    def __init__(self, remaining_ms: int):
+        self.remaining_ms = remaining_ms
+
+    def get_remaining_time_in_millis(self) -> int:
+        return self.remaining_ms
+
+
+def fake_retry_policy(clock: FakeClock, **kwargs) -> RetryPolicy:
+    # always use maximum delay to make delays predictable
+    return RetryPolicy(
+        clock=clock.time, sleep=clock.sleep, random_func=lambda: 1.0, **kwargs
+    )
+
+
+class RetryTests(unittest.TestCase):
+    def test_exponential_delay_capped(self):
+        policy = fake_retry_policy(FakeClock(), base_delay=0.1, max_delay=1.0)
+
+        delays = [policy.get_delay(attempt) for attempt in range(6)]
+
+        self.assertEqual(delays, [0.1, 0.2, 0.4, 0.8, 1.0, 1.0])
+
+    def test_full_jitter(self):
+        policy = RetryPolicy(base_delay=1.0, max_delay=1.0, random_func=lambda: 0.25)
+
+        self.assertEqual(policy.get_delay(0), 0.25)
+
+    def test_error_code_base_delays(self):
+        policy = fake_retry_policy(
+            FakeClock(),
+            base_delay=0.1,
+            error_code_base_delays={"Throttled": 1.0, "Internal": 0.01},
+        )
+
+        self.assertEqual(policy.get_delay(0, ["Internal"]), 0.01)
+        self.assertEqual(policy.get_delay(0, ["Unknown"]), 0.1)
+        # slowest error code wins
+        self.assertEqual(policy.get_delay(0, ["Internal", "Throttled"]), 1.0)
+
+    def test_backoff_sleeps(self):
+        clock = FakeClock()
+        policy = fake_retry_policy(clock, base_delay=0.1)
+
+        self.assertTrue(policy.backoff(0))
+        self.assertTrue(policy.backoff(1))
+        self.assertEqual(clock.sleeps, [0.1, 0.2])
+
+    def test_backoff_deadline(self):
+        clock = FakeClock(now=100.0)
+        policy = fake_retry_policy(clock, base_delay=1.0, deadline=102.5)
+
+        self.assertTrue(policy.backoff(0))
+        # next delay (2 s) would end after deadline
+        self.assertFalse(policy.backoff(1))
+        self.assertEqual(clock.sleeps, [1.0])
+
+    def test_from_lambda_context(self):
+        clock = FakeClock(now=10.0)
+        policy = RetryPolicy.from_lambda_context(
+            MockedLambdaContext(5000), safety_margin=1.0, clock=clock.time
+        )
+
+        self.assertEqual(policy.deadline, 14.0)
+        self.assertEqual(policy.get_remaining_time(), 4.0)
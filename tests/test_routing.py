@@ -0,0 +1,75 @@
+import unittest
+
+from amazon_kinesis_utils import routing
+
+
+class RoutingTests(unittest.TestCase):
+    def test_compile_key_path(self):
+        payload = {"a": {"b": {"c": 1}}, "x": None, "s": "str"}
+
+        for key, expected in [
+            ("x", (None, False)),
+            ("y", (None, True)),
+            (("s",), ("str", False)),
+            (("a", "b", "c"), (1, False)),
+            (("a", "b", "d"), (None, True)),
+            (("s", "t"), (None, True)),
+        ]:
+            self.assertEqual(routing.compile_key_path(key)(payload), expected)
+
+    def test_route(self):
+        rules = routing.RoutingRules(
+            log_type_key=("labels", "log_type"),
+            allow=["nginx_*", "app", "other"],
+            deny=["nginx_debug", "other"],
+            rename={"app": "application"},
+        )
+
+        for log_type, expected in [
+            ("nginx_access", ("nginx_access", False)),
+            ("nginx_debug", None),
+            ("app", ("application", False)),
+            ("application", None),
+            ("other", None),
+        ]:
+            payload = {"labels": {"log_type": log_type}}
+            self.assertEqual(rules.route(payload), expected)
+            # cached decision
+            self.assertEqual(rules.route(payload), expected)
+
+        self.assertEqual(rules.route({"labels": {}}), (None, True))
+
+    def test_route_all(self):
+        rules = routing.RoutingRules()
+
+        self.assertEqual(rules.route({"log_type": "a"}), ("a", False))
+        self.assertEqual(rules.route({"log_type": 1}), ("1", False))
+        self.assertEqual(rules.route({"log_type": ["a"]}), ("['a']", False))
+
+    def test_route_batch(self):
+        rules = routing.RoutingRules(allow=["a*"], deny=["ab"])
+        payloads = [
+            {"log_type": "a"},
+            {"log_type": "ab"},
+            {"log_type": "abc"},
+            {"log_type": "b"},
+            {"log_type": ["unhashable"]},
+            {},
+            "not a dict",
+        ]
+
+        self.assertEqual(
+            [
+                (log_type, missing)
+                for _, log_type, missing in rules.route_batch(payloads)
+            ],
+            [("a", False), ("abc", False), (None, True)],
+        )
+
+    def test_decision_cache_bounded(self):
+        rules = routing.RoutingRules()
+
+        for i in range(routing.MAX_CACHED_DECISIONS + 10):
+            rules.route_log_type(str(i))
+
+        self.assertLessEqual(len(rules._decisions), routing.MAX_CACHED_DECISIONS)
@@ -1,19 +1,53 @@
+import base64
 import gzip
+import os
 import unittest
 
 from amazon_kinesis_utils import s3
 
 
 class MockedS3Client:
-    def __init__(self):
+    def __init__(self, fail_on_part: int = None, fail_on_complete: bool = False):
         self.uploaded_data = None
+        self.uploaded_objects = {}
+        self.multipart_uploads = {}
+        self.aborted_uploads = []
+        self.fail_on_part = fail_on_part
+        self.fail_on_complete = fail_on_complete
 
     def upload_fileobj(self, fileobj, bucket, key):
         self.uploaded_data = fileobj.read()
+        self.uploaded_objects[(bucket, key)] = self.uploaded_data
 
     def get_uploaded_data(self):
         return self.uploaded_data
 
+    def create_multipart_upload(self, Bucket, Key):
+        upload_id = f"upload-{len(self.multipart_uploads)}"
+        self.multipart_uploads[upload_id] = {}
+        return {"UploadId": upload_id}
+
+    def upload_part(self, Bucket, Key, PartNumber, UploadId, Body):
+        if PartNumber == self.fail_on_part:
+            raise IOError("upload failed")
+
+        self.multipart_uploads[UploadId][PartNumber] = Body
+        return {"ETag": f"etag-{PartNumber}"}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        if self.fail_on_complete:
+            raise IOError("complete failed")
+
+        parts = self.multipart_uploads.pop(UploadId)
+        self.uploaded_data = b"".join(
+            parts[p["PartNumber"]] for p in MultipartUpload["Parts"]
+        )
+        self.uploaded_objects[(Bucket, Key)] = self.uploaded_data
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self.multipart_uploads.pop(UploadId)
+        self.aborted_uploads.append(UploadId)
+
 
 class MiscTests(unittest.TestCase):
     bucket = "bucket-name"
@@ -50,3 +84,91 @@ class MiscTests(unittest.TestCase):
 
         self.assertEqual(type(uploaded_data), bytes)
         self.assertEqual(gzip.decompress(uploaded_data).decode(), self.data)
+
+    def test_put_str_data_compression_level(self):
+        s3_client = MockedS3Client()
+
+        s3.put_str_data(
+            s3_client,
+            self.bucket,
+            self.key,
+            self.data,
+            compression="gzip",
+            compression_level=1,
+        )
+
+        uploaded_data = s3_client.get_uploaded_data()
+        self.assertEqual(gzip.decompress(uploaded_data).decode(), self.data)
+
+    def test_put_str_data_compression_overrides_gzip_compress(self):
+        s3_client = MockedS3Client()
+
+        s3.put_str_data(
+            s3_client,
+            self.bucket,
+            self.key,
+            self.data,
+            gzip_compress=True,
+            compression="none",
+        )
+
+        self.assertEqual(s3_client.get_uploaded_data().decode(), self.data)
+
+    def test_put_lines_single_part(self):
+        s3_client = MockedS3Client()
+        lines = [f"line-{x}" for x in range(100)]
+
+        size = s3.put_lines(s3_client, self.bucket, self.key, lines, gzip_compress=True)
+
+        uploaded_data = s3_client.get_uploaded_data()
+        self.assertEqual(size, len(uploaded_data))
+        self.assertEqual(gzip.decompress(uploaded_data).decode(), "\n".join(lines))
+        self.assertEqual(s3_client.multipart_uploads, {})
+
+    def test_put_lines_multipart(self):
+        s3_client = MockedS3Client()
+        # hardly compressible data, so it takes 2 parts
+        lines = [base64.b64encode(os.urandom(768)).decode() for _ in range(12 * 1024)]
+
+        writer = s3.S3StreamWriter(s3_client, self.bucket, self.key, gzip_compress=True)
+        with writer:
+            for line in lines:
+                writer.write_line(line)
+                # compressed data is never buffered beyond a single part (plus one write chunk)
+                self.assertLess(
+                    len(writer._buffer), s3.DEFAULT_PART_SIZE + s3.WRITE_CHUNK_SIZE
+                )
+
+        self.assertEqual(len(writer._parts), 2)
+        uploaded_data = s3_client.get_uploaded_data()
+        self.assertEqual(gzip.decompress(uploaded_data).decode(), "\n".join(lines))
+
+    def test_put_lines_multipart_abort(self):
+        s3_client = MockedS3Client(fail_on_part=2)
+        lines = [os.urandom(512).hex() for _ in range(20 * 1024)]
+
+        with self.assertRaises(IOError):
+            s3.put_lines(s3_client, self.bucket, self.key, lines)
+
+        self.assertEqual(s3_client.aborted_uploads, ["upload-0"])
+        self.assertEqual(s3_client.multipart_uploads, {})
+        self.assertIsNone(s3_client.get_uploaded_data())
+
+    def test_put_lines_multipart_abort_on_close(self):
+        # 10 MiB of uncompressed data: first part is uploaded while writing, second part when closing
+        lines = [os.urandom(512).hex() for _ in range(10 * 1024)]
+
+        for s3_client in (
+            MockedS3Client(fail_on_part=2),
+            MockedS3Client(fail_on_complete=True),
+        ):
+            with self.assertRaises(IOError):
+                s3.put_lines(s3_client, self.bucket, self.key, lines)
+
+            self.assertEqual(s3_client.aborted_uploads, ["upload-0"])
+            self.assertEqual(s3_client.multipart_uploads, {})
+            self.assertIsNone(s3_client.get_uploaded_data())
+
+    def test_put_lines_part_size_too_small(self):
+        with self.assertRaises(ValueError):
+            s3.S3StreamWriter(MockedS3Client(), self.bucket, self.key, part_size=1024)
@@ -0,0 +1,72 @@
+import logging
+import unittest
+
+from amazon_kinesis_utils import misc, sampled_logging
+
+
+class LazyRepr:
+    def __init__(self):
+        self.formatted = 0
+
+    def __repr__(self):
+        self.formatted += 1
+        return "LazyRepr()"
+
+
+class SampledLoggingTests(unittest.TestCase):
+    def setUp(self):
+        self.logger = logging.getLogger("test_sampled_logging")
+        self.sampled = sampled_logging.SampledLogger(
+            self.logger, max_messages_per_key=2
+        )
+
+    def test_rate_limit(self):
+        obj = LazyRepr()
+
+        with self.assertLogs(self.logger, level="WARNING") as logs:
+            for _ in range(100):
+                self.sampled.warning("key", "message %r", obj)
+
+        self.assertEqual(len(logs.records), 2)
+        # suppressed messages are never formatted
+        self.assertEqual(obj.formatted, 2)
+        self.assertEqual(self.sampled.get_counts(), {"key": 100})
+
+    def test_sampling(self):
+        draws = iter([0.5, 0.05] * 10)
+        sampled = sampled_logging.SampledLogger(
+            self.logger,
+            max_messages_per_key=0,
+            sample_rate=0.1,
+            random_func=lambda: next(draws),
+        )
+
+        with self.assertLogs(self.logger, level="INFO") as logs:
+            for _ in range(20):
+                sampled.info("key", "message")
+
+        self.assertEqual(len(logs.records), 10)
+
+    def test_flush(self):
+        for _ in range(10):
+            self.sampled.info("a", "message")
+        self.sampled.error("a", "message")
+        self.sampled.info("b", "message")
+
+        with self.assertLogs(self.logger, level="INFO") as logs:
+            counts = self.sampled.flush()
+
+        self.assertEqual(counts, {"a": 11, "b": 1})
+        self.assertEqual(
+            [(r.levelno, r.getMessage()) for r in logs.records],
+            [(logging.ERROR, "11 records: a"), (logging.INFO, "1 records: b")],
+        )
+        self.assertEqual(self.sampled.flush(), {})
+
+    def test_dict_get_default_verbose(self):
+        sampled_logging.flush()
+
+        for _ in range(100):
+            misc.dict_get_default({}, "log_type", None, verbose=True)
+
+        self.assertEqual(sampled_logging.flush(), {'missing field "log_type"': 100})
@@ -0,0 +1,95 @@
+import datetime
+import unittest
+
+from amazon_kinesis_utils import timestamps
+
+UTC = datetime.timezone.utc
+
+
+class TimestampsTests(unittest.TestCase):
+    def test_parse_iso8601(self):
+        cases = {
+            "2020-06-19T09:17:00": datetime.datetime(2020, 6, 19, 9, 17),
+            "2020-06-19 09:17:00.123456": datetime.datetime(
+                2020, 6, 19, 9, 17, 0, 123456
+            ),
+            "2020-06-19T09:17:00Z": datetime.datetime(2020, 6, 19, 9, 17, tzinfo=UTC),
+            "2020-06-19T18:17:00+09:00": datetime.datetime(
+                2020, 6, 19, 9, 17, tzinfo=UTC
+            ),
+        }
+
+        for value, expected in cases.items():
+            self.assertEqual(timestamps.parse_timestamp(value), expected, value)
+
+    def test_parse_iso8601_without_fromisoformat(self):
+        # Python 3.6 has no datetime.fromisoformat
+        cases = {
+            "2020-06-19": datetime.datetime(2020, 6, 19),
+            "2020-06-19T09:17": datetime.datetime(2020, 6, 19, 9, 17),
+            "2020-06-19 09:17:00.123": datetime.datetime(2020, 6, 19, 9, 17, 0, 123000),
+            "2020-06-19T18:17:00+09:00": datetime.datetime(
+                2020, 6, 19, 9, 17, tzinfo=UTC
+            ),
+            "2020-06-19T04:47:00-04:30": datetime.datetime(
+                2020, 6, 19, 9, 17, tzinfo=UTC
+            ),
+        }
+
+        for value, expected in cases.items():
+            self.assertEqual(timestamps._parse_iso8601_pattern(value), expected, value)
+
+        for value in ("19/06/2020 09:17", "2020-06-19T09:17:00 UTC", "2020-13-01"):
+            with self.assertRaises(ValueError):
+                timestamps._parse_iso8601_pattern(value)
+
+    def test_parse_epoch(self):
+        expected = datetime.datetime(2020, 6, 19, 9, 17, tzinfo=UTC)
+
+        for value in (
+            1592558220,
+            1592558220.0,
+            1592558220000,
+            "1592558220",
+            "1592558220000",
+            "1592558220.0",
+        ):
+            self.assertEqual(timestamps.parse_timestamp(value), expected, value)
+
+    def test_parse_basic_format_date(self):
+        # 8 digits are a date, not epoch seconds
+        self.assertEqual(
+            timestamps.parse_timestamp("20200618"), datetime.datetime(2020, 6, 18)
+        )
+
+    def test_parse_fallback(self):
+        self.assertEqual(
+            timestamps.parse_timestamp("Jun 19 2020 09:17:00"),
+            datetime.datetime(2020, 6, 19, 9, 17),
+        )
+
+    def test_parse_invalid(self):
+        with self.assertRaises(ValueError):
+            timestamps.parse_timestamp("not a timestamp")
+
+        with self.assertRaises(TypeError):
+            timestamps.parse_timestamp(None)
+
+    def test_parse_cached(self):
+        value = "2020-06-19T09:17:00.000001"
+
+        self.assertIs(
+            timestamps.parse_timestamp(value), timestamps.parse_timestamp(value)
+        )
+
+    def test_floor_timestamp(self):
+        timestamp = datetime.datetime(2020, 6, 19, 9, 17, 42, 123, tzinfo=UTC)
+
+        self.assertEqual(
+            timestamps.floor_timestamp(timestamp),
+            datetime.datetime(2020, 6, 19, 9, 0, tzinfo=UTC),
+        )
+        self.assertEqual(
+            timestamps.floor_timestamp(timestamp, bucket_seconds=15 * 60),
+            datetime.datetime(2020, 6, 19, 9, 15, tzinfo=UTC),
+        )